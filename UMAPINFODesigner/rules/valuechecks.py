@@ -16,11 +16,15 @@
 # Copyright 2021 Jading Tsunami
 """Contains *_is_valid functions for each key."""
 import re
-import sys
 from UMAPINFODesigner.rules import keys
 from UMAPINFODesigner.structure.utypes import UMAPINFOValue
 from UMAPINFODesigner.structure.utypes import UType
-from UMAPINFODesigner.structure.waddata import waddata
+from UMAPINFODesigner.structure.waddata import current as current_waddata
+
+# bump whenever the checks here (or the keys they are applied to)
+# change what is reported or removed; cached validation results of
+# other versions are ignored
+VALIDATION_VERSION = 2
 
 def add_message(message, string):
     if isinstance(message, list):
@@ -28,6 +32,7 @@ def add_message(message, string):
 
 def check_graphic(v, message):
     check_type(v, UType.STRING, message)
+    waddata = current_waddata()
     if v.value not in waddata.graphics and not v.value in waddata.data:
         add_message(message, "Graphic lump " + str(v.value) + " not in WAD.")
         return False
@@ -36,6 +41,7 @@ def check_graphic(v, message):
 
 def check_music(v, message):
     check_type(v, UType.STRING, message)
+    waddata = current_waddata()
     if v.value in waddata.music:
         return True
     elif v.value in waddata.data:
@@ -47,15 +53,30 @@ def check_music(v, message):
 
 def check_flat(v, message):
     check_type(v, UType.STRING, message)
-    if v.value not in waddata.flats:
+    if v.value not in current_waddata().flats:
         add_message(message, "Flat lump " + str(v.value) + " not in WAD.")
         return False
     else:
         return True
 
+def check_texture(v, message):
+    if not check_type(v, UType.STRING, message):
+        return False
+    waddata = current_waddata()
+    texture = waddata.textures.get(str(v.value).upper())
+    if texture is None:
+        add_message(message, "Texture " + str(v.value) + " not in WAD.")
+        return False
+    # Doom finds patches by name wherever they are in the WAD
+    missing = [str(p) if p is not None else "(bad patch number)" for p in texture.patches
+               if p is None or not (p in waddata.patches or p in waddata.graphics or p in waddata.data)]
+    if missing:
+        add_message(message, "WARNING: Texture " + str(v.value) + " uses missing patches: " + ", ".join(missing) + ".")
+    return True
+
 def check_map(v, message):
     check_type(v, UType.STRING, message)
-    if v.value not in waddata.maps:
+    if v.value not in current_waddata().maps:
         add_message(message, "Map " + str(v.value) + " not in WAD.")
         return False
     else:
@@ -156,8 +177,7 @@ def nextsecret_is_valid(value, message):
     return next_is_valid(value, message)
 
 def skytexture_is_valid(value, message):
-    # FIXME: Check against textures
-    return check_type(value, UType.STRING, message)
+    return check_texture(value, message)
 
 def music_is_valid(value, message):
     return check_music(value, message)
@@ -0,0 +1,299 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Columnar UMAPINFO document store.
+
+Map and key names are interned to integer ids and every value is a
+row in a set of parallel arrays, so a document costs a handful of
+arrays and two small dicts instead of a dict and a list per map and
+key. The store behaves like the OrderedDict of defaultdict(list)
+documents for reading (iteration, membership, store[map][key]) and
+is changed through the same operations as structure.umapinfo."""
+
+from array import array
+from collections import defaultdict
+from collections import OrderedDict
+from UMAPINFODesigner.structure.utypes import UType
+from UMAPINFODesigner.structure.utypes import intern_value
+
+# UType by its value
+_utypes = tuple(sorted(UType, key=lambda t: t.value))
+
+class ColumnarMap():
+    """Read-only view of one map's keys in a ColumnarUMAPINFO.
+    Keys stay in the order they were first added; a deleted key
+    stays with no values, as it does in a defaultdict document.
+    Values are handed out as new lists, so changing them changes
+    nothing; a key the map never had is a KeyError rather than a
+    list that would silently be thrown away."""
+    __slots__ = ('store', 'map_id')
+
+    def __init__(self, store, map_id):
+        self.store = store
+        self.map_id = map_id
+
+    def _slots(self):
+        store = self.store
+        slot = store.map_first[self.map_id]
+        while slot >= 0:
+            yield slot
+            slot = store.slot_next[slot]
+
+    def __iter__(self):
+        key_names = self.store.key_names
+        slot_key = self.store.slot_key
+        for slot in self._slots():
+            yield key_names[slot_key[slot]]
+
+    def __len__(self):
+        return sum(1 for slot in self._slots())
+
+    def __contains__(self, key):
+        return self.store._slot(self.map_id, key) is not None
+
+    def __getitem__(self, key):
+        slot = self.store._slot(self.map_id, key)
+        if slot is None:
+            raise KeyError(key)
+        return self.store._values(slot)
+
+    def get(self, key, default=None):
+        slot = self.store._slot(self.map_id, key)
+        if slot is None:
+            return default
+        return self.store._values(slot)
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        store = self.store
+        for slot in self._slots():
+            yield (store.key_names[store.slot_key[slot]], store._values(slot))
+
+class ColumnarUMAPINFO():
+    """UMAPINFO document in parallel arrays.
+
+    Each (map, key) pair gets a slot, chained per map in the order
+    keys were added. Each value gets a row holding its UType and
+    payload, chained backwards to the previous value of its slot."""
+
+    # removed rows are reclaimed once they outnumber the live ones
+    _COMPACT_MIN_ROWS = 4096
+
+    def __init__(self, umapinfo=None):
+        self.map_ids = {}
+        self.map_names = []
+        self.map_first = array('i')
+        self.map_tail = array('i')
+        self.key_ids = {}
+        self.key_names = []
+        # per key id, an array of the key's slot in each map id
+        # (-1 if that map doesn't have the key)
+        self.key_slots = []
+        self.slot_key = array('i')
+        self.slot_last = array('i')
+        self.slot_next = array('i')
+        self.row_type = array('b')
+        self.row_prev = array('i')
+        self.row_value = []
+        self.dead_rows = 0
+        if umapinfo:
+            for umap in umapinfo:
+                self.add_map(umap)
+                map_id = self.map_ids[umap]
+                for (key, values) in umapinfo[umap].items():
+                    slot = self._new_slot(map_id, key)
+                    for uv in values:
+                        self._append(slot, uv.utype, uv.value)
+
+    # mapping protocol, over map names in document order
+    def __iter__(self):
+        return iter(self.map_ids)
+
+    def __len__(self):
+        return len(self.map_ids)
+
+    def __contains__(self, umap):
+        return umap in self.map_ids
+
+    def __getitem__(self, umap):
+        return ColumnarMap(self, self.map_ids[umap])
+
+    def keys(self):
+        return self.map_ids.keys()
+
+    def items(self):
+        for (umap, map_id) in self.map_ids.items():
+            yield (umap, ColumnarMap(self, map_id))
+
+    def to_dict(self):
+        """Returns the document as an OrderedDict of defaultdict(list)."""
+        u = OrderedDict()
+        for (umap, keyvals) in self.items():
+            ud = u[umap] = defaultdict(list)
+            for (key, values) in keyvals.items():
+                ud[key] = values
+        return u
+
+    # internals
+    def _slot(self, map_id, key):
+        key_id = self.key_ids.get(key)
+        if key_id is None:
+            return None
+        slot = self.key_slots[key_id][map_id]
+        if slot < 0:
+            return None
+        return slot
+
+    def _values(self, slot):
+        values = []
+        row = self.slot_last[slot]
+        while row >= 0:
+            values.append(intern_value(self.row_value[row], _utypes[self.row_type[row]]))
+            row = self.row_prev[row]
+        values.reverse()
+        return values
+
+    def _new_slot(self, map_id, key):
+        key_id = self.key_ids.get(key)
+        if key_id is None:
+            key_id = self.key_ids[key] = len(self.key_names)
+            self.key_names.append(key)
+            self.key_slots.append(array('i', [-1]) * len(self.map_names))
+        slot = len(self.slot_key)
+        self.key_slots[key_id][map_id] = slot
+        self.slot_key.append(key_id)
+        self.slot_last.append(-1)
+        self.slot_next.append(-1)
+        tail = self.map_tail[map_id]
+        if tail < 0:
+            self.map_first[map_id] = slot
+        else:
+            self.slot_next[tail] = slot
+        self.map_tail[map_id] = slot
+        return slot
+
+    def _append(self, slot, utype, value):
+        row = len(self.row_value)
+        self.row_value.append(value)
+        self.row_type.append(utype.value)
+        self.row_prev.append(self.slot_last[slot])
+        self.slot_last[slot] = row
+
+    def _clear_slot(self, slot):
+        """Drops all values of a slot. Returns True if it had any."""
+        row = self.slot_last[slot]
+        if row < 0:
+            return False
+        while row >= 0:
+            self.row_value[row] = None
+            self.dead_rows += 1
+            row = self.row_prev[row]
+        self.slot_last[slot] = -1
+        return True
+
+    def _maybe_compact(self):
+        rows = len(self.row_value)
+        if rows >= self._COMPACT_MIN_ROWS and self.dead_rows * 2 > rows:
+            self.__init__(self.to_dict())
+
+    # document operations, mirroring structure.umapinfo
+    def add_map(self, umap):
+        if umap in self.map_ids:
+            return
+        self.map_ids[umap] = len(self.map_names)
+        self.map_names.append(umap)
+        self.map_first.append(-1)
+        self.map_tail.append(-1)
+        for slots in self.key_slots:
+            slots.append(-1)
+
+    def sub_map(self, umap):
+        """Removes a map. Returns True if it existed."""
+        map_id = self.map_ids.pop(umap, None)
+        if map_id is None:
+            return False
+        slot = self.map_first[map_id]
+        while slot >= 0:
+            self._clear_slot(slot)
+            slot = self.slot_next[slot]
+        self.map_names[map_id] = None
+        self._maybe_compact()
+        return True
+
+    def rename_map(self, oldmap, newmap):
+        """Renames a map. Throws ValueError if another map already
+        has the new name."""
+        map_id = self.map_ids.get(oldmap)
+        if map_id is None:
+            return
+        if newmap != oldmap and newmap in self.map_ids:
+            raise ValueError("Map " + newmap + " already exists.")
+        self.map_ids = dict((newmap if k == oldmap else k, v) for (k, v) in self.map_ids.items())
+        self.map_names[map_id] = newmap
+
+    def has_key(self, umap, key):
+        map_id = self.map_ids.get(umap)
+        if map_id is None:
+            return False
+        slot = self._slot(map_id, key)
+        return slot is not None and self.slot_last[slot] >= 0
+
+    def add_key(self, umap, key, utype, value, append=False):
+        """Adds a value to a map, replacing the key's values unless
+        append is set. Returns the added UMAPINFOValue."""
+        uv = intern_value(value, utype)
+        map_id = self.map_ids[umap]
+        slot = self._slot(map_id, key)
+        if slot is None:
+            slot = self._new_slot(map_id, key)
+        elif not append:
+            self._clear_slot(slot)
+            self._maybe_compact()
+            slot = self._slot(self.map_ids[umap], key)
+        self._append(slot, uv.utype, uv.value)
+        return uv
+
+    def del_key(self, umap, key):
+        """Removes all values of a key. Returns True if it had any."""
+        map_id = self.map_ids.get(umap)
+        if map_id is None:
+            return False
+        slot = self._slot(map_id, key)
+        if slot is None:
+            return False
+        removed = self._clear_slot(slot)
+        if removed:
+            self._maybe_compact()
+        return removed
+
+    def get_key(self, umap, key, full_list=False):
+        """Returns the last UMAPINFOValue of a key, or all of them
+        if full_list is set. Returns None if the key has no values."""
+        map_id = self.map_ids.get(umap)
+        key_id = self.key_ids.get(key)
+        if map_id is None or key_id is None:
+            return None
+        slot = self.key_slots[key_id][map_id]
+        if slot < 0:
+            return None
+        row = self.slot_last[slot]
+        if row < 0:
+            return None
+        if full_list:
+            return self._values(slot)
+        return intern_value(self.row_value[row], _utypes[self.row_type[row]])
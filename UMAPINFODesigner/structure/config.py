@@ -31,6 +31,10 @@ class settings:
 
 class configdata:
     config_file='.umapinfo-designer'
+    cache_dir='.umapinfo-designer-cache'
+    cache_size_mb=32
+    automap_cache_mb=16
+    picture_cache_mb=32
     config_section='umapinfo-designer'
     iwads_section='iwads'
     config_initialized = False
@@ -51,6 +55,7 @@ def validate_iwad_list():
 
 def initialize():
     configdata.config_file = os.path.join(os.path.expanduser("~"), configdata.config_file)
+    configdata.cache_dir = os.path.join(os.path.expanduser("~"), configdata.cache_dir)
     configdata.config = ConfigParser()
     if os.path.exists(configdata.config_file):
         configdata.config.read(configdata.config_file)
@@ -90,9 +95,39 @@ def get_iwad(iwad):
     assert configdata.config_initialized
     return configdata.config.get(configdata.iwads_section, iwad)
     
-def get(setting):
+def get(setting, fallback=None):
     assert configdata.config_initialized
-    return configdata.config.get(configdata.config_section, setting)
+    if fallback is None:
+        return configdata.config.get(configdata.config_section, setting)
+    return configdata.config.get(configdata.config_section, setting, fallback=fallback)
+
+def get_cache_dir():
+    assert configdata.config_initialized
+    return configdata.cache_dir
+
+def get_cache_size():
+    """Cache size cap in bytes."""
+    assert configdata.config_initialized
+    try:
+        return int(get("cache_size_mb", str(configdata.cache_size_mb))) * 1024 * 1024
+    except ValueError:
+        return configdata.cache_size_mb * 1024 * 1024
+
+def get_automap_cache_size():
+    """Memory budget for automap previews in bytes."""
+    assert configdata.config_initialized
+    try:
+        return int(get("automap_cache_mb", str(configdata.automap_cache_mb))) * 1024 * 1024
+    except ValueError:
+        return configdata.automap_cache_mb * 1024 * 1024
+
+def get_picture_cache_size():
+    """Memory budget for decoded graphics and flats in bytes."""
+    assert configdata.config_initialized
+    try:
+        return int(get("picture_cache_mb", str(configdata.picture_cache_mb))) * 1024 * 1024
+    except ValueError:
+        return configdata.picture_cache_mb * 1024 * 1024
 
 def write_config():
     assert configdata.config_initialized
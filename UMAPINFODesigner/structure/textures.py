@@ -0,0 +1,127 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Decodes texture definitions (TEXTURE1, TEXTURE2 and PNAMES).
+
+A WAD's definitions are kept as plain tuples that marshal and pickle
+can store: (definitions, patch names) where each definition is
+(name, width, height, patch numbers) and patch names is the WAD's
+PNAMES, or None if it has none and uses the one loaded before it.
+resolve() turns them into Textures naming their patches."""
+import struct
+from collections import OrderedDict, namedtuple
+
+# bump when the decoded form of definitions changes
+TEXTURES_VERSION = 1
+
+Texture = namedtuple('Texture', ['name', 'width', 'height', 'patches'])
+
+_count = struct.Struct('<I')
+_name = struct.Struct('<8s')
+# name, masked, width, height, column directory (unused), patch count
+_maptexture = struct.Struct('<8sIhhIh')
+# x origin, y origin, patch number, step dir and colormap (both unused)
+_mappatch = struct.Struct('<hhhhh')
+_mappatches = {}
+
+def _patch_list(count):
+    """Struct for count patches of a texture, all unpacked at once."""
+    record = _mappatches.get(count)
+    if record is None:
+        record = _mappatches[count] = struct.Struct('<' + 'hhhhh' * count)
+    return record
+
+def _lump_name(raw):
+    return str(raw.split(b'\0', 1)[0], 'ascii', 'replace').upper()
+
+def read_pnames(data):
+    """The patch names in a PNAMES lump (bytes or a memoryview)."""
+    if len(data) < _count.size:
+        return []
+    count = _count.unpack_from(data, 0)[0]
+    end = min(_count.size + count * _name.size, len(data))
+    end -= (end - _count.size) % _name.size
+    return [_lump_name(n) for (n,) in _name.iter_unpack(data[_count.size:end])]
+
+def read_texture_lump(data):
+    """The texture definitions in a TEXTURE1 or TEXTURE2 lump (bytes or
+    a memoryview), as (name, width, height, patch numbers).
+    Definitions that run past the end of the lump are dropped."""
+    if len(data) < _count.size:
+        return []
+    count = _count.unpack_from(data, 0)[0]
+    if _count.size * (count + 1) > len(data):
+        return []
+    offsets = struct.unpack_from('<' + str(count) + 'I', data, _count.size)
+    size = len(data)
+    header = _maptexture.unpack_from
+    definitions = []
+    for offset in offsets:
+        start = offset + _maptexture.size
+        if start > size:
+            continue
+        (name, masked, width, height, columns, patchcount) = header(data, offset)
+        patchcount = max(patchcount, 0)
+        if start + patchcount * _mappatch.size > size:
+            continue
+        patches = _patch_list(patchcount).unpack_from(data, start)[2::5]
+        definitions.append((_lump_name(name), width, height, patches))
+    return definitions
+
+class texturecache():
+    # texture definitions read this session, by WAD fingerprint
+    defs = {}
+
+def read_wad_textures(wad):
+    """The texture definitions of a WAD in the form described above,
+    or None if it defines no textures. Read once per session for
+    each WAD content fingerprint."""
+    known = getattr(wad, 'texture_defs', None)
+    if known is not None:
+        return known
+    fingerprint = getattr(wad, 'fingerprint', None)
+    if fingerprint is not None and fingerprint in texturecache.defs:
+        return texturecache.defs[fingerprint]
+    definitions = _read_wad_textures(wad)
+    if fingerprint is not None:
+        texturecache.defs[fingerprint] = definitions
+    return definitions
+
+def _read_wad_textures(wad):
+    definitions = []
+    for t in sorted(wad.txdefs.keys()):
+        if t.startswith("TEXTURE"):
+            definitions.extend(read_texture_lump(wad.txdefs[t].data))
+    pnames = None
+    if 'PNAMES' in wad.txdefs:
+        pnames = read_pnames(wad.txdefs['PNAMES'].data)
+    if not definitions and pnames is None:
+        return None
+    return (definitions, pnames)
+
+def resolve(definitions, pnames):
+    """An OrderedDict of texture names to Textures, given definitions
+    and the patch names they refer to. Patch numbers out of range
+    become None. The first definition of a name wins, as in Doom."""
+    textures = OrderedDict()
+    pnames = pnames or []
+    npnames = len(pnames)
+    make = tuple.__new__
+    for (name, width, height, patches) in definitions:
+        if name not in textures:
+            textures[name] = make(Texture, (name, width, height,
+                                            tuple([pnames[p] if 0 <= p < npnames else None for p in patches])))
+    return textures
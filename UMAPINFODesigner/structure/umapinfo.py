@@ -15,28 +15,83 @@
 #
 # Copyright 2021 Jading Tsunami
 from UMAPINFODesigner.structure import utypes
-from UMAPINFODesigner.structure.utypes import UMAPINFOValue
+from UMAPINFODesigner.structure.columnar import ColumnarUMAPINFO
+from UMAPINFODesigner.structure.utypes import intern_value
+from UMAPINFODesigner.uio import parser
 from collections import defaultdict
 from collections import OrderedDict
 
+# document stores
+DICT_BACKEND = 'dict'
+COLUMNAR_BACKEND = 'columnar'
+
 class umapinfo:
     """Memory-resident version of UMAPINFO being edited"""
     modified = False
+    backend = DICT_BACKEND
     u = OrderedDict()
+    # generated text of each map block; a map missing from
+    # here is dirty and is regenerated on next use
+    fragments = {}
+
+def columnar():
+    return umapinfo.backend == COLUMNAR_BACKEND
+
+def set_backend(backend):
+    """Selects the document store, converting the UMAPINFO
+    being edited to it."""
+    if backend not in (DICT_BACKEND, COLUMNAR_BACKEND):
+        raise ValueError("Unknown UMAPINFO backend " + repr(backend))
+    umapinfo.backend = backend
+    load_umapinfo(umapinfo.u)
 
 def load_umapinfo(um):
+    if columnar():
+        if not isinstance(um, ColumnarUMAPINFO):
+            um = ColumnarUMAPINFO(um)
+    elif isinstance(um, ColumnarUMAPINFO):
+        um = um.to_dict()
     umapinfo.u = um
+    umapinfo.fragments = {}
 
 def clear_umapinfo():
-    umapinfo.u = OrderedDict()
+    umapinfo.u = ColumnarUMAPINFO() if columnar() else OrderedDict()
+    umapinfo.fragments = {}
     umapinfo.modified = False
 
+def mark_dirty(umap):
+    umapinfo.fragments.pop(umap, None)
+
+# text generation
+def map_fragment(umap, keyvals=None):
+    """Returns the cached UMAPINFO text of a map block,
+    regenerating it only if the map changed since."""
+    fragment = umapinfo.fragments.get(umap)
+    if fragment is None:
+        if keyvals is None:
+            keyvals = umapinfo.u[umap]
+        fragment = umapinfo.fragments[umap] = parser.stringify_map(umap, keyvals)
+    return fragment
+
+def iter_umapinfo():
+    return parser.iter_umapinfo(umapinfo.u, map_fragment)
+
+def generate_umapinfo():
+    return parser.generate_umapinfo(umapinfo.u, map_fragment)
+
+def write_umapinfo(sink, encoding='utf-8'):
+    return parser.write_umapinfo(umapinfo.u, sink, encoding, map_fragment)
+
 # map access and manipulation
 def add_map(newmap):
     if not newmap: return
     newmap = newmap.upper()
     if newmap not in umapinfo.u:
-        umapinfo.u[newmap] = defaultdict(list)
+        if columnar():
+            umapinfo.u.add_map(newmap)
+        else:
+            umapinfo.u[newmap] = defaultdict(list)
+        mark_dirty(newmap)
     umapinfo.modified = True
 
 def has_map(umap):
@@ -44,7 +99,12 @@ def has_map(umap):
     return umap.upper() in umapinfo.u
 
 def sub_map(removemap):
-    if umapinfo.u.pop(removemap, None):
+    if columnar():
+        removed = umapinfo.u.sub_map(removemap)
+    else:
+        removed = umapinfo.u.pop(removemap, None)
+    if removed:
+        mark_dirty(removemap)
         umapinfo.modified = True
 
 def has_episodes():
@@ -166,14 +226,21 @@ def get_episode_tree():
 
 def rename_map(oldmap, newmap):
     newmap = newmap.upper()
-    if not has_map(oldmap):
+    if not has_map(oldmap) or (newmap != oldmap and has_map(newmap)):
         return None
-    umapinfo.u = OrderedDict((newmap if k == oldmap else k, v) for k, v in umapinfo.u.items())
+    if columnar():
+        umapinfo.u.rename_map(oldmap, newmap)
+    else:
+        umapinfo.u = OrderedDict((newmap if k == oldmap else k, v) for k, v in umapinfo.u.items())
+    mark_dirty(oldmap)
+    mark_dirty(newmap)
     umapinfo.modified = True
 
 def has_key(umap, key):
     if not has_map(umap):
         return False
+    if columnar():
+        return umapinfo.u.has_key(umap, key)
     return (key in umapinfo.u[umap]) and len(umapinfo.u[umap][key]) > 0
 
 def add_key(umap, key, utype, val, append=False):
@@ -181,13 +248,17 @@ def add_key(umap, key, utype, val, append=False):
     if not has_map(umap):
         return None
 
-    ud = umapinfo.u[umap]
-    uv = UMAPINFOValue(val, utype)
-
-    if key not in ud or append:
-        ud[key].append(uv)
+    if columnar():
+        uv = umapinfo.u.add_key(umap, key, utype, val, append)
     else:
-        ud[key] = [uv]
+        ud = umapinfo.u[umap]
+        uv = intern_value(val, utype)
+
+        if key not in ud or append:
+            ud[key].append(uv)
+        else:
+            ud[key] = [uv]
+    mark_dirty(umap)
     umapinfo.modified = True
     return uv
 
@@ -195,16 +266,23 @@ def del_key(umap, key):
     if not has_map(umap):
         return None
 
-    ud = umapinfo.u[umap]
+    if columnar():
+        if umapinfo.u.del_key(umap, key):
+            mark_dirty(umap)
+    else:
+        ud = umapinfo.u[umap]
 
-    if key in ud:
-        ud[key] = list()
+        if key in ud:
+            if ud[key]:
+                mark_dirty(umap)
+            ud[key] = list()
     umapinfo.modified = True
 
 def get_key(umap, key, full_list=False):
     """Returns UMAPINFOValue"""
-    value = None
     umap = umap.upper()
+    if columnar():
+        return umapinfo.u.get_key(umap, key, full_list)
     if not has_key(umap, key):
         return None
 
@@ -32,6 +32,48 @@ class UType(Enum):
     TUPLE = 5
 
 class UMAPINFOValue():
+    """Immutable UMAPINFO value. TUPLE and MULTISTRING
+    payloads are stored as tuples."""
+    __slots__ = ('value', 'utype')
+
     def __init__(self,value,utype):
-        self.utype = utype
-        self.value = value
+        if isinstance(value, list):
+            value = tuple(value)
+        object.__setattr__(self, 'value', value)
+        object.__setattr__(self, 'utype', utype)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UMAPINFOValue is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("UMAPINFOValue is immutable")
+
+    def __reduce__(self):
+        return (UMAPINFOValue, (self.value, self.utype))
+
+# Flyweights for the values that repeat throughout a UMAPINFO:
+# keywords, numbers and lump-name sized strings (music, skies,
+# graphics, next maps). Level names and intertext are not shared.
+_interned_keywords = {}
+_interned_numbers = {}
+_interned_strings = {}
+_INTERN_MAX_STRING = 8
+
+def intern_value(value, utype):
+    """Returns a shared UMAPINFOValue for common values,
+    or a new one otherwise."""
+    # one table per type, so lookups never hash the enum
+    if utype is UType.STRING:
+        if not isinstance(value, str) or len(value) > _INTERN_MAX_STRING:
+            return UMAPINFOValue(value, utype)
+        table = _interned_strings
+    elif utype is UType.KEYWORD:
+        table = _interned_keywords
+    elif utype is UType.NUMBER:
+        table = _interned_numbers
+    else:
+        return UMAPINFOValue(value, utype)
+    uv = table.get(value)
+    if uv is None:
+        uv = table[value] = UMAPINFOValue(value, utype)
+    return uv
@@ -14,77 +14,459 @@
 # along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
 #
 # Copyright 2021 Jading Tsunami
+from UMAPINFODesigner.structure import textures
 from UMAPINFODesigner.uio import parser
+from bisect import bisect_left
 from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+import threading
 
-def get_chunk(d, offset, string=False):
-    if string:
-        return str(d[offset:offset+8], 'ascii').strip('\0')
-    else:
-        return int.from_bytes(d[offset:offset+4], 'little', signed=False)
+def _topmost_pnames(w):
+    """PNAMES of the topmost WAD that has one, or None."""
+    for name in reversed(w.wad):
+        definitions = textures.read_wad_textures(w.wad[name])
+        if definitions is not None and definitions[1] is not None:
+            return definitions[1]
+    return None
 
-def process_textures(tex):
-    numtextures = get_chunk(tex, 0)
-    textures = set()
-    for i in range(numtextures):
-        offs = get_chunk(tex, 4*i+4)
-        name = get_chunk(tex, offs, True)
-        textures.update([name])
-    return textures
+def wad_textures(wad, w=None):
+    """The textures a WAD defines, as an OrderedDict of names to
+    textures.Texture. If the WAD has no PNAMES of its own, its
+    textures use the PNAMES of the topmost WAD in w that has one."""
+    definitions = textures.read_wad_textures(wad)
+    if definitions is None:
+        return OrderedDict()
+    (defs, pnames) = definitions
+    if pnames is None and w is not None:
+        pnames = _topmost_pnames(w)
+    return textures.resolve(defs, pnames)
 
 
+# marks a name an overlay's index leaves to the namespace under it
+_INHERITED = object()
+
+class LumpNamespace(Mapping):
+    """Lumps of one kind (graphics, maps, ...) from a stack of WADs.
+
+    Each WAD is a layer mapping lump names to lumps, later layers on
+    top. Looking a name up gives the lump of the topmost layer that
+    has it. An index of the layers providing each name keeps lookups
+    O(1) and makes adding, removing or moving a layer only touch the
+    names in that layer. The names are also kept in a list that is
+    sorted when first needed after a change, for listing them and
+    finding them by prefix.
+
+    An overlay (see overlay()) is a namespace to change away from
+    another one without copying it: its index only has the names its
+    own changes touched (None for those it dropped), and the rest are
+    looked up in the namespace under it. commit() applies the changes."""
+
+    def __init__(self, base=None):
+        self.base = base
+        self.layers = OrderedDict(base.layers) if base is not None else OrderedDict()
+        self.index = {}
+        self.count = len(base) if base is not None else 0
+        # bumped on every change, so that an overlay can tell whether
+        # the namespace under it changed since it was made
+        self.version = 0
+        self.base_version = base.version if base is not None else 0
+        # an overlay's names that aren't in base, and base's names it dropped
+        self.added = set()
+        self.dropped = set()
+        # an overlay only lists its names when first asked to
+        self.names = [] if base is None else None
+        self.names_sorted = True
+
+    def _get(self, name):
+        """The layers providing name, bottom to top, or None.
+        Don't change the list returned."""
+        providers = self.index.get(name, _INHERITED)
+        if providers is _INHERITED:
+            return self.base._get(name) if self.base is not None else None
+        return providers
+
+    def _owned(self, name):
+        """_get(), as a list of this namespace's own to change."""
+        providers = self.index.get(name, _INHERITED)
+        if providers is _INHERITED:
+            providers = self.base._get(name) if self.base is not None else None
+            if providers is not None:
+                providers = self.index[name] = list(providers)
+        return providers
+
+    def push(self, layer, lumps):
+        """Adds a layer on top. lumps maps names to lumps."""
+        if layer in self.layers:
+            raise KeyError("Layer " + str(layer) + " is already in the namespace.")
+        self.layers[layer] = lumps
+        index = self.index
+        base = self.base
+        added = []
+        for name in lumps:
+            providers = index.get(name, _INHERITED)
+            if providers is _INHERITED and base is not None:
+                providers = self._owned(name)
+            if providers is None or providers is _INHERITED:
+                index[name] = [layer]
+                added.append(name)
+            else:
+                providers.append(layer)
+        self.version += 1
+        if added:
+            self.count += len(added)
+            if base is not None:
+                for name in added:
+                    if name in self.dropped:
+                        self.dropped.discard(name)
+                    else:
+                        self.added.add(name)
+            if self.names is not None:
+                self.names.extend(added)
+                self.names_sorted = False
+
+    def remove(self, layer):
+        lumps = self.layers.pop(layer)
+        index = self.index
+        base = self.base
+        removed = set()
+        for name in lumps:
+            providers = self._get(name)
+            if len(providers) > 1:
+                self._owned(name).remove(layer)
+            elif base is None or name in self.added:
+                del index[name]
+                removed.add(name)
+                self.added.discard(name)
+            else:
+                index[name] = None
+                removed.add(name)
+                self.dropped.add(name)
+        self.version += 1
+        if removed:
+            self.count -= len(removed)
+            if self.names is not None:
+                self.names = [name for name in self.names if name not in removed]
+
+    def move(self, layer, position):
+        """Moves a layer to a position in the stack (0 is the bottom)."""
+        lumps = self.layers.pop(layer)
+        order = list(self.layers)
+        order.insert(position, layer)
+        self.layers[layer] = lumps
+        for other in order[order.index(layer) + 1:]:
+            self.layers.move_to_end(other)
+        rank = {l: i for (i, l) in enumerate(order)}
+        for name in lumps:
+            if len(self._get(name)) > 1:
+                self._owned(name).sort(key=rank.__getitem__)
+        self.version += 1
+
+    def provider(self, name):
+        """The layer a name's lump comes from, or None."""
+        providers = self._get(name)
+        return providers[-1] if providers else None
+
+    def providers(self, name):
+        """Every layer that has a name, bottom to top."""
+        return list(self._get(name) or ())
+
+    def sorted_names(self):
+        """Every name, sorted. Don't change the list returned."""
+        if self.names is None:
+            dropped = self.dropped
+            self.names = [name for name in self.base.sorted_names() if name not in dropped]
+            if self.added:
+                self.names.extend(self.added)
+                self.names_sorted = False
+        if not self.names_sorted:
+            self.names.sort()
+            self.names_sorted = True
+        return self.names
+
+    def with_prefix(self, prefix):
+        """The names starting with prefix, sorted."""
+        names = self.sorted_names()
+        if not prefix:
+            return names
+        start = bisect_left(names, prefix)
+        end = bisect_left(names, prefix[:-1] + chr(ord(prefix[-1]) + 1), start)
+        return names[start:end]
+
+    def copy(self):
+        """An independent copy, which for an overlay has everything in
+        the namespaces under it as well."""
+        c = LumpNamespace()
+        c.layers = OrderedDict(self.layers)
+        c.index = {name: list(self._get(name)) for name in self}
+        c.count = len(c.index)
+        c.names = list(self.sorted_names())
+        return c
+
+    def overlay(self):
+        """A namespace to make changes in without changing this one,
+        which only costs as much as the names the changes touch. This
+        namespace mustn't change while the overlay is in use."""
+        if self.base is not None:
+            return LumpNamespace(self.copy())
+        return LumpNamespace(self)
+
+    def commit(self):
+        """Applies an overlay's changes to the namespace under it and
+        returns that, only touching the names the overlay changed. If
+        that namespace has changed since, a new namespace of the
+        overlay's layers is built instead. The overlay can't be used after.
+        A namespace that isn't an overlay is returned as it is."""
+        base = self.base
+        if base is None:
+            return self
+        if base.version != self.base_version or base.base is not None:
+            rebuilt = LumpNamespace()
+            for (layer, lumps) in self.layers.items():
+                rebuilt.push(layer, lumps)
+            return rebuilt
+        for (name, providers) in self.index.items():
+            if providers is None:
+                del base.index[name]
+            else:
+                base.index[name] = providers
+        base.layers = self.layers
+        base.count = self.count
+        if self.dropped:
+            dropped = self.dropped
+            base.names = [name for name in base.names if name not in dropped]
+        if self.added:
+            base.names.extend(self.added)
+            base.names_sorted = False
+        base.version += 1
+        self.base = None
+        return base
+
+    def __getitem__(self, name):
+        providers = self._get(name)
+        if not providers:
+            raise KeyError(name)
+        return self.layers[providers[-1]][name]
+
+    def get(self, name, default=None):
+        providers = self._get(name)
+        if not providers:
+            return default
+        return self.layers[providers[-1]][name]
+
+    def __contains__(self, name):
+        return bool(self._get(name))
+
+    def __iter__(self):
+        if self.base is None:
+            return iter(self.index)
+        return self._iter_overlay()
+
+    def _iter_overlay(self):
+        index = self.index
+        for name in self.base:
+            if index.get(name, _INHERITED) is not None:
+                yield name
+        for name in self.added:
+            yield name
+
+    def __len__(self):
+        return self.count
+
+# the namespaces of waddata, in the order provider() searches them
+_namespaces = ('graphics', 'flats', 'patches', 'music', 'maps', 'textures', 'data')
+
+class waddatastate():
+    """A copy of everything waddata holds, e.g. to be built up away
+    from the waddata in use. See waddata.snapshot() and waddata.staged()."""
+    def __init__(self):
+        self.wad = OrderedDict()
+        self.fingerprints = {}
+        self.graphics = LumpNamespace()
+        self.music = LumpNamespace()
+        self.flats = LumpNamespace()
+        self.maps = LumpNamespace()
+        self.data = LumpNamespace()
+        self.patches = LumpNamespace()
+        # textures.Texture by name
+        self.textures = LumpNamespace()
+        # the lumps of graphics and flats, by their old names
+        self.glumps = self.graphics
+        self.flumps = self.flats
+        self.umapinfo = None
+
+_staging = threading.local()
+
+def current():
+    """The waddata this thread reads and changes: waddata itself,
+    or the state given to waddata.staged() while inside it."""
+    return getattr(_staging, 'state', None) or waddata
+
+def wad_maps(wad):
+    """The maps of a WAD by name, binary-format and UDMF alike."""
+    udmfmaps = getattr(wad, 'udmfmaps', None)
+    if not udmfmaps:
+        return wad.maps
+    maps = OrderedDict(wad.maps)
+    maps.update(udmfmaps)
+    return maps
+
+def _update_umapinfo(w):
+    """UMAPINFO comes from the topmost WAD that has one.
+    Kept as raw lump bytes; decoded while parsing."""
+    lump = w.data.get('UMAPINFO')
+    w.umapinfo = lump.data if lump is not None else None
+
 class waddata():
     wad = OrderedDict()
-    graphics = set()
-    glumps = {}
-    music = set()
-    flats = set()
-    flumps = {}
-    maps = set()
-    data = set()
-    textures = set()
+    # loaded WADs' content fingerprints, to their names in wad
+    fingerprints = {}
+    graphics = LumpNamespace()
+    glumps = graphics
+    music = LumpNamespace()
+    flats = LumpNamespace()
+    flumps = flats
+    maps = LumpNamespace()
+    data = LumpNamespace()
+    patches = LumpNamespace()
+    textures = LumpNamespace()
     umapinfo = None
 
     def merge(newname, newwad):
-        if newname not in waddata.wad:
-            waddata.wad[newname] = newwad
-            waddata.graphics.update(newwad.graphics.keys())
-            waddata.glumps = {**waddata.glumps, **newwad.graphics}
-            waddata.music.update(newwad.music.keys())
-            waddata.flats.update(newwad.flats.keys())
-            waddata.flumps = {**waddata.flumps, **newwad.flats}
-            waddata.maps.update(newwad.maps.keys())
-            waddata.data.update(newwad.data.keys())
+        """Adds a WAD on top of the ones loaded, unless the same WAD
+        (by content fingerprint, or by name if it has none) is loaded.
+        A different WAD with the same name is loaded as "name (2)".
+        Returns the name the WAD is loaded under."""
+        w = current()
+        fingerprint = getattr(newwad, 'fingerprint', None)
+        if fingerprint is not None:
+            if fingerprint in w.fingerprints:
+                return w.fingerprints[fingerprint]
+            name = newname
+            copies = 1
+            while name in w.wad:
+                copies += 1
+                name = newname + " (" + str(copies) + ")"
+            newname = name
+            w.fingerprints[fingerprint] = newname
+        if newname not in w.wad:
+            w.wad[newname] = newwad
+            w.graphics.push(newname, newwad.graphics)
+            w.music.push(newname, newwad.music)
+            w.flats.push(newname, newwad.flats)
+            w.maps.push(newname, wad_maps(newwad))
+            w.data.push(newname, newwad.data)
+            w.patches.push(newname, newwad.patches)
+            w.textures.push(newname, wad_textures(newwad, w))
             if 'UMAPINFO' in newwad.data:
-                try:
-                    waddata.umapinfo = newwad.data['UMAPINFO'].data.decode('ascii')
-                except UnicodeDecodeError:
-                    waddata.umapinfo = newwad.data['UMAPINFO'].data.decode('utf-8')
-
-            for t in newwad.txdefs.keys():
-                if t.startswith("TEXTURE"):
-                    waddata.textures.update(process_textures(newwad.txdefs[t].data))
+                _update_umapinfo(w)
         else:
             # do nothing if already loaded
             pass
+        return newname
+
+    def remove(name):
+        """Unloads a WAD, uncovering whatever it overrode."""
+        w = current()
+        wad = w.wad.pop(name)
+        w.fingerprints.pop(getattr(wad, 'fingerprint', None), None)
+        for namespace in _namespaces:
+            getattr(w, namespace).remove(name)
+        _update_umapinfo(w)
+
+    def move(name, position):
+        """Moves a WAD to a position in the load order (0 is loaded first)."""
+        w = current()
+        order = list(w.wad)
+        order.remove(name)
+        order.insert(position, name)
+        w.wad = OrderedDict((n, w.wad[n]) for n in order)
+        for namespace in _namespaces:
+            getattr(w, namespace).move(name, position)
+        _update_umapinfo(w)
+
+    def provider(lumpname, namespace=None):
+        """The name of the WAD a lump comes from, e.g. provider('TITLEPIC'),
+        or None. Looks in one namespace ('graphics', 'maps', ...) or,
+        by default, in all of them."""
+        w = current()
+        for n in ((namespace,) if namespace else _namespaces):
+            wadname = getattr(w, n).provider(lumpname)
+            if wadname is not None:
+                return wadname
+        return None
 
     def clear():
-        waddata.wad = OrderedDict()
-        waddata.graphics = set()
-        waddata.glumps = {}
-        waddata.music = set()
-        waddata.flats = set()
-        waddata.flumps = {}
-        waddata.maps = set()
-        waddata.data = set()
-        waddata.umapinfo = None
+        w = current()
+        w.wad = OrderedDict()
+        w.fingerprints = {}
+        w.graphics = LumpNamespace()
+        w.glumps = w.graphics
+        w.music = LumpNamespace()
+        w.flats = LumpNamespace()
+        w.flumps = w.flats
+        w.maps = LumpNamespace()
+        w.data = LumpNamespace()
+        w.patches = LumpNamespace()
+        w.textures = LumpNamespace()
+        w.umapinfo = None
+
+    def snapshot():
+        """Copies the current state so that it can be changed
+        without affecting waddata. The namespaces are overlaid rather
+        than copied (see LumpNamespace.overlay()), so loading a WAD
+        into the copy only costs as much as the WAD's own lumps;
+        waddata mustn't change until the copy is restored or dropped."""
+        w = current()
+        state = waddatastate()
+        state.wad = OrderedDict(w.wad)
+        state.fingerprints = dict(w.fingerprints)
+        state.graphics = w.graphics.overlay()
+        state.glumps = state.graphics
+        state.music = w.music.overlay()
+        state.flats = w.flats.overlay()
+        state.flumps = state.flats
+        state.maps = w.maps.overlay()
+        state.data = w.data.overlay()
+        state.patches = w.patches.overlay()
+        state.textures = w.textures.overlay()
+        state.umapinfo = w.umapinfo
+        return state
+
+    def restore(state):
+        """Makes a state (from snapshot()) the current one, all at once.
+        Only the thread running the UI should do this. Changes made to
+        the state's namespaces are applied to waddata's own, where they
+        are overlaid on them."""
+        for namespace in _namespaces:
+            setattr(state, namespace, getattr(state, namespace).commit())
+        (state.glumps, state.flumps) = (state.graphics, state.flats)
+        (waddata.wad, waddata.fingerprints, waddata.graphics, waddata.glumps, waddata.music, waddata.flats,
+         waddata.flumps, waddata.maps, waddata.data, waddata.patches, waddata.textures, waddata.umapinfo) = \
+            (state.wad, state.fingerprints, state.graphics, state.glumps, state.music, state.flats,
+             state.flumps, state.maps, state.data, state.patches, state.textures, state.umapinfo)
+
+    @contextmanager
+    def staged(state):
+        """Within the block, waddata functions called by this thread
+        (and the rules that look things up in waddata) use state
+        instead of waddata. Other threads are unaffected."""
+        previous = getattr(_staging, 'state', None)
+        _staging.state = state
+        try:
+            yield state
+        finally:
+            _staging.state = previous
+
+    def is_loaded(fingerprint):
+        """Whether a WAD with this content fingerprint is loaded."""
+        return fingerprint in current().fingerprints
 
     def process_umapinfo():
-        if not waddata.umapinfo: return None
-        return parser.parse_umapinfo(waddata.umapinfo)
+        w = current()
+        if not w.umapinfo: return None
+        return parser.parse_umapinfo(w.umapinfo)
 
     def get_map(mapname):
         """Get the most recent loaded map matching the supplied name."""
-        for wad in reversed(waddata.wad):
-            if mapname in waddata.wad[wad].maps:
-                return waddata.wad[wad].maps[mapname]
+        return current().maps.get(mapname)
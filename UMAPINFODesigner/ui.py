@@ -20,21 +20,25 @@ from tkinter.filedialog import *
 from tkinter.simpledialog import *
 from tkinter import *
 from tkinter.ttk import *
-import io
+import bisect
 import sys
 import PIL.Image, PIL.ImageTk
+import tkinter.font
 import webbrowser
 
 # Local import
 from UMAPINFODesigner.structure import config
 from UMAPINFODesigner.structure import umapinfo
+from UMAPINFODesigner.structure.waddata import waddata, waddatastate
 from UMAPINFODesigner.structure.utypes import UType
 from UMAPINFODesigner.structure.utypes import UMAPINFOValue
+from UMAPINFODesigner.uio import wadloader
 from UMAPINFODesigner.uio import wadreader
 from UMAPINFODesigner.uio import wadwriter
-from UMAPINFODesigner.uio import parser
+from UMAPINFODesigner.uio import maprender
+from UMAPINFODesigner.uio import prerender
+from UMAPINFODesigner.uio import thumbnails
 from UMAPINFODesigner.rules import valuechecks
-from UMAPINFODesigner.rules import valuechecker
 from UMAPINFODesigner import rules
 
 import os
@@ -46,8 +50,6 @@ __PATCH__ = 1
 
 __VERSION__ = str(__MAJOR__) + "." + str(__MINOR__) + "." + str(__PATCH__)
 
-png_header = bytes([137,80,78,71,13,10,26,10])
-
 class ShowText(Toplevel):
     def __init__(self, parent, title=None, text=None):
         super().__init__(parent)
@@ -59,11 +61,340 @@ class ShowText(Toplevel):
             self.title('Text')
 
         self.displayText = Text(self)
-        if text: self.displayText.insert(END, text)
+        if isinstance(text, str):
+            self.displayText.insert(END, text)
+        elif text:
+            # fragments are inserted as they are generated
+            for fragment in text:
+                self.displayText.insert(END, fragment)
         self.displayText.configure(state='disabled')
         self.displayText.pack(expand=True, fill=BOTH)
         Button(self, text='Close', command=self.destroy).pack(side=BOTTOM)
 
+class AutomapViewer(Toplevel):
+    """A map's automap to pan (drag) and zoom (mouse wheel, + and -)
+    around. Only the part in view is drawn, at the current zoom."""
+    def __init__(self, parent, title, mapgeometry):
+        super().__init__(parent)
+
+        self.geometry('640x640')
+        self.title(title)
+
+        self.map = mapgeometry
+        self.scale = None
+        self.min_scale = self.max_scale = None
+        self.left = self.top = 0.0
+        self.drag = None
+        self.redraw_pending = False
+        self.image = None
+
+        Button(self, text='Close', command=self.destroy).pack(side=BOTTOM)
+        self.canvas = Canvas(self, background='black', highlightthickness=0)
+        self.canvas.pack(expand=True, fill=BOTH)
+        self.canvas.bind('<Configure>', self.resized)
+        self.canvas.bind('<ButtonPress-1>', self.start_drag)
+        self.canvas.bind('<B1-Motion>', self.dragged)
+        self.canvas.bind('<MouseWheel>', self.wheel)
+        self.canvas.bind('<Button-4>', lambda e: self.zoom(1.25, e.x, e.y))
+        self.canvas.bind('<Button-5>', lambda e: self.zoom(0.8, e.x, e.y))
+        self.bind('<plus>', lambda e: self.zoom(1.25))
+        self.bind('<equal>', lambda e: self.zoom(1.25))
+        self.bind('<minus>', lambda e: self.zoom(0.8))
+
+    def fit(self):
+        """Zooms out to show the whole map."""
+        (width, height) = (self.canvas.winfo_width(), self.canvas.winfo_height())
+        (left, top, right, bottom) = self.map.bounds
+        self.scale = min((width - 16) / max(right - left, 1.0), (height - 16) / max(bottom - top, 1.0))
+        self.min_scale = self.scale / 4
+        self.max_scale = max(self.scale, 16.0)
+        self.left = (left + right) / 2 - width / 2 / self.scale
+        self.top = (top + bottom) / 2 - height / 2 / self.scale
+
+    def resized(self, event):
+        if self.scale is None:
+            self.fit()
+        self.redraw()
+
+    def start_drag(self, event):
+        self.drag = (event.x, event.y)
+
+    def dragged(self, event):
+        if self.drag:
+            self.left -= (event.x - self.drag[0]) / self.scale
+            self.top -= (event.y - self.drag[1]) / self.scale
+            self.drag = (event.x, event.y)
+            self.redraw()
+
+    def wheel(self, event):
+        self.zoom(1.25 if event.delta > 0 else 0.8, event.x, event.y)
+        # don't scroll the main window too
+        return "break"
+
+    def zoom(self, factor, x=None, y=None):
+        """Zooms by factor, keeping the point under (x, y) (by default
+        the middle) in place."""
+        if self.scale is None:
+            return
+        if x is None:
+            (x, y) = (self.canvas.winfo_width() / 2, self.canvas.winfo_height() / 2)
+        scale = min(max(self.scale * factor, self.min_scale), self.max_scale)
+        self.left += x / self.scale - x / scale
+        self.top += y / self.scale - y / scale
+        self.scale = scale
+        self.redraw()
+
+    def redraw(self):
+        """Draws once the events queued so far are handled, so that a
+        burst of drags or wheel turns draws only once."""
+        if not self.redraw_pending:
+            self.redraw_pending = True
+            self.after_idle(self.draw)
+
+    def draw(self):
+        self.redraw_pending = False
+        size = (max(self.canvas.winfo_width(), 1), max(self.canvas.winfo_height(), 1))
+        self.image = PIL.ImageTk.PhotoImage(maprender.render_view(self.map, self.left, self.top, self.scale, size))
+        self.canvas.delete('all')
+        self.canvas.create_image(0, 0, anchor='nw', image=self.image)
+
+class VirtualList(Frame):
+    """A scrolling list that only puts the rows in view into its
+    Listbox, so that showing 50 or 50000 items costs the same.
+    Generates <<ListboxSelect>> when the user selects an item."""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.items = []
+        self.first = 0
+        self.rows = 1
+        self.selected = None
+
+        self.lb = Listbox(self, selectmode=BROWSE, exportselection=False, activestyle='none')
+        self.sb = Scrollbar(self, orient="vertical", command=self.yview)
+        self.linespace = tkinter.font.Font(font=self.lb.cget('font')).metrics('linespace') + 1
+        self.lb.pack(side=LEFT, fill=BOTH, expand=True)
+        self.sb.pack(side=RIGHT, anchor=W, fill=Y)
+
+        self.lb.bind('<Configure>', self.resized)
+        self.lb.bind('<<ListboxSelect>>', self.clicked)
+        self.lb.bind('<MouseWheel>', lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.lb.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.lb.bind('<Button-5>', lambda e: self.scroll(3))
+        self.lb.bind('<Up>', lambda e: self.move(-1))
+        self.lb.bind('<Down>', lambda e: self.move(1))
+        self.lb.bind('<Prior>', lambda e: self.move(-self.rows))
+        self.lb.bind('<Next>', lambda e: self.move(self.rows))
+        self.lb.bind('<Home>', lambda e: self.move(-len(self.items)))
+        self.lb.bind('<End>', lambda e: self.move(len(self.items)))
+
+    def set_items(self, items, selected=None):
+        """Shows items (a sorted list, not copied) and selects the one
+        equal to selected, if it is there."""
+        self.items = items
+        self.first = 0
+        self.selected = None
+        if selected is not None:
+            i = bisect.bisect_left(items, selected)
+            if i < len(items) and items[i] == selected:
+                self.selected = i
+                self.see(i)
+        self.refresh()
+
+    def select_item(self, item):
+        """Selects the item equal to item, if it is there."""
+        i = bisect.bisect_left(self.items, item)
+        if i < len(self.items) and self.items[i] == item:
+            self.select(i)
+
+    def selection(self):
+        """The selected item, or None."""
+        return None if self.selected is None else self.items[self.selected]
+
+    def resized(self, event):
+        border = 2 * (int(self.lb.cget('borderwidth')) + int(self.lb.cget('highlightthickness')))
+        self.rows = max(1, (event.height - border) // self.linespace)
+        self.refresh()
+
+    def refresh(self):
+        """Puts the rows in view into the Listbox."""
+        self.first = max(0, min(self.first, len(self.items) - self.rows))
+        self.lb.delete(0, END)
+        self.lb.insert(END, *self.items[self.first:self.first + self.rows])
+        if self.selected is not None and 0 <= self.selected - self.first < self.rows:
+            self.lb.selection_set(self.selected - self.first)
+        if self.items:
+            self.sb.set(self.first / len(self.items), min(1.0, (self.first + self.rows) / len(self.items)))
+        else:
+            self.sb.set(0.0, 1.0)
+
+    def yview(self, *args):
+        """Scrollbar command."""
+        if args[0] == 'moveto':
+            self.first = int(float(args[1]) * len(self.items))
+            self.refresh()
+        elif args[0] == 'scroll':
+            self.scroll(int(args[1]) * (self.rows if args[2] == 'pages' else 1))
+
+    def scroll(self, rows):
+        self.first += rows
+        self.refresh()
+        return "break"
+
+    def see(self, i):
+        """Scrolls so that item i is in view."""
+        if i < self.first:
+            self.first = i
+        elif i >= self.first + self.rows:
+            self.first = i - self.rows + 1
+
+    def select(self, i):
+        if self.items:
+            self.selected = min(max(i, 0), len(self.items) - 1)
+            self.see(self.selected)
+            self.refresh()
+            self.event_generate("<<ListboxSelect>>")
+
+    def move(self, rows):
+        self.select(self.first if self.selected is None else self.selected + rows)
+        return "break"
+
+    def clicked(self, event):
+        chosen = self.lb.curselection()
+        if chosen and self.first + chosen[0] != self.selected:
+            self.selected = self.first + chosen[0]
+            self.event_generate("<<ListboxSelect>>")
+
+class Gallery(Toplevel):
+    """Thumbnails of graphics or flats in a grid. Only the cells in
+    view are drawn, and only thumbnails in or near view are decoded,
+    on worker threads, so that scrolling never waits for them. Clicking
+    a cell calls on_pick(name); double-clicking also closes the gallery."""
+    THUMBNAIL = (96, 80)
+    CELL = (112, 104)
+    # rows above and below the view to decode ahead of scrolling
+    AHEAD = 3
+
+    def __init__(self, parent, title, namespace, names, on_pick, selected=None):
+        super().__init__(parent)
+
+        self.geometry('640x480')
+        self.title(title)
+
+        self.parent = parent
+        self.namespace = namespace
+        self.names = names
+        self.on_pick = on_pick
+        self.selected = selected
+        self.columns = 1
+        self.redraw_pending = False
+        # PhotoImages on the canvas, which must be kept while shown
+        self.shown = {}
+        self.thumbnailer = thumbnails.Thumbnailer(self._root(), self.THUMBNAIL, flat=(namespace == "flats"), on_loaded=self.loaded)
+
+        Button(self, text='Close', command=self.close).pack(side=BOTTOM)
+        self.sb = Scrollbar(self, orient="vertical")
+        self.canvas = Canvas(self, highlightthickness=0, yscrollcommand=self.scrolled)
+        self.sb.config(command=self.canvas.yview)
+        self.sb.pack(side=RIGHT, fill=Y)
+        self.canvas.pack(expand=True, fill=BOTH)
+        self.canvas.bind('<Configure>', self.resized)
+        self.canvas.bind('<ButtonPress-1>', self.clicked)
+        self.canvas.bind('<Double-Button-1>', self.double_clicked)
+        self.canvas.bind('<MouseWheel>', lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        self.canvas.bind('<Button-4>', lambda e: self.scroll(-1))
+        self.canvas.bind('<Button-5>', lambda e: self.scroll(1))
+        self.protocol('WM_DELETE_WINDOW', self.close)
+
+        # the chooser holds the grab; take it while open
+        self.after(100, self.grab_set)
+
+    def close(self):
+        self.thumbnailer.cancel()
+        self.destroy()
+        self.parent.grab_set()
+
+    def resized(self, event):
+        columns = max(1, event.width // self.CELL[0])
+        rows = (len(self.names) + columns - 1) // columns
+        self.canvas.config(scrollregion=(0, 0, columns * self.CELL[0], rows * self.CELL[1]),
+                           yscrollincrement=self.CELL[1] // 4)
+        if columns != self.columns:
+            self.columns = columns
+            if self.selected in self.names:
+                row = self.names.index(self.selected) // columns
+                self.canvas.yview_moveto(row / max(rows, 1))
+        self.redraw()
+
+    def scrolled(self, first, last):
+        self.sb.set(first, last)
+        self.redraw()
+
+    def scroll(self, rows):
+        self.canvas.yview_scroll(rows, 'units')
+        # don't scroll the main window too
+        return "break"
+
+    def loaded(self, names):
+        self.redraw()
+
+    def redraw(self):
+        """Draws once the events queued so far are handled, so that
+        a burst of scrolling draws only once."""
+        if not self.redraw_pending:
+            self.redraw_pending = True
+            self.after_idle(self.draw)
+
+    def visible_rows(self):
+        """(first, last) rows in view, last not included."""
+        top = int(self.canvas.canvasy(0))
+        bottom = int(self.canvas.canvasy(self.canvas.winfo_height()))
+        return (max(0, top // self.CELL[1]), bottom // self.CELL[1] + 1)
+
+    def draw(self):
+        self.redraw_pending = False
+        if not self.winfo_exists():
+            return
+        (first, last) = self.visible_rows()
+        (width, height) = self.CELL
+        self.canvas.delete('all')
+        shown = {}
+        for i in range(first * self.columns, min(last * self.columns, len(self.names))):
+            name = self.names[i]
+            (x, y) = ((i % self.columns) * width, (i // self.columns) * height)
+            if name == self.selected:
+                self.canvas.create_rectangle(x + 1, y + 1, x + width - 1, y + height - 1, outline='blue', width=2)
+            image = wadreader.get_cached_picture_image(self.namespace, name, self.THUMBNAIL)
+            if image is not None:
+                shown[name] = image
+                self.canvas.create_image(x + width // 2, y + 4 + self.THUMBNAIL[1] // 2, image=image)
+            else:
+                self.canvas.create_rectangle(x + 8, y + 4, x + width - 8, y + 4 + self.THUMBNAIL[1], outline='gray')
+            self.canvas.create_text(x + width // 2, y + height - 10, text=name)
+        self.shown = shown
+        # what is in view first, then below it, then above it
+        rows = self.AHEAD
+        wanted = self.names[first * self.columns:(last + rows) * self.columns]
+        wanted += reversed(self.names[max(0, first - rows) * self.columns:first * self.columns])
+        self.thumbnailer.request(wadreader.picture_jobs(self.namespace, wanted, self.THUMBNAIL))
+
+    def cell_name(self, event):
+        column = int(self.canvas.canvasx(event.x)) // self.CELL[0]
+        i = int(self.canvas.canvasy(event.y)) // self.CELL[1] * self.columns + column
+        if column < self.columns and 0 <= i < len(self.names):
+            return self.names[i]
+        return None
+
+    def clicked(self, event):
+        name = self.cell_name(event)
+        if name is not None:
+            self.selected = name
+            self.redraw()
+            self.on_pick(name)
+
+    def double_clicked(self, event):
+        if self.cell_name(event) is not None:
+            self.close()
+
 class ChooseFromLists(Toplevel):
     """List chooser from waddata according to cateogry.
     Don't supply data -- if true/false flag is set, data will be appended
@@ -77,64 +408,57 @@ class ChooseFromLists(Toplevel):
             self.title('Choose an item')
 
         self.lf = LabelFrame(self, text=str(waddata_category).capitalize())
-        self.lb = Listbox(self.lf, selectmode=BROWSE)
+        # type-ahead filter on the start of the names
+        self.filtertext = StringVar()
+        self.filterentry = Entry(self.lf, textvariable=self.filtertext)
+        self.lb = VirtualList(self.lf)
         self.lb.bind('<<ListboxSelect>>', self.user_selection_changed)
-        self.sb = Scrollbar(self.lf, orient="vertical")
 
         self.glumps = None
+        self.namespace = None
         if waddata_category:
             waddata_category = waddata_category.lower()
 
         if waddata_category == "graphics":
             self.glumps = wadreader.get_waddata("glumps")
+            self.namespace = "graphics"
         elif waddata_category == "flats":
             self.glumps = wadreader.get_waddata("flumps")
+            self.namespace = "flats"
 
         if self.glumps:
             self.usercanvas = Canvas(self, width=323, height=203)
+            self.gallerybutton = Button(self, text="Show as gallery", command=self.show_gallery)
+            self.picturestats = StringVar(value="")
+            self.picturestatslabel = Label(self, textvariable=self.picturestats)
 
         self.bb = Button(self, text="Select " + str(waddata_category).rstrip('s'), command=self.sel_user)
 
-        self.sb.config(command=self.lb.yview)
-        self.lb.config(yscrollcommand=self.sb.set)
-
-        tosel = -1
-        idx = 0
-        for idx, el in enumerate(sorted(wadreader.get_waddata(waddata_category))):
-            self.lb.insert(END, str(el))
-            if str(el) == selected:
-                tosel = idx
-
-        if tosel >= 0:
-            self.lb.select_set(tosel)
-            self.lb.event_generate("<<ListboxSelect>>")
-            self.lb.see(tosel)
+        # names come sorted from waddata, so showing them costs nothing
+        self.lumps = wadreader.get_waddata(waddata_category)
+        self.lb.set_items(self.lumps.sorted_names(), selected)
 
+        self.datalumps = None
         if include_data:
             self.dlf = LabelFrame(self, text="Other data lumps")
             self.labelwarn = Label(self.dlf, text="Warning! These may not work!\nUse these only if you know what they are.")
-            self.dlb = Listbox(self.dlf, selectmode=BROWSE)
-            self.dsb = Scrollbar(self.dlf, orient="vertical")
+            self.dlb = VirtualList(self.dlf)
             self.dbb = Button(self, text="Select data lump", command=self.sel_data)
 
-            self.dsb.config(command=self.dlb.yview)
-            self.dlb.config(yscrollcommand=self.dsb.set)
-
-            for el in sorted(wadreader.get_waddata("data")):
-                self.dlb.insert(END, str(el))
+            self.datalumps = wadreader.get_waddata("data")
+            self.dlb.set_items(self.datalumps.sorted_names())
 
         if not cancel:
             cancel = "Cancel"
 
         self.cancelbtn = Button(self, text=cancel, command=self.sel_nothing)
 
+        self.filterentry.pack(side=TOP, fill=X)
         self.lb.pack(side=LEFT, fill=BOTH, expand=True)
-        self.sb.pack(side=RIGHT, anchor=W, fill=Y, expand=True)
 
         if include_data:
             self.labelwarn.pack(side=TOP)
             self.dlb.pack(side=LEFT, fill=BOTH, expand=True)
-            self.dsb.pack(side=RIGHT, anchor=W, fill=Y, expand=True)
 
         self.grid_columnconfigure(0, weight=1)
         self.grid_columnconfigure(1, weight=1)
@@ -143,42 +467,66 @@ class ChooseFromLists(Toplevel):
         self.lf.grid(row=0, column=0, sticky='nsew')
         if self.glumps:
             self.usercanvas.grid(row=0,column=1,sticky='nsew',pady=32)
+            self.gallerybutton.grid(row=1, column=1)
         self.bb.grid(row=1, column=0, sticky='ew')
         
         if include_data:
             self.dlf.grid(row=0, column=2, sticky='nsew')
             self.dbb.grid(row=1, column=2, sticky='ew')
         self.cancelbtn.grid(row=2, column=0, columnspan=2)
+        if self.glumps:
+            self.picturestatslabel.grid(row=3, column=0, columnspan=2, sticky='w')
+
+        if self.lb.selection() is not None:
+            self.user_selection_changed()
+        self.filtertext.trace_add('write', self.filter_changed)
+        self.filterentry.bind('<Down>', lambda e: self.lb.move(1))
+        self.filterentry.bind('<Up>', lambda e: self.lb.move(-1))
+        self.filterentry.bind('<Return>', lambda e: self.sel_user())
+        self.filterentry.focus_set()
 
         self.chosen = ""
 
+    def filter_changed(self, *args):
+        """Shows only the names starting with the filter text, keeping
+        the selection if it still matches."""
+        prefix = self.filtertext.get().strip().upper()
+        self.lb.set_items(self.lumps.with_prefix(prefix), self.lb.selection())
+        if self.datalumps is not None:
+            self.dlb.set_items(self.datalumps.with_prefix(prefix), self.dlb.selection())
+
+    def show_gallery(self):
+        """Thumbnails of the names listed (as filtered) to pick from."""
+        Gallery(self, self.title(), self.namespace, self.lb.items, self.lb.select_item, self.lb.selection())
+
     def user_selection_changed(self, *args):
-        if self.glumps and self.lb.curselection():
-            chosen = self.lb.get(self.lb.curselection())
-            if self.glumps[chosen].data[0:8] == png_header:
-                image = PIL.Image.open(io.BytesIO(self.glumps[chosen].data))
-            elif self.glumps[chosen].height <= 200 and self.glumps[chosen].width <= 320:
-                image = self.glumps[chosen].to_Image(mode="RGBA")
-            else:
+        chosen = self.lb.selection()
+        if self.glumps and chosen is not None:
+            # bigger graphics are shown scaled down to fit
+            self.img_conv = wadreader.get_waddata_picture_image(self.namespace, chosen, (323, 203))
+            if self.img_conv is None:
                 showwarning("Image not recognized", "Selected image format not recognized.")
                 return
-            self.img_conv = PIL.ImageTk.PhotoImage(image)
             imgx = (323 - self.img_conv.width())/2.0
             imgy = (203 - self.img_conv.height())/2.0
+            self.usercanvas.delete("all")
             self.usercanvas.create_image(imgx, imgy, image=self.img_conv, anchor=NW)
+            ((hits, misses, held, budget), (photo_hits, photo_misses, photo_held, photo_budget)) = wadreader.picture_cache_stats()
+            self.picturestats.set("Decoded pictures: " + str(hits) + " cached, " + str(misses) + " decoded, " + str(held // 1024) + " of " + str(budget // 1024) + " KiB\n" +
+                                  "Shown pictures: " + str(photo_hits) + " cached, " + str(photo_misses) + " made, " + str(photo_held // 1024) + " of " + str(photo_budget // 1024) + " KiB")
 
     def sel_nothing(self):
         self.chosen = ""
         self.destroy()
 
     def sel_data(self):
-        if self.dlb.curselection():
-            self.chosen = self.dlb.get(self.dlb.curselection())
+        if self.dlb.selection() is not None:
+            self.chosen = self.dlb.selection()
             self.destroy()
 
     def sel_user(self):
-        if self.lb.curselection():
-            self.chosen = self.lb.get(self.lb.curselection())
+        if self.lb.selection() is not None:
+            self.chosen = self.lb.selection()
             self.destroy()
 
     def get_selection(self):
@@ -227,8 +575,9 @@ class DesignerUI:
         self.addmapbtn = Button(self.buttonpanel, text="+", command=self.addmap)
         self.submapbtn = Button(self.buttonpanel, text="-", command=self.submap)
 
+        self.choose_iwad_button = Button(self.buttonpanel, text="Choose IWAD", command=self.prompt_for_iwad)
         self.chooseiwad.pack(side=BOTTOM, anchor=N, expand=True)
-        Button(self.buttonpanel, text="Choose IWAD", command=self.prompt_for_iwad).pack(side=BOTTOM, anchor=S, expand=False)
+        self.choose_iwad_button.pack(side=BOTTOM, anchor=S, expand=False)
         self.addmapbtn.pack(side=LEFT, expand=True)
         self.submapbtn.pack(side=RIGHT, expand=True)
         self.buttonpanel.pack(side=BOTTOM)
@@ -247,12 +596,33 @@ class DesignerUI:
         self.load_wad_button = Button(self.bottomframe, text="Load WAD", command=self.load_wad)
         self.load_wad_noerrors_button = Button(self.bottomframe, text="Load WAD (ignore errors)", command=self.load_wad_ignore_errors)
         self.clear_wad_button = Button(self.bottomframe, text="Restart", command=self.clear_wad)
+        self.load_folder_button = Button(self.bottomframe, text="Load WAD folder", command=self.load_wad_folder)
+        self.save_umapinfo_button = Button(self.bottomframe, text="Save UMAPINFO into WAD", command=self.save_umapinfo)
         self.load_wad_button.grid(row=0, column=0)
         self.load_wad_noerrors_button.grid(row=0, column=1)
-        Button(self.bottomframe, text="Show UMAPINFO", command=self.show_umapinfo).grid(row=0, column=2, padx=(16,0))
-        Button(self.bottomframe, text="Save UMAPINFO into WAD", command=self.save_umapinfo).grid(row=0, column=3)
-        self.bottomframe.grid_columnconfigure(4, weight=1)
-        self.clear_wad_button.grid(row=0, column=4, sticky='e')
+        self.load_folder_button.grid(row=0, column=2)
+        Button(self.bottomframe, text="Show UMAPINFO", command=self.show_umapinfo).grid(row=0, column=3, padx=(16,0))
+        self.save_umapinfo_button.grid(row=0, column=4)
+        self.bottomframe.grid_columnconfigure(5, weight=1)
+        self.clear_wad_button.grid(row=0, column=5, sticky='e')
+
+        # progress of WAD loading, only shown while loading
+        self.loader = None
+        self.restoring_iwad = False
+        self.automap_width = 189
+        self.prerenderer = prerender.Prerenderer(self.root, self.automap_width)
+        self.progressframe = Frame(self.bottomframe)
+        self.progresstext = StringVar(value="")
+        self.progressbar = Progressbar(self.progressframe, length=200, maximum=1.0)
+        Label(self.progressframe, textvariable=self.progresstext).pack(side=LEFT)
+        self.progressbar.pack(side=LEFT, padx=(8,8))
+        Button(self.progressframe, text="Cancel", command=self.cancel_load).pack(side=LEFT)
+        self.progressframe.grid(row=1, column=0, columnspan=6, sticky='w')
+        self.progressframe.grid_remove()
+
+        # everything that can't be used while a WAD is loading
+        self.loadpanel = [self.load_wad_button, self.load_wad_noerrors_button, self.load_folder_button, self.save_umapinfo_button,
+                          self.clear_wad_button, self.choose_iwad_button, self.chooseiwad]
 
         
         # create a scrollable canvas inside the main frame
@@ -290,6 +660,12 @@ class DesignerUI:
         # subframe 1: automap, grid layout
         self.automapcanvas = Canvas(self.automapframe, width=192, height=192)
         self.automapcanvas.grid(row=0, column=0, rowspan=4, sticky='ns')
+        self.automapcanvas.bind('<Double-Button-1>', lambda e: self.explore_automap())
+        self.automapstats = StringVar(value="")
+        Label(self.automapframe, textvariable=self.automapstats).grid(row=4, column=0, sticky='w')
+        self.exploreautomap_button = Button(self.automapframe, text="Explore map...", command=self.explore_automap)
+        self.exploreautomap_button.grid(row=4, column=1, sticky='w')
+        self.mainframe_inputlist.append(self.exploreautomap_button)
 
         self.automapname = StringVar(value="")
         self.automaplabelframe = LabelFrame(self.automapframe, text="Map title in automap")
@@ -582,6 +958,10 @@ class DesignerUI:
             pass
 
         # GUI is created; now populate and prepare the internals
+        try:
+            umapinfo.set_backend(config.get("umapinfo_backend", umapinfo.DICT_BACKEND))
+        except ValueError:
+            umapinfo.set_backend(umapinfo.DICT_BACKEND)
         self.clear_mainframe()
         self.toggle_mainframe(False)
         if config.configdata.iwads and config.validate_iwad_list():
@@ -618,6 +998,53 @@ class DesignerUI:
     def set_canvas_scrollregion(self):
         self.maincanvas.configure(scrollregion=self.maincanvas.bbox('all'))
 
+    def toggle_loadpanel(self, enable=True):
+        """Enable or disable everything that loads or saves WADs."""
+        for s in self.loadpanel:
+            if enable:
+                s.state(['!disabled'])
+            else:
+                s.state(['disabled'])
+
+    def start_loader(self, job, state, on_done, on_cancel=None):
+        """Runs a wadloader job in the background with the progress bar
+        shown. Cancels any job still running."""
+        if self.loader and self.loader.running():
+            self.loader.cancel()
+        # the maps are about to change
+        self.prerenderer.cancel()
+        def finished():
+            # a job cancelled for another one leaves the UI to that one
+            if self.loader is loader:
+                self.progressframe.grid_remove()
+                self.toggle_loadpanel(True)
+        def done(result):
+            finished()
+            on_done(result)
+        def error(e):
+            finished()
+            showerror("Error", "Error reading WAD file.\n" + "Error: " + str(e))
+        def cancelled():
+            if self.loader is loader:
+                finished()
+                if on_cancel:
+                    on_cancel()
+        def progress(message, fraction):
+            self.progresstext.set(message)
+            if fraction is not None:
+                self.progressbar['value'] = fraction
+        self.progresstext.set("")
+        self.progressbar['value'] = 0
+        self.progressframe.grid()
+        self.toggle_loadpanel(False)
+        loader = wadloader.WadLoader(self.root, job, state, done, error, progress, cancelled)
+        self.loader = loader
+        loader.start()
+
+    def cancel_load(self):
+        if self.loader:
+            self.loader.cancel()
+
     def toggle_sidepanel(self, enable=True):
         """Eanble or disable all user-interactables in the side frame."""
         for s in self.sidepanel:
@@ -650,15 +1077,26 @@ class DesignerUI:
 
     def change_iwad(self, iwad_name, iwad_fullpath):
         """Assumes all validation has been done and the user
-        has been warned."""
-        config.set_iwad(iwad_name)
-        umapinfo.clear_umapinfo()
-        wadreader.read_waddata_from_wad(iwad_fullpath, clean=True)
-        self.load_wad_button['text'] = "Load WAD"
-        self.load_wad_noerrors_button['text'] = "Load WAD (ignore errors)"
-        self.clear_mainframe()
-        self.refresh_map_list()
-        self.toggle_mainframe(False)
+        has been warned. The IWAD is loaded in the background and
+        replaces everything loaded once it is done."""
+        previous_iwad = config.get("last_iwad", "")
+        def done(result):
+            config.set_iwad(iwad_name)
+            umapinfo.clear_umapinfo()
+            self.load_wad_button['text'] = "Load WAD"
+            self.load_wad_noerrors_button['text'] = "Load WAD (ignore errors)"
+            self.clear_mainframe()
+            self.refresh_map_list()
+            self.toggle_mainframe(False)
+            self.start_prerender()
+        def cancelled():
+            # the previous IWAD is still loaded; show it as selected
+            # if there was one
+            if waddata.wad and previous_iwad in config.configdata.iwads:
+                self.restoring_iwad = True
+                self.refresh_iwad_list(previous_iwad)
+                self.restoring_iwad = False
+        self.start_loader(lambda loader: wadloader.load_iwad(loader, iwad_fullpath), waddatastate(), done, cancelled)
 
     def prompt_for_iwad(self):
         """Prompt and set a new IWAD."""
@@ -680,6 +1118,8 @@ class DesignerUI:
     def iwad_changed(self, *args):
         """Event trigger for user selecting a new IWAD from the drop-down list.
         This assumes the IWADs are all valid and validated."""
+        if self.restoring_iwad:
+            return
         self.change_iwad_warn(save=True)
         iw = self.selectediwad.get()
         self.change_iwad(iw, config.get_iwad(iw))
@@ -760,8 +1200,34 @@ class DesignerUI:
             if not umapinfo.has_map(self.umap):
                 self.umap = None
         self.mapimg = None
+        if self.umap:
+            self.prerenderer.focus(self.umap)
         self.refresh_mainframe(self.umap)
-    
+
+    def tree_maps(self):
+        """The maps in the tree view, top to bottom."""
+        maps = []
+        for item in self.tree.get_children():
+            children = self.tree.get_children(item)
+            if children:
+                maps.extend(self.tree.item(child)['values'][0] for child in children)
+            elif self.tree.item(item)['values'][0]:
+                maps.append(self.tree.item(item)['values'][0])
+        return [str(m) for m in maps]
+
+    def start_prerender(self):
+        """Renders the automaps of all loaded maps in the background:
+        those nearest the selected map along next and nextsecret first,
+        then the rest in tree order."""
+        maps = self.tree_maps()
+        listed = set(maps)
+        maps.extend(m for m in wadreader.get_waddata('maps').sorted_names() if m not in listed)
+        links = {}
+        for umap in umapinfo.umapinfo.u.keys():
+            targets = [umapinfo.get_key_value(umap, key) for key in ('next', 'nextsecret')]
+            links[umap] = [str(t).upper() for t in targets if t]
+        self.prerenderer.start(wadreader.map_image_jobs(maps, self.automap_width), links, self.umap)
+
     def refresh_extralabels_bossaction(self, umap, enable=True):
         # Boss Action
         if enable and (umap.endswith("M8") or umap in ["E4M6", "MAP07"]):
@@ -920,8 +1386,21 @@ class DesignerUI:
         # update tree view
         self.tree.item(self.tree.focus(), values=(self.umap, level))
         if not self.mapimg:
-            self.mapimg = wadreader.get_waddata_map_image(umap, width=189)
+            self.mapimg = wadreader.get_waddata_map_image(umap, width=self.automap_width)
+            self.automapcanvas.delete('all')
             self.automapcanvas.create_image(0, 0, anchor='nw', image=self.mapimg)
+            (hits, disk_hits, renders) = wadreader.automap_cache_stats()
+            self.automapstats.set("Cached: " + str(hits) + " in memory, " + str(disk_hits) + " on disk; drawn: " + str(renders))
+
+    def explore_automap(self):
+        """Open the selected map's automap to pan and zoom around."""
+        if not self.umap:
+            return
+        mapgeometry = wadreader.get_waddata_map_geometry(self.umap)
+        if mapgeometry is None or not len(mapgeometry):
+            showinfo("No automap", "The map " + str(self.umap) + " has no lines to show.\nIs it in a loaded WAD?")
+            return
+        AutomapViewer(self.root, "Automap: " + str(self.umap), mapgeometry)
 
     def submap(self):
         """Remove the currently-selected map."""
@@ -944,50 +1423,85 @@ class DesignerUI:
             self.load_wad(validate=False)
 
     def load_wad(self, validate=True, show_errors=False, show_warnings=False):
-        """Load a WAD and its contents into waddata."""
+        """Load one or more WADs and their contents into waddata."""
         if umapinfo.umapinfo.modified and not askyesno("Unsaved Changes","You have unsaved changes. Loading a new WAD will clear out any current UMAPINFO.\n\nAre you sure?"):
             return
-        wfile = askopenfilename(parent=self.root, title="Choose a PWAD", filetypes=[("WAD Files", "*.wad")], multiple=False)
-        if not wfile: return
+        wfiles = askopenfilenames(parent=self.root, title="Choose one or more PWADs", filetypes=[("WAD Files", "*.wad")])
+        if not wfiles: return
+        if len(wfiles) > 1:
+            self.load_wads(wfiles, validate, show_errors, show_warnings)
+            return
+        wfile = wfiles[0]
         if wadreader.is_wad_loaded(wfile):
             showerror("Error: Already loaded", "Error: This WAD file is already loaded.")
             return
-        try:
-            if not wadreader.read_waddata_from_wad_if_match(wfile, config.settings.is_doom(), config.settings.is_doom2()):
-                showerror("Error: Incompatible IWAD", "Error: The loaded PWAD has a UMAPINFO incompatible with the loaded IWAD.")
+        doom = config.settings.is_doom()
+        doom2 = config.settings.is_doom2()
+        def job(loader):
+            return wadloader.load_pwad(loader, wfile, doom, doom2, validate)
+        self.start_loader(job, waddata.snapshot(), lambda result: self.wad_loaded(result, validate, show_errors, show_warnings))
+
+    def load_wad_folder(self):
+        """Load every PWAD in a folder, in order of file name."""
+        if umapinfo.umapinfo.modified and not askyesno("Unsaved Changes","You have unsaved changes. Loading a new WAD will clear out any current UMAPINFO.\n\nAre you sure?"):
+            return
+        folder = askdirectory(parent=self.root, title="Choose a folder of PWADs", mustexist=True)
+        if not folder: return
+        # the folder is read, and its IWADs picked out, by the loader
+        self.load_wads(None, folder=folder)
+
+    def load_wads(self, wfiles, validate=True, show_errors=False, show_warnings=False, folder=None):
+        """Load several WADs in the given order, reading them in parallel,
+        or if given a folder, every PWAD in it."""
+        doom = config.settings.is_doom()
+        doom2 = config.settings.is_doom2()
+        def job(loader):
+            if folder is not None:
+                return wadloader.load_pwad_folder(loader, folder, doom, doom2, validate)
+            return wadloader.load_pwads(loader, list(wfiles), doom, doom2, validate)
+        def done(result):
+            if result is None:
+                showerror("Error: No PWADs", "Error: The folder has no PWADs in it.")
                 return
-            uinf = wadreader.get_waddata_umapinfo()
-            self.load_wad_button['text'] = "Add another WAD"
-            self.load_wad_noerrors_button['text'] = "Add another WAD (ignore errors)"
-            if uinf:
-                if validate:
-                    warnings = {}
-                    errors = {}
-                    valuechecker.check_all_keys_and_remove_bad(uinf, warnings, errors)
-                    # only show errors
-                    if show_errors:
-                        for umap in errors:
-                            if errors[umap]:
-                                errorstr = ""
-                                for key in errors[umap]:
-                                    errorstr += str(key) + ": "
-                                    for err in errors[umap][key]:
-                                        errorstr += str(err) + "\n"
-                                showerror("Error: Removed Invalid key(s)", "Errors detected on " + str(umap) + "\n\nKeys removed:\n\n" + errorstr + "\n")
-                    if show_warnings:
-                        for umap in warnings:
-                            if warnings[umap]:
-                                warningstr = ""
-                                for key in warnings[umap]:
-                                    warningstr += str(key) + ": "
-                                    for warn in warnings[umap][key]:
-                                        warningstr += str(warn) + "\n"
-                                showwarning("Warning: Issue with key(s)", "Warnings detected on " + str(umap) + "\n\nKeys warned:\n\n" + warningstr + "\n")
-                umapinfo.load_umapinfo(uinf)
-                umapinfo.umapinfo.modified = False
-                self.refresh_map_list()
-        except Exception as e:
-            showerror("Error", "Error reading WAD file.\n" + "Error: " + str(e))
+            (uinf, warnings, errors, incompatible) = result
+            if incompatible:
+                showerror("Error: Incompatible IWAD", "Error: These PWADs have a UMAPINFO incompatible with the loaded IWAD and were skipped:\n\n" + "\n".join([os.path.basename(w) for w in incompatible]))
+            self.wad_loaded((uinf, warnings, errors), validate, show_errors, show_warnings)
+        self.start_loader(job, waddata.snapshot(), done)
+
+    def wad_loaded(self, result, validate, show_errors, show_warnings):
+        """Called once load_wad has loaded a WAD into waddata."""
+        if result is None:
+            showerror("Error: Incompatible IWAD", "Error: The loaded PWAD has a UMAPINFO incompatible with the loaded IWAD.")
+            return
+        (uinf, warnings, errors) = result
+        self.load_wad_button['text'] = "Add another WAD"
+        self.load_wad_noerrors_button['text'] = "Add another WAD (ignore errors)"
+        if uinf:
+            if validate:
+                # only show errors
+                if show_errors:
+                    for umap in errors:
+                        if errors[umap]:
+                            errorstr = ""
+                            for key in errors[umap]:
+                                errorstr += str(key) + ": "
+                                for err in errors[umap][key]:
+                                    errorstr += str(err) + "\n"
+                            showerror("Error: Removed Invalid key(s)", "Errors detected on " + str(umap) + "\n\nKeys removed:\n\n" + errorstr + "\n")
+                if show_warnings:
+                    for umap in warnings:
+                        if warnings[umap]:
+                            warningstr = ""
+                            for key in warnings[umap]:
+                                warningstr += str(key) + ": "
+                                for warn in warnings[umap][key]:
+                                    warningstr += str(warn) + "\n"
+                            showwarning("Warning: Issue with key(s)", "Warnings detected on " + str(umap) + "\n\nKeys warned:\n\n" + warningstr + "\n")
+            umapinfo.load_umapinfo(uinf)
+            umapinfo.umapinfo.modified = False
+            self.refresh_map_list()
+        self.start_prerender()
 
     def toggle_labelclear(self, *args):
         # disable label entry
@@ -1032,7 +1546,6 @@ class DesignerUI:
 
     def nextlevel_changed(self, *args):
         if not self.umap: return
-        has_next = umapinfo.has_key(self.umap, "next")
         choice_next = self.choosenextlevel_stringvar.get()
         endgame = False
 
@@ -1086,7 +1599,6 @@ class DesignerUI:
 
     def nextsecretlevel_changed(self, *args):
         if not self.umap: return
-        has_nextsecret = umapinfo.has_key(self.umap, "nextsecret")
         choice_nextsecret = self.choosenextsecretlevel_stringvar.get()
 
         # Default/Same as normal exit and end game do not
@@ -1292,7 +1804,6 @@ class DesignerUI:
 
             all_ba = umapinfo.get_key(self.umap, "bossaction", full_list=True)
             umapinfo.del_key(self.umap, "bossaction")
-            new_ba = []
             for ba in all_ba:
                 if not (ba.utype == UType.TUPLE and tuple(ba.value) == ba_uv.value):
                     umapinfo.add_key(self.umap, "bossaction", UType.TUPLE, ba.value, append=True)
@@ -1369,17 +1880,26 @@ class DesignerUI:
             return
         iwfile = asksaveasfilename(parent=self.root, title="Choose a PWAD", filetypes=[("PWAD Files", "*.wad")])
         if iwfile:
+            # the workers read lumps straight from the mapped file
+            rendering = self.prerenderer.running()
             try:
-                wadwriter.write_umapinfo_to_wad(iwfile, parser.generate_umapinfo(umapinfo.umapinfo.u))
+                lump = bytearray()
+                umapinfo.write_umapinfo(lump)
+                self.prerenderer.cancel(wait=True)
+                thumbnails.wait()
+                wadreader.release_wad_file(iwfile)
+                wadwriter.write_umapinfo_to_wad(iwfile, lump)
                 umapinfo.umapinfo.modified = False
             except Exception as e:
                 showerror("Error", "Error writing WAD file. Consider copying your UMAPINFO to a text file.\n" + "Error: " + str(e))
+            if rendering:
+                self.start_prerender()
 
     def show_umapinfo(self):
         if not umapinfo.umapinfo.u:
             showerror("Error: No UMAPINFO", "Error: You haven't entered any UMAPINFO information yet.")
             return
-        umapshow = ShowText(self.root, title="UMAPINFO Text", text=parser.generate_umapinfo(umapinfo.umapinfo.u))
+        umapshow = ShowText(self.root, title="UMAPINFO Text", text=umapinfo.iter_umapinfo())
         umapshow.grab_set()
 
     def close_warn(self):
@@ -1428,7 +1948,6 @@ class DesignerUI:
 
     def refresh_interstat_frame(self):
         ni_um = umapinfo.get_key(self.umap, "nointermission")
-        noint = self.interstat_nointermission_intvar.get()
         if ni_um and ni_um.utype == UType.KEYWORD and ni_um.value.lower() == 'true':
             self.interstat_nointermission_intvar.set(1)
             self.interstat_levelpic_label['state'] = 'disabled'
@@ -0,0 +1,171 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Size-capped on-disk cache of plain Python data.
+
+Entries are marshalled, zlib-compressed and stored one per file with
+a checksum, so truncated or corrupt entries are detected and dropped
+instead of being returned. A file's modification time is its last
+use; once the cache grows past its cap the least recently used
+entries are evicted. The size of the cache is kept as a running total
+between scans of the directory, so that only a write that takes it
+past the cap scans it."""
+
+import hashlib
+import marshal
+import os
+import tempfile
+import threading
+import zlib
+
+_MAGIC = b'UDC1'
+_CHECKSUM_SIZE = 16
+_SUFFIX = '.udc'
+
+def digest(*parts):
+    """Hex cache key of a sequence of bytes-like or string parts."""
+    h = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        # length-prefixed so that parts can't run into each other
+        h.update(len(part).to_bytes(8, 'little'))
+        h.update(part)
+    return h.hexdigest()
+
+class DiskCache():
+    def __init__(self, directory, max_bytes=32 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # bytes in the cache as of the last scan plus the writes since,
+        # or None before the first scan; other caches or processes
+        # writing to the directory are only seen at the next scan
+        self.total = None
+        self.lock = threading.Lock()
+
+    def _added(self, size):
+        with self.lock:
+            if self.total is not None:
+                self.total += size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key):
+        """Returns the data stored under key, or None if there
+        is no usable entry."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                blob = f.read()
+        except OSError:
+            return None
+        header = len(_MAGIC) + _CHECKSUM_SIZE
+        payload = blob[header:]
+        try:
+            if blob[:len(_MAGIC)] != _MAGIC or \
+                    blob[len(_MAGIC):header] != hashlib.blake2b(payload, digest_size=_CHECKSUM_SIZE).digest():
+                raise ValueError("Checksum mismatch")
+            data = marshal.loads(zlib.decompress(payload))
+        except (ValueError, EOFError, TypeError, zlib.error):
+            self.discard(key)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        """Stores data (anything marshal accepts) under key.
+        Failing to write is not an error; the entry is just not cached."""
+        payload = zlib.compress(marshal.dumps(data))
+        blob = _MAGIC + hashlib.blake2b(payload, digest_size=_CHECKSUM_SIZE).digest() + payload
+        path = self._path(key)
+        tmp = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # a file of its own for each writer, threads of the same
+            # process included, so that they can't clobber each other
+            (fd, tmp) = tempfile.mkstemp(suffix='.tmp', prefix=key + '.', dir=self.directory)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(blob)
+            try:
+                replaced = os.stat(path).st_size
+            except OSError:
+                replaced = 0
+            os.replace(tmp, path)
+        except OSError:
+            if tmp is not None:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            return False
+        self._added(len(blob) - replaced)
+        if self.total is None or self.total > self.max_bytes:
+            self.evict()
+        return True
+
+    def discard(self, key):
+        path = self._path(key)
+        try:
+            size = os.stat(path).st_size
+            os.remove(path)
+        except OSError:
+            return
+        self._added(-size)
+
+    def entries(self):
+        """Returns (mtime, size, path) of every entry, oldest first."""
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(_SUFFIX):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            pass
+        entries.sort()
+        return entries
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits its cap."""
+        entries = self.entries()
+        total = sum(size for (mtime, size, path) in entries)
+        for (mtime, size, path) in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self.lock:
+            self.total = total
+
+    def clear(self):
+        for (mtime, size, path) in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self.lock:
+            self.total = None
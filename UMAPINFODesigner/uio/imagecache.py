@@ -0,0 +1,221 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Caches of rendered images.
+
+LRUCache keeps PIL images in memory up to a byte budget. Automap
+previews also go to a DiskCache as PNG, so that they survive restarts;
+see automap(). Decoded graphics and flats, and the Tk PhotoImages made
+of them, are kept in memory only; see picture() and photo()."""
+import io
+from collections import OrderedDict
+from PIL import Image
+from UMAPINFODesigner.uio import diskcache
+
+def image_size(im):
+    """Bytes of pixel data in a PIL image."""
+    return im.size[0] * im.size[1] * len(im.getbands())
+
+def photo_size(photo):
+    """Bytes Tk holds for a PhotoImage (it keeps 4 per pixel)."""
+    return photo.width() * photo.height() * 4
+
+class LRUCache():
+    """Keeps the most recently used values up to max_bytes in total,
+    as measured by sizeof(value). Counts hits and misses."""
+    def __init__(self, max_bytes, sizeof=image_size):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """The value stored under key, or None."""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value[0]
+
+    def put(self, key, value):
+        """Stores value under key, evicting least recently used values
+        to stay within max_bytes. A value bigger than that isn't kept."""
+        self.discard(key)
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            (value, size) = self.entries.popitem(last=False)[1]
+            self.bytes -= size
+
+    def discard(self, key):
+        value = self.entries.pop(key, None)
+        if value is not None:
+            self.bytes -= value[1]
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+def to_png(im):
+    out = io.BytesIO()
+    im.save(out, format='PNG')
+    return out.getvalue()
+
+def from_png(data):
+    """A PIL image from PNG data, or None if it can't be decoded."""
+    try:
+        im = Image.open(io.BytesIO(data))
+        im.load()
+    except (OSError, ValueError, SyntaxError):
+        return None
+    return im
+
+class automapcache():
+    memory = None
+    disk = None
+    disk_hits = 0
+
+def configure(memory_bytes, directory=None, disk_bytes=None):
+    """Sets up the automap caches: memory_bytes of images in memory
+    and, if directory is given, PNGs on disk up to disk_bytes.
+    Counters start again from zero."""
+    automapcache.memory = LRUCache(memory_bytes)
+    automapcache.disk = diskcache.DiskCache(directory, disk_bytes) if directory else None
+    automapcache.disk_hits = 0
+
+def is_cached(key):
+    """Whether an automap is in the memory cache. Doesn't count as a use."""
+    return automapcache.memory is not None and key in automapcache.memory
+
+def remember(key, im):
+    """Puts an automap in the memory cache."""
+    if automapcache.memory is not None:
+        automapcache.memory.put(key, im)
+
+def from_disk(key):
+    """The automap stored on disk under key, or None. Safe to call
+    from any thread."""
+    if automapcache.disk is None:
+        return None
+    data = automapcache.disk.get(key)
+    return from_png(data) if data is not None else None
+
+def to_disk(key, im):
+    """Stores an automap on disk. Safe to call from any thread."""
+    if automapcache.disk is not None:
+        automapcache.disk.put(key, to_png(im))
+
+def automap(key, render):
+    """The automap image cached under key (a string), or else the one
+    render() returns, which is then cached. render() may return None
+    (e.g. for a map without geometry); that isn't cached."""
+    if automapcache.memory is None:
+        return render()
+    im = automapcache.memory.get(key)
+    if im is not None:
+        return im
+    im = from_disk(key)
+    if im is not None:
+        automapcache.disk_hits += 1
+        remember(key, im)
+        return im
+    im = render()
+    if im is not None:
+        remember(key, im)
+        to_disk(key, im)
+    return im
+
+def stats():
+    """(hits in memory, hits on disk, renders) since configure()."""
+    if automapcache.memory is None:
+        return (0, 0, 0)
+    return (automapcache.memory.hits, automapcache.disk_hits,
+            automapcache.memory.misses - automapcache.disk_hits)
+
+class picturecache():
+    memory = None
+    photos = None
+
+def configure_pictures(memory_bytes):
+    """Sets up the caches of decoded graphics: memory_bytes of PIL
+    images, and a quarter of that again of PhotoImages made of them.
+    Counters start again from zero."""
+    picturecache.memory = LRUCache(memory_bytes)
+    picturecache.photos = LRUCache(memory_bytes // 4, photo_size)
+
+def picture(key, decode):
+    """The decoded graphic cached under key, or else the one decode()
+    returns, which is then cached. decode() may return None (e.g. for
+    a lump that isn't a graphic); that isn't cached."""
+    if picturecache.memory is None:
+        return decode()
+    im = picturecache.memory.get(key)
+    if im is None:
+        im = decode()
+        if im is not None:
+            picturecache.memory.put(key, im)
+    return im
+
+def is_picture_cached(key):
+    """Whether a decoded graphic is in the memory cache. Doesn't count as a use."""
+    return picturecache.memory is not None and key in picturecache.memory
+
+def remember_picture(key, im):
+    """Puts a decoded graphic in the memory cache."""
+    if picturecache.memory is not None:
+        picturecache.memory.put(key, im)
+
+def photo(key, im, make):
+    """The PhotoImage cached under key, or else make(im), which is
+    then cached. Only call this from the thread running Tk. An evicted
+    PhotoImage stays valid for as long as something refers to it, so
+    whoever shows one must keep a reference, as with any PhotoImage."""
+    if picturecache.photos is None:
+        return make(im)
+    p = picturecache.photos.get(key)
+    if p is None:
+        p = make(im)
+        picturecache.photos.put(key, p)
+    return p
+
+def picture_stats():
+    """(hits, misses, bytes held, budget in bytes) of the decoded
+    graphics cache since configure_pictures()."""
+    memory = picturecache.memory
+    if memory is None:
+        return (0, 0, 0, 0)
+    return (memory.hits, memory.misses, memory.bytes, memory.max_bytes)
+
+def photo_stats():
+    """(hits, misses, bytes held, budget in bytes) of the PhotoImage
+    cache since configure_pictures()."""
+    photos = picturecache.photos
+    if photos is None:
+        return (0, 0, 0, 0)
+    return (photos.hits, photos.misses, photos.bytes, photos.max_bytes)
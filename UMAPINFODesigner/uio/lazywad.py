@@ -0,0 +1,391 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Reads WAD files lazily.
+
+Only the header and the directory are read up front. Lumps are sorted
+into the same groups omg.WAD uses (maps, graphics, flats, music, ...),
+but each lump reads its data from the file the first time .data is
+accessed.
+
+By default the file is memory-mapped and lump data is a memoryview
+into the mapping, so nothing is copied and only the pages actually
+touched become resident.
+
+The sorted directory can be saved with to_index() and restored with
+from_index(), which skips reading and sorting the directory.
+
+Every WAD read has a .fingerprint of its content (see fingerprint()),
+so the same WAD is recognized whatever its path or file name."""
+import hashlib
+import mmap
+import os
+import struct
+import omg
+import omg.palette
+import omg.util
+import omg.wad
+
+_header = struct.Struct('<4sII')
+_entry = struct.Struct('<II8s')
+
+# bump when the layout of to_index() or how fingerprints are made changes
+INDEX_VERSION = 5
+
+# lumps whose whole content goes into the fingerprint, because what is
+# derived from them (parsed UMAPINFO, validation, textures, automaps)
+# is cached by it
+_FINGERPRINT_WHOLE = frozenset([b'UMAPINFO', b'TEXTURE1', b'TEXTURE2', b'PNAMES',
+                                b'VERTEXES', b'LINEDEFS', b'TEXTMAP'])
+# how many other lumps are sampled, and how much of each
+_FINGERPRINT_SAMPLES = 64
+_FINGERPRINT_SAMPLE_SIZE = 4096
+
+def _read_directory(f):
+    """Reads (header, directory) of an open WAD file.
+    Throws IOError if it isn't a valid WAD."""
+    st = os.fstat(f.fileno())
+    header = f.read(_header.size)
+    if len(header) < _header.size:
+        raise IOError("The file is not a valid WAD file.")
+    (wadtype, dir_len, dir_ptr) = _header.unpack(header)
+    if wadtype not in (b'PWAD', b'IWAD'):
+        raise IOError("The file is not a valid WAD file.")
+    if st.st_size < dir_ptr + dir_len * _entry.size:
+        raise IOError("Invalid directory information in header.")
+    f.seek(dir_ptr)
+    return (header, f.read(dir_len * _entry.size))
+
+def fingerprint(data, header, directory):
+    """Hex fingerprint of the content of a WAD, given all of the file
+    as a buffer (e.g. a memoryview of its mapping, so that only the
+    pages hashed are read): a hash of its header, its directory, the
+    whole of the lumps things are derived from (UMAPINFO, textures,
+    map geometry) and the start of a sample of the other lumps spread
+    over the directory."""
+    data = memoryview(data)
+    h = hashlib.blake2b(header, digest_size=16)
+    h.update(directory)
+    count = len(directory) // _entry.size
+    step = max(1, count // _FINGERPRINT_SAMPLES)
+    sample = _FINGERPRINT_SAMPLE_SIZE
+    for (i, (ptr, size, name)) in enumerate(_entry.iter_unpack(directory)):
+        if not size:
+            continue
+        name = name.rstrip(b'\0').upper()
+        if name in _FINGERPRINT_WHOLE:
+            h.update(data[ptr:ptr + size])
+        elif i % step == 0:
+            h.update(data[ptr:ptr + min(size, sample)])
+    return h.hexdigest()
+
+class fingerprintcache():
+    # fingerprints of the files seen so far, by (real path, size,
+    # modification time), so that a file is only hashed once
+    known = {}
+
+def _file_key(path, st):
+    return (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+
+def _file_fingerprint(f, st, header, directory):
+    """The fingerprint of an open WAD file, hashed through a mapping
+    of it unless it was seen before."""
+    key = _file_key(f.name, st)
+    known = fingerprintcache.known.get(key)
+    if known is not None:
+        return known
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+        with memoryview(mapping) as view:
+            result = fingerprint(view, header, directory)
+    fingerprintcache.known[key] = result
+    return result
+
+def file_fingerprint(filename):
+    """The fingerprint of a WAD file, without loading it. Only hashed
+    the first time; afterwards only the file's size and modification
+    time are checked. Throws IOError if it isn't a valid WAD."""
+    st = os.stat(filename)
+    known = fingerprintcache.known.get(_file_key(filename, st))
+    if known is not None:
+        return known
+    with open(filename, 'rb') as f:
+        st = os.fstat(f.fileno())
+        (header, directory) = _read_directory(f)
+        return _file_fingerprint(f, st, header, directory)
+
+class DirectoryEntry():
+    __slots__ = ('name', 'ptr', 'size', 'been_read')
+
+    def __init__(self, name, ptr, size):
+        self.name = name
+        self.ptr = ptr
+        self.size = size
+        self.been_read = False
+
+class LumpRef():
+    """Where a lump's data is in its WAD file."""
+    __slots__ = ('wad', 'ptr', 'size')
+
+    def __init__(self, wad, ptr, size):
+        self.wad = wad
+        self.ptr = ptr
+        self.size = size
+
+    def load(self, f=None):
+        return self.wad.read_lump(self.ptr, self.size, f)
+
+class LazyDirectory():
+    """Stands in for omg's WadIO while the groups sort the directory,
+    handing out LumpRefs instead of lump data."""
+    def __init__(self, wad, entries):
+        self.wad = wad
+        self.entries = entries
+
+    def read(self, i):
+        entry = self.entries[i]
+        return LumpRef(self.wad, entry.ptr, entry.size)
+
+_lazy_types = {}
+
+def lazy_lumptype(lumptype):
+    """Returns a subclass of an omg lump type whose data is loaded
+    from a LumpRef on first access."""
+    lazy = _lazy_types.get(lumptype)
+    if lazy is not None:
+        return lazy
+
+    def __init__(self, data=None, *args, **kwargs):
+        ref = None
+        if isinstance(data, LumpRef):
+            ref = data
+            data = None
+        lumptype.__init__(self, data, *args, **kwargs)
+        if ref is not None:
+            self._ref = ref
+            self._data = None
+
+    def get_data(self):
+        if self._data is None:
+            self._data = self._ref.load()
+        return self._data
+
+    def set_data(self, data):
+        self._ref = None
+        self._data = data
+
+    def is_loaded(self):
+        return self._data is not None
+
+    def load(self, f=None):
+        """Reads the data now, optionally from an already open file."""
+        if self._data is None:
+            self._data = self._ref.load(f)
+
+    def copy(self):
+        self.load()
+        return omg.util.deepcopy(self)
+
+    lazy = type('Lazy' + lumptype.__name__, (lumptype,), {
+        '__init__': __init__,
+        'data': property(get_data, set_data),
+        'is_loaded': is_loaded,
+        'load': load,
+        'copy': copy,
+    })
+    _lazy_types[lumptype] = lazy
+    return lazy
+
+class LazyWAD():
+    """Read-only stand-in for omg.WAD that loads lump data on demand.
+    Has the same groups (.maps, .graphics, .flats, .music, .txdefs,
+    .data, ...) holding the same lumps as omg.WAD would."""
+
+    def __init__(self, from_file=None, structure=omg.wad.defstruct, use_mmap=True):
+        self.path = None
+        self.identity = None
+        self.use_mmap = use_mmap
+        self.file = None
+        self.map = None
+        self.view = None
+        self.type = None
+        # textures.read_wad_textures(), if already known
+        self.texture_defs = None
+        self.fingerprint = None
+        self.palette = omg.palette.default
+        self.structure = structure
+        self.groups = []
+        for group_def in self.structure:
+            instance = group_def[0](group_def[1], lazy_lumptype(group_def[2]), *group_def[3:])
+            self.__dict__[group_def[1]] = instance
+            self.groups.append(instance)
+        if from_file:
+            self.from_file(from_file)
+
+    def from_file(self, filename):
+        """Reads the header and directory of a WAD file.
+        Throws IOError if it isn't a valid WAD."""
+        with open(filename, 'rb') as f:
+            st = os.fstat(f.fileno())
+            (header, directory) = _read_directory(f)
+            self.fingerprint = _file_fingerprint(f, st, header, directory)
+        self.open(filename, st)
+        self.type = str(header[:4], 'ascii')
+        self.load_directory(directory)
+
+    def from_index(self, filename, index, identity=None):
+        """Restores the groups from a to_index() of the same, unchanged
+        file without reading its directory.
+        Throws IOError if identity (the .identity of the LazyWAD the
+        index was made from) is given and the file no longer matches."""
+        (wadtype, wadfingerprint, groups) = index
+        with open(filename, 'rb') as f:
+            st = os.fstat(f.fileno())
+        if identity is not None and tuple(identity) != (st.st_size, st.st_mtime_ns):
+            raise IOError(os.path.basename(filename) + " changed on disk while it was loaded.")
+        self.open(filename, st)
+        self.type = wadtype
+        self.fingerprint = wadfingerprint
+        fingerprintcache.known[_file_key(filename, st)] = wadfingerprint
+        for (name, entries) in groups:
+            group = self.__dict__[name]
+            lumptype = group.lumptype
+            if isinstance(group, omg.wad.HeaderGroup):
+                for (mapname, lumps) in entries:
+                    umap = omg.wad.NameGroup()
+                    for (lumpname, ptr, size) in lumps:
+                        umap[lumpname] = lumptype(LumpRef(self, ptr, size))
+                    group[mapname] = umap
+            else:
+                for (lumpname, ptr, size) in entries:
+                    group[lumpname] = lumptype(LumpRef(self, ptr, size))
+
+    def to_index(self):
+        """The sorted directory as plain tuples that marshal can store:
+        (type, fingerprint, [(group name, [(lump name, ptr, size), ...]), ...]),
+        with [(map name, [(lump name, ptr, size), ...]), ...] for maps.
+        Throws ValueError if a lump was replaced since loading."""
+        def location(name, lump):
+            ref = getattr(lump, '_ref', None)
+            if ref is None:
+                raise ValueError("Lump " + name + " is not from " + str(self.path) + ".")
+            return (name, ref.ptr, ref.size)
+        groups = []
+        for group in self.groups:
+            if isinstance(group, omg.wad.HeaderGroup):
+                entries = [(mapname, [location(name, lump) for (name, lump) in umap.items()])
+                           for (mapname, umap) in group.items()]
+            else:
+                entries = [location(name, lump) for (name, lump) in group.items()]
+            groups.append((group._name, entries))
+        return (self.type, self.fingerprint, groups)
+
+    def open(self, filename, st):
+        """Takes note of the file that lumps are read from (and maps
+        it) given its os.stat() from when the directory was read."""
+        self.path = os.path.realpath(filename)
+        self.identity = (st.st_size, st.st_mtime_ns)
+        if self.use_mmap:
+            self.file = open(self.path, 'rb')
+            if os.fstat(self.file.fileno()).st_size != st.st_size:
+                self.file.close()
+                self.file = None
+                raise IOError(os.path.basename(self.path) + " changed on disk while it was loaded.")
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+
+    def load_directory(self, directory):
+        """Sorts raw directory entries into the groups."""
+        safe_name = omg.util.safe_name
+        zstrip = omg.util.zstrip
+        entries = [DirectoryEntry(safe_name(zstrip(name)), ptr, size)
+                   for (ptr, size, name) in _entry.iter_unpack(directory)]
+        lazydir = LazyDirectory(self, entries)
+        for group in self.groups:
+            group.load_wadio(lazydir)
+        # map header lumps are created as plain Lumps by omg
+        header_type = lazy_lumptype(omg.lump.Lump)
+        for group in self.groups:
+            if isinstance(group, omg.wad.HeaderGroup):
+                for umap in group.values():
+                    header = umap.get("_HEADER_")
+                    if header is not None and isinstance(header.data, LumpRef):
+                        umap["_HEADER_"] = header_type(header.data)
+
+    def read_lump(self, ptr, size, f=None):
+        """Reads lump data from the WAD file, as a memoryview of the
+        mapping if the WAD is memory-mapped.
+        Throws IOError if the file changed since it was opened."""
+        if not size:
+            return bytes()
+        if self.view is not None:
+            # the mapping survives the file being renamed or replaced,
+            # but touching pages past a truncation would crash
+            if os.fstat(self.file.fileno()).st_size != self.identity[0]:
+                raise IOError(os.path.basename(self.path) + " was truncated since it was loaded.")
+            return self.view[ptr:ptr + size]
+        if f is None:
+            with open(self.path, 'rb') as f:
+                return self.read_lump(ptr, size, f)
+        st = os.fstat(f.fileno())
+        if (st.st_size, st.st_mtime_ns) != self.identity:
+            raise IOError(os.path.basename(self.path) + " changed on disk since it was loaded.")
+        f.seek(ptr)
+        return f.read(size)
+
+    def lumps(self):
+        """Generates every lump of the WAD."""
+        for group in self.groups:
+            for lump in group.values():
+                if isinstance(lump, omg.wad.LumpGroup):
+                    for maplump in lump.values():
+                        yield maplump
+                else:
+                    yield lump
+
+    def load_all(self):
+        """Reads every lump into memory and lets go of the file,
+        e.g. before the file is replaced."""
+        if self.path is None:
+            return
+        if self.view is not None:
+            for lump in self.lumps():
+                if isinstance(lump.data, memoryview):
+                    lump.data = bytes(lump.data)
+            self.close()
+            return
+        with open(self.path, 'rb') as f:
+            for lump in self.lumps():
+                load = getattr(lump, 'load', None)
+                if load is not None:
+                    load(f)
+
+    def close(self):
+        """Unmaps and closes the WAD file. Lumps that were not
+        loaded can't be read afterwards."""
+        try:
+            if self.view is not None:
+                self.view.release()
+            if self.map is not None:
+                self.map.close()
+        except BufferError:
+            # views of it are still held elsewhere; it is
+            # unmapped once they are gone
+            pass
+        self.view = None
+        self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,225 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Single-pass tokenizer for UMAPINFO text.
+
+Comments and whitespace are consumed by the scanner and never copied.
+Every token records the line and column (both 1-based) it starts on."""
+
+import re
+from collections import namedtuple
+
+Token = namedtuple('Token', ['kind', 'text', 'line', 'col'])
+
+# token kinds
+WORD = 'word'
+STRING = 'string'
+PUNCT = 'punct'
+
+class UMAPINFOSyntaxError(ValueError):
+    """Raised when UMAPINFO text is not structured properly.
+    offset is where in the text the lexer gave up, if it did."""
+    def __init__(self, message, line=0, col=0, offset=None):
+        super().__init__("line " + str(line) + ", column " + str(col) + ": " + message)
+        self.message = message
+        self.line = line
+        self.col = col
+        self.offset = offset
+
+_WORD_RE = r'[^\s{}=,"/]+(?:/(?![/*])[^\s{}=,"/]*)*'
+_STRING_RE = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+_COMMENT_RE = r'(?://[^\n]*|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/)'
+# whitespace and comments, written so that it can never backtrack
+_GAP_RE = r'\s*(?:' + _COMMENT_RE + r'\s*)*'
+_ATOM_RE = '(?:' + _STRING_RE + '|' + _WORD_RE + ')'
+
+# Leading whitespace (line breaks included) is folded into every match
+# so that each loop iteration produces a real token. Alternatives are
+# ordered by how often they occur in a typical UMAPINFO.
+_token_re = re.compile(r'''\s*(?:
+    (?P<word>''' + _WORD_RE + r''')
+  | (?P<punct>[{}=,])
+  | (?P<string>''' + _STRING_RE + r''')
+  | (?P<comment>''' + _COMMENT_RE + r''')
+  | (?P<end>$)
+  | (?P<error>.)
+)''', re.VERBOSE | re.DOTALL)
+
+# Statement-level scanner used by the parser. A whole "key = value"
+# pair (continuation lines included) is one match, so the loop runs
+# once per line instead of once per token.
+_statement_re = re.compile(r'''\s*(?:
+    (?P<key>''' + _WORD_RE + r''')[ \t]*=[ \t]*
+        (?P<atom>''' + _ATOM_RE + ''')(?P<list>(?:''' + _GAP_RE + ',' + _GAP_RE + _ATOM_RE + r''')+)?
+  | [Mm][Aa][Pp]\s+(?P<map>''' + _ATOM_RE + ')' + _GAP_RE + r'''\{
+  | (?P<close>\})
+  | (?P<comment>''' + _COMMENT_RE + r''')
+  | (?P<end>$)
+  | (?P<error>.)
+)''', re.VERBOSE | re.DOTALL)
+
+_WORD = _token_re.groupindex['word']
+_PUNCT = _token_re.groupindex['punct']
+_STRING = _token_re.groupindex['string']
+_COMMENT = _token_re.groupindex['comment']
+_END = _token_re.groupindex['end']
+
+# statement kinds
+PAIR = 'pair'
+LIST = 'list'
+MAP = 'map'
+CLOSE = 'close'
+
+_PAIR = _statement_re.groupindex['atom']
+_LIST = _statement_re.groupindex['list']
+_MAP = _statement_re.groupindex['map']
+_CLOSE = _statement_re.groupindex['close']
+_STATEMENT_COMMENT = _statement_re.groupindex['comment']
+_STATEMENT_END = _statement_re.groupindex['end']
+
+_atom_re = re.compile(_ATOM_RE)
+_unescape_re = re.compile(r'\\(.)', re.DOTALL)
+
+def unescape(text):
+    """Strip the quotes from a raw STRING token and resolve its escapes."""
+    if '\\' in text:
+        return _unescape_re.sub(r'\1', text[1:-1])
+    return text[1:-1]
+
+def split_atoms(value):
+    """Split a raw LIST value into its raw atoms.
+    Returns (atoms, multiline) where multiline is True if the list
+    continues over more than one line."""
+    if '/' not in value:
+        # no comments possible, so everything but the atoms is
+        # whitespace and commas
+        atoms = _atom_re.findall(value)
+        multiline = '\n' in value and '\n' in _atom_re.sub('', value)
+        return (atoms, multiline)
+    atoms = []
+    multiline = False
+    comma_line = None
+    for tok in tokenize(value):
+        if tok.kind == PUNCT:
+            comma_line = tok.line
+        else:
+            if comma_line is not None and tok.line > comma_line:
+                multiline = True
+            atoms.append(tok.text)
+    return (atoms, multiline)
+
+def position(text, offset):
+    """Line and column (both 1-based) of an offset into text."""
+    line_start = text.rfind('\n', 0, offset) + 1
+    return (text.count('\n', 0, offset) + 1, offset - line_start + 1)
+
+_missing_value_re = re.compile(_WORD_RE + r'\s*=')
+_missing_brace_re = re.compile(r'[Mm][Aa][Pp]\s+' + _ATOM_RE)
+
+def _error(text, offset):
+    line, col = position(text, offset)
+    if _missing_value_re.match(text, offset):
+        raise UMAPINFOSyntaxError("Missing value for key " + repr(text[offset:text.index('=', offset)].strip()) + ".", line, col, offset)
+    elif _missing_brace_re.match(text, offset):
+        raise UMAPINFOSyntaxError("Expected '{' after map name.", line, col, offset)
+    elif text[offset] == '"':
+        raise UMAPINFOSyntaxError("Unterminated string.", line, col, offset)
+    elif text.startswith('/*', offset):
+        raise UMAPINFOSyntaxError("Unterminated comment.", line, col, offset)
+    raise UMAPINFOSyntaxError("Unexpected character " + repr(text[offset]) + ".", line, col, offset)
+
+# A statement cut short by the end of the text: a key, maybe with its
+# '=' and the start of its value, the rest of a list after a comma, or
+# 'map' with maybe its name; any of them can end in the start of a
+# string or a comment.
+_OPEN_STRING_RE = r'"[^"\\]*(?:\\.[^"\\]*)*\\?'
+_OPEN_COMMENT_RE = r'/(?:\*.*)?'
+_cut_short_re = re.compile(r'''(?:
+    ''' + _WORD_RE + r'''[ \t]*(?:=[ \t]*(?:''' + _WORD_RE + r'''|(?P<value>''' + _OPEN_STRING_RE + r'''))?)?
+  | ,''' + _GAP_RE + r'''(?:''' + _WORD_RE + r'''|(?P<atom>''' + _OPEN_STRING_RE + r''')|(?P<gap>''' + _OPEN_COMMENT_RE + r'''))?
+  | [Mm][Aa][Pp]\s+(?:''' + _WORD_RE + r'''|(?P<name>''' + _OPEN_STRING_RE + r''')|''' + _STRING_RE + r''')?''' + _GAP_RE + r'''(?P<mapgap>''' + _OPEN_COMMENT_RE + r''')?
+  | (?P<comment>''' + _OPEN_COMMENT_RE + r''')
+)''', re.VERBOSE | re.DOTALL)
+
+def cut_short(text, offset):
+    """Whether an error at offset could be because the text stops
+    early, in the middle of a statement that more text would complete.
+    Returns None if not; else what has to follow for it to parse: '*/'
+    in an open comment, '"' in an open string, or '' for anything."""
+    m = _cut_short_re.fullmatch(text, offset)
+    if m is None:
+        return None
+    if m.lastgroup in ('value', 'atom', 'name'):
+        return '"'
+    if m.lastgroup in ('gap', 'mapgap', 'comment') and text.startswith('/*', m.start(m.lastgroup)):
+        return '*/'
+    return ''
+
+def tokenize(text):
+    """Generate Tokens from a UMAPINFO string.
+    Throws UMAPINFOSyntaxError on characters that can't start a token."""
+    make = tuple.__new__
+    count = text.count
+    line = 1
+    line_start = 0
+    last = 0
+    for m in _token_re.finditer(text):
+        idx = m.lastindex
+        start = m.start(idx)
+        # only skipped whitespace and the previous token can span lines
+        breaks = count('\n', last, start)
+        if breaks:
+            line += breaks
+            line_start = text.rindex('\n', last, start) + 1
+        last = start
+        if idx == _WORD:
+            yield make(Token, (WORD, m.group(idx), line, start - line_start + 1))
+        elif idx == _PUNCT:
+            yield make(Token, (PUNCT, m.group(idx), line, start - line_start + 1))
+        elif idx == _STRING:
+            yield make(Token, (STRING, m.group(idx), line, start - line_start + 1))
+        elif idx == _COMMENT:
+            pass
+        elif idx == _END:
+            return
+        else:
+            _error(text, start)
+
+def scan(text):
+    """Generate (kind, text, value, offset) statements from a UMAPINFO string.
+
+    kind is PAIR (text is the key, value its single raw atom),
+    LIST (text is the key, value the raw comma-separated atoms, which
+    can be split into Tokens with tokenize()), MAP (text is the raw
+    map name) or CLOSE. offset can be turned into a line and column
+    with position().
+    Throws UMAPINFOSyntaxError on anything that can't start a statement."""
+    for m in _statement_re.finditer(text):
+        idx = m.lastindex
+        if idx == _PAIR:
+            yield (PAIR, m.group(1), m.group(idx), m.start(1))
+        elif idx == _LIST:
+            yield (LIST, m.group(1), m.group(_PAIR) + m.group(idx), m.start(1))
+        elif idx == _MAP:
+            yield (MAP, m.group(idx), None, m.start(idx))
+        elif idx == _CLOSE:
+            yield (CLOSE, None, None, m.start(idx))
+        elif idx == _STATEMENT_COMMENT:
+            pass
+        elif idx == _STATEMENT_END:
+            return
+        else:
+            _error(text, m.start(idx))
@@ -0,0 +1,280 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Draws the automap of a map with numpy.
+
+Only VERTEXES and LINEDEFS are decoded, straight from the lump data
+with numpy.frombuffer, or for UDMF maps, the vertexes and linedefs
+of TEXTMAP (see udmf.py). Scaling, colouring and rasterising every line
+are array operations; the result is the same, pixel for pixel, as
+drawing the lines one by one with ImageDraw.line."""
+import numpy
+from PIL import Image
+from UMAPINFODesigner.uio import udmf
+
+# bump when the images drawn change, so cached ones aren't used
+RENDER_VERSION = 1
+
+_vertex = numpy.dtype([('x', '<i2'), ('y', '<i2')])
+# vx_a, vx_b, flags, action of Doom and Hexen format linedefs
+_linedef = numpy.dtype({'names': ['a', 'b', 'flags', 'action'],
+                        'formats': ['<u2', '<u2', '<u2', '<u2'],
+                        'offsets': [0, 2, 4, 6], 'itemsize': 14})
+_zlinedef = numpy.dtype({'names': ['a', 'b', 'flags', 'action'],
+                         'formats': ['<u2', '<u2', '<u2', 'u1'],
+                         'offsets': [0, 2, 4, 6], 'itemsize': 16})
+_TWO_SIDED = 0x4
+
+# one-sided, two-sided, and lines with an action
+_colors = numpy.array([(52, 235, 131), (206, 224, 214), (217, 214, 50)], dtype=numpy.uint8)
+_ONE_SIDED = 0
+_TWO_SIDED_COLOR = 1
+_ACTION = 2
+
+def _records(dtype, data):
+    """Lump data (bytes or a memoryview) as an array of records. A
+    trailing partial record is zero-padded, the same as omg.MapEditor does."""
+    partial = len(data) % dtype.itemsize
+    if partial:
+        data = bytes(data) + bytes(dtype.itemsize - partial)
+    return numpy.frombuffer(data, dtype=dtype)
+
+def read_map_lines(mapw):
+    """Reads what the automap needs from a map straight from its lumps.
+    Returns (vertexes, linedefs) where vertexes is an array of (x, y)
+    and linedefs an array of (a, b, flags, action) records, or None
+    if the map has no geometry."""
+    if 'TEXTMAP' in mapw:
+        return udmf.read_textmap(mapw['TEXTMAP'].data)
+    if 'VERTEXES' not in mapw or 'LINEDEFS' not in mapw:
+        return None
+    vertexes = _records(_vertex, mapw['VERTEXES'].data)
+    record = _zlinedef if 'BEHAVIOR' in mapw else _linedef
+    return (vertexes, _records(record, mapw['LINEDEFS'].data))
+
+def _scale(vertexes, width):
+    """Scales the vertexes to fit width, flipping y. Returns
+    (x, y, xmin, ymin, xmax, ymax) in image units."""
+    # floats hold binary maps' coordinates exactly, and UDMF's as they are
+    x = vertexes['x'].astype(numpy.float64)
+    y = -vertexes['y'].astype(numpy.float64)
+    xmin = ymin = 32767
+    xmax = ymax = -32768
+    if len(vertexes):
+        xmin = min(xmin, float(x.min()))
+        xmax = max(xmax, float(x.max()))
+        ymin = min(ymin, float(y.min()))
+        ymax = max(ymax, float(y.max()))
+
+    xscale = width / float(xmax - xmin)
+    yscale = width / float(ymax - ymin)
+    xmax = int(xmax * xscale)
+    xmin = int(xmin * xscale)
+    ymax = int(ymax * yscale)
+    ymin = int(ymin * yscale)
+
+    # numpy.rint rounds halves to even, like round()
+    x = numpy.rint(x * xscale).astype(numpy.int64)
+    y = numpy.rint(y * yscale).astype(numpy.int64)
+    return (x, y, xmin, ymin, xmax, ymax)
+
+def _rasterize(x0, y0, x1, y1):
+    """The pixels of lines from (x0, y0) to (x1, y1), as ImageDraw.line
+    draws them one pixel wide: Bresenham from the first point, both
+    ends included. Returns (line, x, y) with the line of each pixel."""
+    dx = numpy.abs(x1 - x0)
+    dy = numpy.abs(y1 - y0)
+    xs = numpy.where(x1 >= x0, 1, -1)
+    ys = numpy.where(y1 >= y0, 1, -1)
+    xmajor = dx >= dy
+    major = numpy.where(xmajor, dx, dy)
+    minor = numpy.where(xmajor, dy, dx)
+    counts = major + 1
+    line = numpy.repeat(numpy.arange(len(counts)), counts)
+    starts = numpy.cumsum(counts) - counts
+    step = numpy.arange(len(line)) - starts[line]
+    # how far along the minor axis Bresenham has moved at each step
+    # (halves round up: the error term steps on >= 0)
+    major = major[line]
+    shift = (2 * minor[line] * step + major) // numpy.maximum(2 * major, 1)
+    along_x = xmajor[line]
+    x = x0[line] + xs[line] * numpy.where(along_x, step, shift)
+    y = y0[line] + ys[line] * numpy.where(along_x, shift, step)
+    return (line, x, y)
+
+def _draw_order(linedefs):
+    """Orders linedefs the way they are drawn: two-sided first, then
+    one-sided. Returns (linedefs, their colours as indexes into _colors)."""
+    two_sided = (linedefs['flags'] & _TWO_SIDED) != 0
+    order = numpy.concatenate((numpy.flatnonzero(two_sided), numpy.flatnonzero(~two_sided)))
+    linedefs = linedefs[order]
+    two_sided = two_sided[order]
+    color = numpy.where(linedefs['action'] != 0, _ACTION,
+                        numpy.where(two_sided, _TWO_SIDED_COLOR, _ONE_SIDED))
+    return (linedefs, color)
+
+def _draw(size, x0, y0, x1, y1, color):
+    """An image of size with lines from (x0, y0) to (x1, y1) drawn in
+    color, each line over the ones before it."""
+    (line, px, py) = _rasterize(x0, y0, x1, y1)
+    inside = (px >= 0) & (px < size[0]) & (py >= 0) & (py < size[1])
+    # where lines cross, the one drawn last wins
+    top = numpy.full(size[0] * size[1], -1, dtype=numpy.intp)
+    numpy.maximum.at(top, py[inside] * size[0] + px[inside], line[inside])
+    pixels = numpy.zeros((size[0] * size[1], 3), dtype=numpy.uint8)
+    drawn = top >= 0
+    pixels[drawn] = _colors[color[top[drawn]]]
+    return Image.fromarray(pixels.reshape(size[1], size[0], 3), 'RGB')
+
+def render_map(mapw, width=192):
+    """The automap of a map as a PIL Image, or None if it has no
+    geometry. Lines are drawn two-sided first, then one-sided, each
+    line over the ones before it."""
+    # adapted from:
+    # https://github.com/devinacker/omgifol/blob/master/demo/drawmaps.py
+    lines = read_map_lines(mapw)
+    if not lines:
+        return None
+    (vertexes, linedefs) = lines
+    (x, y, xmin, ymin, xmax, ymax) = _scale(vertexes, width)
+    size = ((xmax - xmin) + 8, (ymax - ymin) + 8)
+    (linedefs, color) = _draw_order(linedefs)
+    a = linedefs['a'].astype(numpy.intp)
+    b = linedefs['b'].astype(numpy.intp)
+    return _draw(size, x[a] - xmin + 4, y[a] - ymin + 4, x[b] - xmin + 4, y[b] - ymin + 4, color)
+
+class GridIndex():
+    """A uniform grid over the bounding boxes of lines, for finding
+    the lines in a rectangle without looking at all of them.
+
+    Each line is listed in every cell its bounding box touches. The
+    lists are kept as one array sorted by cell, row by row, so the
+    cells of one row of a rectangle are a single slice."""
+
+    def __init__(self, x1, y1, x2, y2, cells=None):
+        self.left = numpy.minimum(x1, x2)
+        self.top = numpy.minimum(y1, y2)
+        self.right = numpy.maximum(x1, x2)
+        self.bottom = numpy.maximum(y1, y2)
+        count = len(x1)
+        if count:
+            self.bounds = (float(self.left.min()), float(self.top.min()),
+                           float(self.right.max()), float(self.bottom.max()))
+        else:
+            self.bounds = (0.0, 0.0, 0.0, 0.0)
+        extent = max(self.bounds[2] - self.bounds[0], self.bounds[3] - self.bounds[1], 1.0)
+        # about one line per cell
+        if cells is None:
+            cells = max(1, int(count ** 0.5))
+        self.cell = extent / cells
+        self.columns = int((self.bounds[2] - self.bounds[0]) // self.cell) + 1
+        self.rows = int((self.bounds[3] - self.bounds[1]) // self.cell) + 1
+        (c0, r0) = self._cell(self.left, self.top)
+        (c1, r1) = self._cell(self.right, self.bottom)
+        widths = c1 - c0 + 1
+        spans = widths * (r1 - r0 + 1)
+        line = numpy.repeat(numpy.arange(count), spans)
+        n = numpy.arange(len(line)) - numpy.repeat(numpy.cumsum(spans) - spans, spans)
+        cell = (r0[line] + n // widths[line]) * self.columns + c0[line] + n % widths[line]
+        order = numpy.argsort(cell, kind='stable')
+        self.lines = line[order]
+        self.starts = numpy.searchsorted(cell[order], numpy.arange(self.rows * self.columns + 1))
+
+    def _cell(self, x, y):
+        column = numpy.clip(((x - self.bounds[0]) // self.cell).astype(numpy.intp), 0, self.columns - 1)
+        row = numpy.clip(((y - self.bounds[1]) // self.cell).astype(numpy.intp), 0, self.rows - 1)
+        return (column, row)
+
+    def query(self, left, top, right, bottom):
+        """The lines whose bounding boxes overlap the rectangle, in
+        ascending order."""
+        if right < self.bounds[0] or left > self.bounds[2] or bottom < self.bounds[1] or top > self.bounds[3]:
+            return numpy.zeros(0, dtype=numpy.intp)
+        ((c0, c1), (r0, r1)) = [numpy.clip(((numpy.array(v) - b) // self.cell).astype(numpy.intp), 0, n - 1)
+                                for (v, b, n) in (((left, right), self.bounds[0], self.columns),
+                                                  ((top, bottom), self.bounds[1], self.rows))]
+        # a line in several cells is found several times
+        found = numpy.zeros(len(self.left), dtype=bool)
+        for r in range(r0, r1 + 1):
+            found[self.lines[self.starts[r * self.columns + c0]:self.starts[r * self.columns + c1 + 1]]] = True
+        found = numpy.flatnonzero(found)
+        hit = (self.right[found] >= left) & (self.left[found] <= right) & \
+              (self.bottom[found] >= top) & (self.top[found] <= bottom)
+        return found[hit]
+
+class MapGeometry():
+    """The lines of a map in draw order, in map units with y pointing
+    down, with a GridIndex over them. See read_map_geometry()."""
+
+    def __init__(self, vertexes, linedefs):
+        (linedefs, self.color) = _draw_order(linedefs)
+        x = vertexes['x'].astype(numpy.float64)
+        y = -vertexes['y'].astype(numpy.float64)
+        a = linedefs['a'].astype(numpy.intp)
+        b = linedefs['b'].astype(numpy.intp)
+        (self.x1, self.y1, self.x2, self.y2) = (x[a], y[a], x[b], y[b])
+        self.index = GridIndex(self.x1, self.y1, self.x2, self.y2)
+        self.bounds = self.index.bounds
+
+    def __len__(self):
+        return len(self.color)
+
+def read_map_geometry(mapw):
+    """A map's MapGeometry, or None if it has no geometry."""
+    lines = read_map_lines(mapw)
+    if not lines:
+        return None
+    return MapGeometry(*lines)
+
+def _clip(x0, y0, x1, y1, right, bottom):
+    """Clips lines to the rectangle from (0, 0) to (right, bottom),
+    Liang-Barsky style. Returns the clipped ends and which lines are
+    at least partly inside."""
+    dx = x1 - x0
+    dy = y1 - y0
+    start = numpy.zeros(len(x0))
+    end = numpy.ones(len(x0))
+    inside = numpy.ones(len(x0), dtype=bool)
+    for (p, q) in ((-dx, x0), (dx, right - x0), (-dy, y0), (dy, bottom - y0)):
+        parallel = p == 0
+        inside &= ~(parallel & (q < 0))
+        r = q / numpy.where(parallel, 1.0, p)
+        start = numpy.where(p < 0, numpy.maximum(start, r), start)
+        end = numpy.where(p > 0, numpy.minimum(end, r), end)
+    inside &= start <= end
+    return (x0 + start * dx, y0 + start * dy, x0 + end * dx, y0 + end * dy, inside)
+
+def render_view(geometry, left, top, scale, size):
+    """Draws the part of a map in view, for zooming and panning: left
+    and top are the map coordinates (y down) of the top left corner,
+    scale is pixels per map unit and size the image size.
+
+    Only lines the grid index finds in view are drawn, clipped to it.
+    Lines shorter than a pixel are details that just add noise when
+    zoomed out: two-sided ones without an action are skipped, the
+    rest drawn as a single pixel."""
+    (width, height) = size
+    visible = geometry.index.query(left, top, left + width / scale, top + height / scale)
+    x0 = (geometry.x1[visible] - left) * scale
+    y0 = (geometry.y1[visible] - top) * scale
+    x1 = (geometry.x2[visible] - left) * scale
+    y1 = (geometry.y2[visible] - top) * scale
+    color = geometry.color[visible]
+    tiny = numpy.maximum(numpy.abs(x1 - x0), numpy.abs(y1 - y0)) < 1.0
+    keep = ~(tiny & (color == _TWO_SIDED_COLOR))
+    (x0, y0, x1, y1, inside) = _clip(x0[keep], y0[keep], x1[keep], y1[keep], width - 0.5, height - 0.5)
+    (x0, y0, x1, y1) = [numpy.rint(v[inside]).astype(numpy.int64) for v in (x0, y0, x1, y1)]
+    return _draw(size, x0, y0, x1, y1, color[keep][inside])
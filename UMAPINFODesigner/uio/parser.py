@@ -20,125 +20,256 @@ Does NOT care if the key/value pairs are valid.
 
 Will only fail against an improperly-structured UMAPINFO file."""
 
-import sys
-import io
-import re
-import UMAPINFODesigner.structure as structure
+import codecs
+from array import array
+from UMAPINFODesigner.structure import utypes
+from UMAPINFODesigner.uio import lexer
 from collections import defaultdict
+from collections import OrderedDict
 
-def is_tuple(val):
-    skip = False
-    quote = False
-    for c in val:
-        if skip:
-            skip = False
-        elif c == "\\":
-            skip = True
-        elif c == '"':
-            quote = not quote
-        elif c == ',' and not quote:
-            return True
-    return False
-
-def parse_value(val):
-    """Parse a single UMAPINFO value of any type."""
-    utype = structure.utypes.UType.UNKNOWN
-    valstring = str(val)
-    valprocessed = None
-    if valstring.isnumeric():
-        utype = structure.utypes.UType.NUMBER
-        valprocessed = int(val)
-    elif ",|" in valstring:
-        # multiline string is the only value with a newline
-        utype = structure.utypes.UType.MULTISTRING
-        valprocessed = valstring.split(",|")
-        for v in range(len(valprocessed)):
-            # remove quote wraps
-            vs = valprocessed[v].strip()[1:-1]
-            # un-escape remaining quotes (will be re-added when
-            # exported.
-            vs = vs.replace('\\"', '"')
-            valprocessed[v] = vs
-    elif is_tuple(valstring):
-        utype = structure.utypes.UType.TUPLE
-        valprocessed = valstring.split(',')
-        for v in range(len(valprocessed)):
-            valprocessed[v] = valprocessed[v].strip()
-    elif valstring.lower() in ['clear', 'true', 'false']:
-        utype = structure.utypes.UType.KEYWORD
-        valprocessed = valstring
-    elif '"' in valstring:
-        utype = structure.utypes.UType.STRING
-        valprocessed = valstring.strip().strip('"')
-
-    return structure.utypes.UMAPINFOValue(valprocessed, utype)
+# bump whenever parsing changes what a UMAPINFO parses to;
+# cached parse results of other versions are ignored
+PARSER_VERSION = 2
 
-def parse_umapinfo(umapinfo):
-    """Parses a full umapinfo. Expects a UMAPINFO as a string."""
-    import re
-    parsed_umapinfo = {}
-
-    # Delete all comments
-    umapinfo = re.sub(re.compile(r"/\*.*?\*/",re.DOTALL|re.MULTILINE),'',umapinfo)
-    umapinfo = re.sub(r'//.*','',umapinfo)
-
-    # Parse maps
-    maps = re.split('{|}',umapinfo)
-    inmap = False
-    for m in maps:
-        m = m.strip()
-        if not m:
-            continue
-        if not inmap and m[:4].upper() == "MAP ":
-            inmap = m[4:].strip()
-        else:
-            # FIXME: Don't rely on a magic character combo here
-            m = re.sub(r',[ \t]*[\r\n]+',',|',m,flags=re.MULTILINE)
-            m = m.split("\n")
+_keywords = frozenset(['clear', 'true', 'false'])
+
+def _atom_value(text):
+    """Value of a single atom: a string, number or keyword."""
+    if text[0] == '"':
+        return utypes.intern_value(lexer.unescape(text), utypes.UType.STRING)
+    elif text.isdecimal():
+        return utypes.intern_value(int(text), utypes.UType.NUMBER)
+    elif text.lower() in _keywords:
+        return utypes.intern_value(text, utypes.UType.KEYWORD)
+    return utypes.UMAPINFOValue(None, utypes.UType.UNKNOWN)
+
+def _list_value(value):
+    """Value of a comma-separated atom list.
+    A list continued over several lines is a multiline string,
+    otherwise it is a tuple which keeps each atom as written."""
+    (atoms, multiline) = lexer.split_atoms(value)
+    if multiline:
+        return utypes.UMAPINFOValue(tuple([lexer.unescape(a) if a[0] == '"' else a for a in atoms]), utypes.UType.MULTISTRING)
+    return utypes.UMAPINFOValue(tuple(atoms), utypes.UType.TUPLE)
+
+def _parse_blocks(umapinfo, final=True):
+    """Generate (mapname, keyvals, end) for each complete map block in a
+    UMAPINFO string, where end is the offset just past its closing brace.
+    Unless final is set, the string may stop in the middle of a block,
+    which is then left for the caller to parse again with the rest.
+    Throws UMAPINFOSyntaxError (a ValueError) if the UMAPINFO is malformed."""
+    keyvals = None
+    mapname = None
+    opening = 0
+    # Megawad UMAPINFOs repeat the same keys and single-atom values
+    # (music lumps, skies, keywords) over and over. Values are never
+    # modified in place, so one instance per distinct atom is shared.
+    atoms = {}
+    keys = {}
+    for (kind, text, value, offset) in lexer.scan(umapinfo):
+        if kind == lexer.PAIR or kind == lexer.LIST:
+            if keyvals is None:
+                raise lexer.UMAPINFOSyntaxError("Key " + repr(text) + " outside of a map block.", *lexer.position(umapinfo, offset))
+            key = keys.get(text)
+            if key is None:
+                key = keys[text] = text.lower()
+            if kind == lexer.PAIR:
+                uv = atoms.get(value)
+                if uv is None:
+                    uv = atoms[value] = _atom_value(value)
+                keyvals[key].append(uv)
+            else:
+                keyvals[key].append(_list_value(value))
+        elif kind == lexer.MAP:
+            if keyvals is not None:
+                raise lexer.UMAPINFOSyntaxError("Unterminated map block.", *lexer.position(umapinfo, opening))
+            if text[0] == '"':
+                text = lexer.unescape(text)
+            mapname = text
             keyvals = defaultdict(list)
-            for kv in m:
-                kv = kv.strip()
-                if not kv:
-                    continue
-                (k,v) = kv.split('=')
-                keyvals[k.strip().lower()].append(parse_value(v.strip()))
-            parsed_umapinfo[inmap] = keyvals
-            inmap = False
+            opening = offset
+        elif kind == lexer.CLOSE:
+            if keyvals is None:
+                raise lexer.UMAPINFOSyntaxError("Unexpected '}'.", *lexer.position(umapinfo, offset))
+            yield (mapname, keyvals, offset + 1)
+            keyvals = None
+    if keyvals is not None and final:
+        raise lexer.UMAPINFOSyntaxError("Unterminated map block.", *lexer.position(umapinfo, opening))
+
+def _text_chunks(source, encoding, chunk_size):
+    """Generate (text, final) chunks of decoded UMAPINFO from a string,
+    a bytes-like object, an mmap or a file-like object."""
+    if isinstance(source, str):
+        yield (source, True)
+        return
+    decoder = codecs.getincrementaldecoder(encoding)()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield (decoder.decode(view[start:start + chunk_size]), False)
+    else:
+        while True:
+            data = source.read(chunk_size)
+            if not data:
+                break
+            if isinstance(data, str):
+                yield (data, False)
+            else:
+                yield (decoder.decode(data), False)
+    yield (decoder.decode(b'', True), True)
+
+def parse_umapinfo_iter(source, encoding='utf-8', chunk_size=65536):
+    """Parses a UMAPINFO one map block at a time.
+    Expects a string, bytes, an mmap or a file object (text or binary)
+    and generates (mapname, keyvals) in document order.
+    Only the map block being parsed is held in memory, so a caller that
+    stops iterating early never reads or decodes the rest.
+    Throws UMAPINFOSyntaxError (a ValueError) if the UMAPINFO is malformed."""
+    pending = ""
+    lines_before = 0
+    col_before = 0
+    # what the text left pending stops in the middle of has to be
+    # followed by before parsing it again can get any further
+    awaiting = ''
+    for (text, final) in _text_chunks(source, encoding, chunk_size):
+        pending += text
+        if not final and awaiting not in pending[-len(text) - len(awaiting):]:
+            continue
+        awaiting = ''
+        consumed = 0
+        try:
+            for (mapname, keyvals, end) in _parse_blocks(pending, final):
+                consumed = end
+                yield (mapname, keyvals)
+        except lexer.UMAPINFOSyntaxError as e:
+            # An error in the statement a chunk stops in the middle
+            # of may go away with the next chunk; any other is final.
+            awaiting = None if final or e.offset is None else lexer.cut_short(pending, e.offset)
+            if awaiting is None:
+                col = e.col + col_before if e.line == 1 else e.col
+                raise lexer.UMAPINFOSyntaxError(e.message, e.line + lines_before, col) from None
+        if consumed:
+            breaks = pending.count('\n', 0, consumed)
+            if breaks:
+                lines_before += breaks
+                col_before = consumed - pending.rindex('\n', 0, consumed) - 1
+            else:
+                col_before += consumed
+            pending = pending[consumed:]
+
+def parse_umapinfo(umapinfo):
+    """Parses a full umapinfo. Expects a UMAPINFO as a string (or as
+    anything parse_umapinfo_iter accepts).
+    Returns an OrderedDict of map names to a defaultdict(list) of UMAPINFOValues.
+    Throws UMAPINFOSyntaxError (a ValueError) if the UMAPINFO is malformed."""
+    if isinstance(umapinfo, str):
+        return OrderedDict((mapname, keyvals) for (mapname, keyvals, end) in _parse_blocks(umapinfo))
+    return OrderedDict(parse_umapinfo_iter(umapinfo))
 
+def pack_umapinfo(umapinfo):
+    """Converts a parsed UMAPINFO into a few flat columns of strings,
+    numbers and bytes that marshal stores compactly:
+    (map names, key names, counts, key ids, type codes, payloads).
+    For each map, counts holds its number of keys and, after each of
+    its key ids, that key's number of values."""
+    key_ids = {}
+    counts = array('I')
+    keys = array('I')
+    codes = bytearray()
+    payloads = []
+    for keyvals in umapinfo.values():
+        counts.append(len(keyvals))
+        for (key, values) in keyvals.items():
+            key_id = key_ids.get(key)
+            if key_id is None:
+                key_id = key_ids[key] = len(key_ids)
+            keys.append(key_id)
+            counts.append(len(values))
+            for uv in values:
+                codes.append(uv.utype.value)
+                payloads.append(uv.value)
+    return (list(umapinfo), list(key_ids), counts.tobytes(), keys.tobytes(), bytes(codes), payloads)
+
+def unpack_umapinfo(packed):
+    """Rebuilds a parsed UMAPINFO from pack_umapinfo output."""
+    (maps, key_names, counts_bytes, keys_bytes, codes, payloads) = packed
+    counts = array('I')
+    counts.frombytes(counts_bytes)
+    keys = array('I')
+    keys.frombytes(keys_bytes)
+    types = [None] * (max(t.value for t in utypes.UType) + 1)
+    for t in utypes.UType:
+        types[t.value] = t
+    intern_value = utypes.intern_value
+    parsed_umapinfo = OrderedDict()
+    count = iter(counts)
+    key = iter(keys)
+    row = 0
+    for umap in maps:
+        keyvals = parsed_umapinfo[umap] = defaultdict(list)
+        for i in range(next(count)):
+            end = row + next(count)
+            keyvals[key_names[next(key)]] = [intern_value(payloads[r], types[codes[r]]) for r in range(row, end)]
+            row = end
     return parsed_umapinfo
 
+# precompiled escape table, applied to every STRING and MULTISTRING entry
+_escapes = str.maketrans({'\\': '\\\\', '"': '\\"'})
+
+_header = "/* Created with UMAPINFO Designer by JadingTsunami */\n"
+
 def stringify_value(val):
-    stringified = ""
-    if val.utype == structure.utypes.UType.KEYWORD or val.utype == structure.utypes.UType.NUMBER:
-        stringified = str(val.value)
-    elif val.utype == structure.utypes.UType.STRING:
-        s = re.sub(r'([^\\])"', r'\1\"', val.value)
-        stringified = '"' + s + '"'
-    elif val.utype == structure.utypes.UType.MULTISTRING:
-        for s in val.value:
-            s = re.sub(r'([^\\])"', r'\1\"', s)
-            stringified += '\t\t"' + s + '",\n'
-        # strip off leading tabs and last comma and newline
-        stringified = stringified[2:-2]
-    elif val.utype == structure.utypes.UType.TUPLE:
-        for t in val.value:
-            stringified += str(t) + ", "
-        # strip off last comma and space
-        stringified = stringified[:-2]
-    return stringified
-
-def generate_umapinfo(umapinfo):
+    utype = val.utype
+    if utype == utypes.UType.KEYWORD or utype == utypes.UType.NUMBER:
+        return str(val.value)
+    elif utype == utypes.UType.STRING:
+        return '"' + val.value.translate(_escapes) + '"'
+    elif utype == utypes.UType.MULTISTRING:
+        if not val.value:
+            return ""
+        return '"' + '",\n\t\t"'.join([s.translate(_escapes) for s in val.value]) + '"'
+    elif utype == utypes.UType.TUPLE:
+        return ", ".join([str(t) for t in val.value])
+    return ""
+
+def stringify_map(umap, keyvals):
+    """Generates the UMAPINFO text of a single map block."""
+    lines = ["MAP " + umap + "\n{\n"]
+    for key in keyvals:
+        prefix = "\t" + key + " = "
+        for subkey in keyvals[key]:
+            lines.append(prefix + stringify_value(subkey) + "\n")
+    lines.append("} //" + umap + "\n")
+    return "".join(lines)
+
+def iter_umapinfo(umapinfo, stringify=stringify_map):
+    """Generates the UMAPINFO text one map block at a time.
+    The first fragment is the file header. stringify(umap, keyvals)
+    produces each map block and can be replaced by a caching lookup."""
+    yield _header
+    for umap in umapinfo:
+        yield stringify(umap, umapinfo[umap])
+
+def generate_umapinfo(umapinfo, stringify=stringify_map):
     """Takes in a set of umapinfo maps and generates a full UMAPINFO as a multiline string.
     Expects the UMAPINFO is a dictionary of key/value pairs with each key a map, and each
     value a dictionary of that map's keys."""
-    processed_umapinfo = io.StringIO()
-    processed_umapinfo.write("/* Created with UMAPINFO Designer by JadingTsunami */\n")
-    for umap in umapinfo:
-        processed_umapinfo.write("MAP " + umap + "\n{\n")
-        for key in umapinfo[umap]:
-            for subkey in umapinfo[umap][key]:
-                processed_umapinfo.write("\t" + key + " = " + stringify_value(subkey) + "\n")
-        processed_umapinfo.write("} //" + umap + "\n")
-    retstring = processed_umapinfo.getvalue()
-    processed_umapinfo.close()
-    return retstring
+    return "".join(iter_umapinfo(umapinfo, stringify))
+
+def write_umapinfo(umapinfo, sink, encoding='utf-8', stringify=stringify_map):
+    """Serialises UMAPINFO map by map straight into a binary sink.
+    The sink may be a bytearray (appended to) or anything with a
+    write() method taking bytes, such as an open file.
+    Returns the number of bytes written."""
+    encoder = codecs.getencoder(encoding)
+    if isinstance(sink, bytearray):
+        start = len(sink)
+        for fragment in iter_umapinfo(umapinfo, stringify):
+            sink += encoder(fragment)[0]
+        return len(sink) - start
+    written = 0
+    for fragment in iter_umapinfo(umapinfo, stringify):
+        data = encoder(fragment)[0]
+        sink.write(data)
+        written += len(data)
+    return written
@@ -0,0 +1,194 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Decodes Doom pictures (patch format) and flats with numpy.
+
+A picture decodes to a (height, width) array of palette indexes and
+one of which pixels are drawn. Walking a patch's posts is the only
+per-post Python work; copying the pixels out of them is done for the
+whole picture at once. Colours come from the PLAYPAL of the loaded
+WADs through a lookup table that is only rebuilt when it changes."""
+import io
+import struct
+import numpy
+import omg
+from PIL import Image
+from UMAPINFODesigner.structure.waddata import current as current_waddata
+
+_header = struct.Struct('<hhhh')
+_PNG = b'\x89PNG\r\n\x1a\n'
+# raw flats are 64 wide and usually 64 high (some are 65 or 128)
+_FLAT_WIDTH = 64
+
+def decode_patch(data, step=1):
+    """Decodes a picture in patch format (bytes or a memoryview).
+    Returns (indexes, opaque), both arrays of (height, width).
+    Raises ValueError if data isn't a patch. Tall patches (posts
+    starting above the previous one are relative to it) are handled
+    the same way as omg.Graphic does.
+
+    With a step above 1, only every step-th column and row is decoded,
+    giving the picture scaled down that many times (nearest pixel);
+    posts in the columns skipped aren't read at all."""
+    size = len(data)
+    if size < _header.size:
+        raise ValueError("Too short for a picture.")
+    (width, height, x_offset, y_offset) = _header.unpack_from(data)
+    if width <= 0 or height <= 0 or size < _header.size + 4 * width:
+        raise ValueError("Not a picture.")
+    pointers = numpy.frombuffer(data, dtype='<u4', count=width, offset=_header.size)
+    if pointers.max() >= size or pointers.min() < _header.size + 4 * width:
+        raise ValueError("Not a picture.")
+    pixels = numpy.frombuffer(data, dtype=numpy.uint8)
+    if not isinstance(data, bytes):
+        # walk the posts of a mapped lump in place rather than copying it
+        data = memoryview(data).cast('B')
+    columns = []
+    tops = []
+    starts = []
+    lengths = []
+    for (x, pointer) in enumerate(pointers[::step].tolist()):
+        y = -1
+        while pointer + 1 < size and data[pointer] != 0xff:
+            offset = data[pointer]
+            y = y + offset if offset <= y else offset
+            length = data[pointer + 1]
+            columns.append(x)
+            tops.append(y)
+            starts.append(pointer + 3)
+            lengths.append(length)
+            pointer += length + 4
+    (width, height) = (-(-width // step), -(-height // step))
+    indexes = numpy.zeros(width * height, dtype=numpy.uint8)
+    opaque = numpy.zeros(width * height, dtype=bool)
+    if lengths:
+        tops = numpy.array(tops, dtype=numpy.intp)
+        starts = numpy.array(starts, dtype=numpy.intp)
+        # posts running off the bottom or the end of the lump are cut short
+        lengths = numpy.minimum(numpy.array(lengths, dtype=numpy.intp),
+                                numpy.minimum(height * step - tops, size - starts).clip(0))
+        post = numpy.repeat(numpy.arange(len(lengths)), lengths)
+        along = numpy.arange(len(post)) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+        rows = tops[post] + along
+        if step > 1:
+            kept = rows % step == 0
+            (post, along, rows) = (post[kept], along[kept], rows[kept] // step)
+        target = rows * width + numpy.array(columns, dtype=numpy.intp)[post]
+        indexes[target] = pixels[starts[post] + along]
+        opaque[target] = True
+    return (indexes.reshape(height, width), opaque.reshape(height, width))
+
+def decode_flat(data):
+    """Decodes a raw flat. Returns (indexes, None), as decode_patch()
+    does for a picture that is drawn everywhere."""
+    height = len(data) // _FLAT_WIDTH
+    if not height:
+        raise ValueError("Too short for a flat.")
+    indexes = numpy.frombuffer(data, dtype=numpy.uint8, count=height * _FLAT_WIDTH)
+    return (indexes.reshape(height, _FLAT_WIDTH), None)
+
+class palettecache():
+    source = None
+    lut = None
+
+def palette_lut(playpal=None):
+    """RGBA colours of the 256 palette indexes, from the first palette
+    in a PLAYPAL lump (by default the loaded one, or omg's default if
+    there is none). Rebuilt only when the palette changes."""
+    if playpal is None:
+        lump = current_waddata().data.get('PLAYPAL')
+        playpal = lump.data if lump is not None else omg.palette.default.bytes
+    source = bytes(playpal[:768])
+    if source != palettecache.source:
+        lut = numpy.full((256, 4), 255, dtype=numpy.uint8)
+        colours = numpy.frombuffer(source, dtype=numpy.uint8)
+        lut[:len(colours) // 3, :3] = colours[:len(colours) // 3 * 3].reshape(-1, 3)
+        (palettecache.source, palettecache.lut) = (source, lut)
+    return palettecache.lut
+
+def to_image(indexes, opaque=None, lut=None):
+    """An RGBA PIL image of decoded palette indexes. Pixels that
+    aren't drawn are transparent black."""
+    if lut is None:
+        lut = palette_lut()
+    rgba = lut[indexes]
+    if opaque is not None:
+        rgba[~opaque] = 0
+    return Image.fromarray(rgba, 'RGBA')
+
+def lump_image(data, flat=False, lut=None):
+    """An RGBA PIL image of a graphic or flat lump in any size: PNG,
+    a picture, or, if flat is set, a raw flat. None if it is none of
+    these. lut is as palette_lut() returns; pass it in when calling
+    from a thread that isn't running the UI."""
+    if bytes(data[:len(_PNG)]) == _PNG:
+        try:
+            im = Image.open(io.BytesIO(data))
+            im.load()
+            return im.convert('RGBA')
+        except (OSError, ValueError, SyntaxError):
+            return None
+    try:
+        if flat and len(data) >= _FLAT_WIDTH * _FLAT_WIDTH and len(data) % _FLAT_WIDTH == 0:
+            return to_image(*decode_flat(data), lut=lut)
+        return to_image(*decode_patch(data), lut=lut)
+    except ValueError:
+        return None
+
+def _reduction(width, height, size):
+    """How many times an image can be scaled down by whole steps and
+    still be at least as big as it is when it fits in size."""
+    return max(1, int(max(width / size[0], height / size[1])))
+
+def thumbnail(data, size, flat=False, lut=None):
+    """lump_image() scaled down to fit in size (width, height). A patch
+    or flat is only decoded at every few columns and rows, and only
+    the rest of the way is resampled. A PNG is always decoded in full:
+    PIL can only draft (decode already scaled down) formats such as
+    JPEG. It is reduced by whole steps right after, and then resampled
+    the rest of the way as well."""
+    if bytes(data[:len(_PNG)]) == _PNG:
+        try:
+            im = Image.open(io.BytesIO(data))
+            # does nothing for a PNG, which load() decodes in full
+            im.draft(None, size)
+            im.load()
+            if im.mode not in ('RGB', 'RGBA'):
+                # reduce() can't average palette indexes
+                im = im.convert('RGBA')
+            factor = _reduction(im.width, im.height, size)
+            if factor > 1:
+                im = im.reduce(factor)
+            im = im.convert('RGBA')
+        except (OSError, ValueError, SyntaxError):
+            return None
+    else:
+        try:
+            if flat and len(data) >= _FLAT_WIDTH * _FLAT_WIDTH and len(data) % _FLAT_WIDTH == 0:
+                (indexes, opaque) = decode_flat(data)
+                step = _reduction(_FLAT_WIDTH, len(data) // _FLAT_WIDTH, size)
+                im = to_image(indexes[::step, ::step], lut=lut)
+            else:
+                step = 1
+                if len(data) >= _header.size:
+                    (width, height) = _header.unpack_from(data)[:2]
+                    if width > 0 and height > 0:
+                        step = _reduction(width, height, size)
+                im = to_image(*decode_patch(data, step), lut=lut)
+        except ValueError:
+            return None
+    im.thumbnail(size)
+    return im
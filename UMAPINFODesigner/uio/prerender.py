@@ -0,0 +1,158 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Renders automap previews in the background, so that selecting a
+map shows its preview straight from the cache.
+
+The maps to render and their cache keys are worked out on the UI
+thread when a run starts; the worker thread only reads their lumps,
+draws them (or finds them in the disk cache) and stores them on disk.
+The UI thread picks the images up with root.after() and puts them in
+the memory cache. Each run has a generation number: starting a new
+run or cancelling bumps it, which stops the worker and makes any
+images it still delivers be dropped."""
+import queue
+import threading
+from collections import deque
+from UMAPINFODesigner.uio import imagecache
+from UMAPINFODesigner.uio import maprender
+
+def priorities(maps, links, selected=None):
+    """maps ordered for rendering: by distance from selected along
+    links (a dict of map names to the maps they lead to, e.g. by next
+    and nextsecret, followed both ways), then in the order given."""
+    rank = {m: i for (i, m) in enumerate(maps)}
+    distance = {}
+    if selected in rank:
+        neighbours = {}
+        for (m, targets) in links.items():
+            for t in targets:
+                neighbours.setdefault(m, []).append(t)
+                neighbours.setdefault(t, []).append(m)
+        distance[selected] = 0
+        pending = deque([selected])
+        while pending:
+            m = pending.popleft()
+            for n in neighbours.get(m, ()):
+                if n not in distance:
+                    distance[n] = distance[m] + 1
+                    pending.append(n)
+    unreached = len(maps) + 1
+    return sorted(maps, key=lambda m: (distance.get(m, unreached), rank[m]))
+
+class Prerenderer():
+    """Renders the automaps of a set of maps at one width on a worker
+    thread, nearest the selected map first. on_rendered(mapname), if
+    given, is called on the UI thread after each one is cached."""
+
+    def __init__(self, root, width, on_rendered=None, interval=50):
+        self.root = root
+        self.width = width
+        self.on_rendered = on_rendered
+        self.interval = interval
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.maps = []
+        self.links = {}
+        self.jobs = {}
+        self.order = []
+        self.results = queue.Queue()
+        self.thread = None
+
+    def start(self, maps, links, selected=None):
+        """Renders maps, each given as (name, cache key, map lumps),
+        stopping any run in progress. Maps already in the memory
+        cache are skipped."""
+        with self.lock:
+            self.generation += 1
+            self.jobs = {name: (key, mapw) for (name, key, mapw) in maps
+                         if key is not None and not imagecache.is_cached(key)}
+            self.maps = [name for (name, key, mapw) in maps if name in self.jobs]
+            self.links = links
+            self.order = priorities(self.maps, links, selected)
+            generation = self.generation
+        if not self.jobs:
+            return
+        self.thread = threading.Thread(target=self._run, args=(generation,), daemon=True)
+        self.thread.start()
+        self.root.after(self.interval, self._poll, generation)
+
+    def focus(self, selected):
+        """Renders the maps nearest selected next."""
+        with self.lock:
+            self.order = priorities([m for m in self.maps if m in self.jobs], self.links, selected)
+
+    def cancel(self, wait=False):
+        """Stops the run in progress. With wait, returns once the
+        worker has finished the map it is on."""
+        with self.lock:
+            self.generation += 1
+            self.jobs = {}
+            self.order = []
+        if wait and self.thread is not None:
+            self.thread.join()
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _next(self, generation):
+        """The next map to render as (name, key, lumps), or None once
+        there are none left or the run is stale."""
+        with self.lock:
+            if generation != self.generation:
+                return None
+            while self.order:
+                name = self.order.pop(0)
+                job = self.jobs.pop(name, None)
+                if job is not None:
+                    return (name,) + job
+            return None
+
+    def _run(self, generation):
+        while True:
+            job = self._next(generation)
+            if job is None:
+                break
+            (name, key, mapw) = job
+            try:
+                im = imagecache.from_disk(key)
+                if im is None:
+                    im = maprender.render_map(mapw, self.width)
+                    if im is not None:
+                        imagecache.to_disk(key, im)
+            except Exception:
+                # e.g. broken map lumps; selecting the map shows the error
+                im = None
+            if im is not None:
+                self.results.put((generation, name, key, im))
+
+    def _poll(self, generation):
+        if generation != self.generation:
+            # a newer run polls for itself
+            return
+        while True:
+            try:
+                (done, name, key, im) = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if done != self.generation:
+                # left over from an earlier run
+                continue
+            imagecache.remember(key, im)
+            if self.on_rendered:
+                self.on_rendered(name)
+        if self.thread.is_alive() or not self.results.empty():
+            self.root.after(self.interval, self._poll, generation)
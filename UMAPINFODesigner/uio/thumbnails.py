@@ -0,0 +1,151 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Decodes thumbnails of graphics and flats on a pool of worker
+threads, for the gallery.
+
+What to decode is worked out on the UI thread (see
+wadreader.picture_jobs()); the workers only read the lumps and decode
+them. The UI thread picks the thumbnails up with root.after(), in
+batches, and puts them in the memory cache. Each request replaces
+the one before: thumbnails asked for before that no worker has
+started on are dropped, so that scrolling away from cells stops them
+from being decoded."""
+import concurrent.futures
+import os
+import queue
+import threading
+from UMAPINFODesigner.uio import imagecache
+from UMAPINFODesigner.uio import picture
+
+class retired():
+    # pools of cancelled Thumbnailers, whose workers may still be
+    # finishing the lump they started on
+    pools = []
+
+class Thumbnailer():
+    """Decodes thumbnails that fit in size (width, height) on up to
+    workers threads. on_loaded(names), if given, is called on the UI
+    thread with each batch of names whose thumbnails were cached."""
+
+    def __init__(self, root, size, flat=False, on_loaded=None, workers=None, interval=50):
+        self.root = root
+        self.size = size
+        self.flat = flat
+        self.on_loaded = on_loaded
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.interval = interval
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.order = []
+        self.busy = set()
+        self.failed = set()
+        self.active = 0
+        self.lut = None
+        self.results = queue.Queue()
+        self.pool = None
+        self.polling = False
+
+    def request(self, jobs):
+        """Decodes jobs, each (name, cache key, lump), in the order
+        given, instead of whatever is still waiting from the last
+        request. Thumbnails being decoded already, or that couldn't be
+        decoded, aren't asked for again."""
+        # the palette is looked up here, as it is kept for the UI thread
+        lut = picture.palette_lut()
+        with self.lock:
+            self.lut = lut
+            self.order = [job for job in jobs if job[0] not in self.busy and job[0] not in self.failed]
+            self.order.reverse()
+            start = min(self.workers - self.active, len(self.order))
+            self.active += start
+        if start > 0:
+            if self.pool is None:
+                self.pool = concurrent.futures.ThreadPoolExecutor(self.workers)
+            for _ in range(start):
+                self.pool.submit(self._run, self.generation)
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.interval, self._poll, self.generation)
+
+    def cancel(self):
+        """Drops everything asked for. Call when the gallery closes."""
+        with self.lock:
+            self.generation += 1
+            self.order = []
+        self.polling = False
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            retired.pools.append(self.pool)
+            self.pool = None
+
+    def _next(self, generation):
+        """The next job as (name, key, lump, lut), or None once there
+        are none left, in which case the worker stops."""
+        with self.lock:
+            if generation == self.generation and self.order:
+                job = self.order.pop()
+                self.busy.add(job[0])
+                return job + (self.lut,)
+            self.active -= 1
+            return None
+
+    def _run(self, generation):
+        while True:
+            job = self._next(generation)
+            if job is None:
+                break
+            (name, key, lump, lut) = job
+            try:
+                im = picture.thumbnail(lump.data, self.size, self.flat, lut)
+            except Exception:
+                # e.g. an unreadable lump; it is shown without a thumbnail
+                im = None
+            self.results.put((generation, name, key, im))
+
+    def _poll(self, generation):
+        if generation != self.generation:
+            return
+        loaded = []
+        while True:
+            try:
+                (done, name, key, im) = self.results.get_nowait()
+            except queue.Empty:
+                break
+            with self.lock:
+                self.busy.discard(name)
+            if done != self.generation:
+                continue
+            if im is None:
+                self.failed.add(name)
+                continue
+            imagecache.remember_picture(key, im)
+            loaded.append(name)
+        if loaded and self.on_loaded:
+            self.on_loaded(loaded)
+        with self.lock:
+            idle = self.active == 0
+        if idle and self.results.empty():
+            self.polling = False
+        else:
+            self.root.after(self.interval, self._poll, generation)
+
+def wait():
+    """Waits for the workers of every cancelled Thumbnailer to stop,
+    so that none of them is reading a lump, e.g. before its WAD file
+    is replaced."""
+    while retired.pools:
+        retired.pools.pop().shutdown(wait=True)
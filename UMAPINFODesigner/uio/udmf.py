@@ -0,0 +1,95 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Reads what the automap needs from a UDMF map's TEXTMAP lump.
+
+Only vertex coordinates and linedef endpoints, specials and the
+twosided flag are picked out; no other block or field is converted.
+The lump is scanned once, block by block, with compiled regular
+expressions that work on a memoryview of the WAD directly, so the
+time taken grows linearly with its size."""
+import re
+import numpy
+
+_string = rb'"[^"\\]*(?:\\.[^"\\]*)*"'
+_comment = rb'//[^\n]*|/\*.*?\*/'
+# a block at the top level, skipping comments and strings (which
+# may contain anything) and global assignments such as the namespace.
+# Written so that each part can only match one way, to keep the
+# scan linear.
+_toplevel = re.compile(_comment + rb'|' + _string +
+                       rb'|([A-Za-z_][A-Za-z0-9_]*)(?:\s|' + _comment + rb')*\{' +
+                       rb'([^}"/]*(?:(?:' + _string + rb'|' + _comment + rb'|/)[^}"/]*)*)\}', re.S)
+# any assignment in a block
+_field = re.compile(_comment + rb'|([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(' + _string + rb'|[^;"]*?)\s*;', re.S)
+# the assignments the automap needs, for blocks without strings or
+# comments, where nothing else can look like them
+_vertex_field = re.compile(rb'(?<![A-Za-z0-9_])([xXyY])\s*=\s*([^;]*?)\s*;')
+_linedef_field = re.compile(rb'(?<![A-Za-z0-9_])(v1|v2|special|twosided)\s*=\s*([^;]*?)\s*;', re.I)
+
+_TWO_SIDED = 0x4
+
+vertex_dtype = numpy.dtype([('x', '<f8'), ('y', '<f8')])
+linedef_dtype = numpy.dtype([('a', '<i8'), ('b', '<i8'), ('flags', '<u2'), ('action', '<i8')])
+
+def _fields(body, fast):
+    """(key, value) of the assignments in a block body, keys lowercased."""
+    if b'"' not in body and b'/' not in body:
+        return [(key.lower(), value) for (key, value) in fast.findall(body)]
+    return [(key.lower(), value) for (key, value) in _field.findall(body) if key]
+
+def _integer(value):
+    try:
+        return int(value, 0)
+    except ValueError:
+        # leading zeros, or a float where an integer was expected
+        return int(float(value))
+
+def read_textmap(data):
+    """Returns (vertexes, linedefs) of a TEXTMAP lump (bytes or a
+    memoryview) as numpy arrays of vertex_dtype and linedef_dtype,
+    in the form maprender.read_map_lines() gives for binary maps,
+    but with coordinates as floats."""
+    vertexes = []
+    linedefs = []
+    for match in _toplevel.finditer(data):
+        kind = match.group(1)
+        if kind is None:
+            continue
+        kind = kind.lower()
+        if kind == b'vertex':
+            x = y = 0.0
+            for (key, value) in _fields(match.group(2), _vertex_field):
+                if key == b'x':
+                    x = float(value)
+                elif key == b'y':
+                    y = float(value)
+            vertexes.append((x, y))
+        elif kind == b'linedef':
+            a = b = -1
+            flags = action = 0
+            for (key, value) in _fields(match.group(2), _linedef_field):
+                if key == b'v1':
+                    a = _integer(value)
+                elif key == b'v2':
+                    b = _integer(value)
+                elif key == b'special':
+                    action = _integer(value)
+                elif key == b'twosided' and value.lower() == b'true':
+                    flags = _TWO_SIDED
+            if a >= 0 and b >= 0:
+                linedefs.append((a, b, flags, action))
+    return (numpy.array(vertexes, dtype=vertex_dtype), numpy.array(linedefs, dtype=linedef_dtype))
@@ -0,0 +1,166 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Loads WADs on a worker thread so that the UI stays responsive.
+
+A job runs against a staged copy of waddata (see waddata.staged()),
+so everything in use keeps working while it runs. It reports progress
+through a queue that the UI thread polls with root.after(). Once the
+job is done, the UI thread swaps the staged state in with
+waddata.restore(); a cancelled or failed job changes nothing."""
+import os
+import queue
+import threading
+from UMAPINFODesigner.structure.waddata import waddata
+from UMAPINFODesigner.uio import wadreader
+
+class LoadCancelled(Exception):
+    """Raised inside a job once its loader has been cancelled."""
+
+class WadLoader():
+    """Runs job(loader) on a worker thread with state staged.
+
+    on_done(result) is called with the job's return value after the
+    state has been swapped in, on_error(exception) if the job raised,
+    on_progress(message, fraction) for each progress report and
+    on_cancel() once a cancelled job has stopped. All of them are
+    called on the thread running root's event loop."""
+
+    def __init__(self, root, job, state, on_done, on_error=None, on_progress=None, on_cancel=None, interval=50):
+        self.root = root
+        self.job = job
+        self.state = state
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_cancel = on_cancel
+        self.interval = interval
+        self.messages = queue.Queue()
+        self.cancelled = threading.Event()
+        self.finished = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.root.after(self.interval, self._poll)
+
+    def cancel(self):
+        """Asks the job to stop. Its state is never swapped in."""
+        self.cancelled.set()
+
+    def running(self):
+        return self.thread is not None and not self.finished
+
+    def progress(self, message, fraction=None):
+        """Called by the job to report progress. Also where a
+        cancelled job stops, by raising LoadCancelled."""
+        if self.cancelled.is_set():
+            raise LoadCancelled()
+        self.messages.put(('progress', (message, fraction)))
+
+    def _run(self):
+        try:
+            with waddata.staged(self.state):
+                result = self.job(self)
+            self.messages.put(('done', result))
+        except LoadCancelled:
+            self.messages.put(('cancelled', None))
+        except Exception as e:
+            self.messages.put(('error', e))
+
+    def _poll(self):
+        while True:
+            try:
+                (kind, payload) = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                if self.on_progress and not self.cancelled.is_set():
+                    self.on_progress(*payload)
+                continue
+            self.finished = True
+            if kind == 'done' and self.cancelled.is_set():
+                kind = 'cancelled'
+            if kind == 'done':
+                waddata.restore(self.state)
+                self.on_done(payload)
+            elif kind == 'error':
+                if self.on_error:
+                    self.on_error(payload)
+            elif self.on_cancel:
+                self.on_cancel()
+            return
+        self.root.after(self.interval, self._poll)
+
+def load_iwad(loader, wadfile):
+    """Job: loads an IWAD into an empty state."""
+    loader.progress("Reading " + os.path.basename(wadfile) + "...", 0.0)
+    wadreader.read_waddata_from_iwad(wadfile)
+    loader.progress("Done.", 1.0)
+
+def load_pwad(loader, wadfile, doom, doom2, validate=True):
+    """Job: adds a PWAD to the state, unless its UMAPINFO doesn't
+    match the IWAD, and parses (and validates) the UMAPINFO.
+    Returns (umapinfo, warnings, errors), or None if incompatible."""
+    loader.progress("Reading " + os.path.basename(wadfile) + "...", 0.0)
+    if not wadreader.read_waddata_from_wad_if_match(wadfile, doom, doom2):
+        return None
+    warnings = {}
+    errors = {}
+    if validate:
+        loader.progress("Parsing and validating UMAPINFO...", 0.5)
+        uinf = wadreader.get_waddata_umapinfo_checked(warnings, errors)
+    else:
+        loader.progress("Parsing UMAPINFO...", 0.5)
+        uinf = wadreader.get_waddata_umapinfo()
+    loader.progress("Done.", 1.0)
+    return (uinf, warnings, errors)
+
+def load_pwads(loader, wadfiles, doom, doom2, validate=True):
+    """Job: adds several PWADs to the state in the given order (see
+    wadreader.read_waddata_from_wads()), and parses (and validates)
+    the UMAPINFO. Returns (umapinfo, warnings, errors, incompatible),
+    where incompatible lists the WADs skipped for not matching the IWAD."""
+    loader.progress("Reading " + str(len(wadfiles)) + " WADs...", 0.0)
+    def progress(wadfile, done, total):
+        loader.progress("Read " + os.path.basename(wadfile) + " (" + str(done) + " of " + str(total) + ")...", 0.8 * done / total)
+    incompatible = wadreader.read_waddata_from_wads(wadfiles, doom, doom2, progress)
+    warnings = {}
+    errors = {}
+    if validate:
+        loader.progress("Parsing and validating UMAPINFO...", 0.8)
+        uinf = wadreader.get_waddata_umapinfo_checked(warnings, errors)
+    else:
+        loader.progress("Parsing UMAPINFO...", 0.8)
+        uinf = wadreader.get_waddata_umapinfo()
+    loader.progress("Done.", 1.0)
+    return (uinf, warnings, errors, incompatible)
+
+def pwads_in_folder(folder):
+    """The PWADs in a folder, in order of file name."""
+    wfiles = [os.path.join(folder, f) for f in sorted(os.listdir(folder), key=str.lower) if f.lower().endswith(".wad")]
+    return [w for w in wfiles if os.path.isfile(w) and not wadreader.is_iwad(w)]
+
+def load_pwad_folder(loader, folder, doom, doom2, validate=True):
+    """Job: adds every PWAD in a folder to the state, in order of
+    file name, as load_pwads() does. Returns None if the folder has
+    no PWADs in it."""
+    loader.progress("Looking for PWADs in " + os.path.basename(folder) + "...", 0.0)
+    wfiles = pwads_in_folder(folder)
+    if not wfiles:
+        return None
+    return load_pwads(loader, wfiles, doom, doom2, validate)
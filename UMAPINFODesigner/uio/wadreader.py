@@ -15,13 +15,26 @@
 #
 # Copyright 2021 Jading Tsunami
 """Reads UMAPINFO from a WAD file (if present)."""
+import concurrent.futures
 import omg
 import re
-from PIL import Image, ImageDraw, ImageTk
+from itertools import repeat
+from PIL import ImageTk
 
 import os
-import sys
+from UMAPINFODesigner.structure import config
+from UMAPINFODesigner.structure import textures
 from UMAPINFODesigner.structure.waddata import waddata
+from UMAPINFODesigner.structure.waddata import current as current_waddata
+from UMAPINFODesigner.uio import diskcache
+from UMAPINFODesigner.uio import imagecache
+from UMAPINFODesigner.uio import lazywad
+from UMAPINFODesigner.uio import lexer
+from UMAPINFODesigner.uio import maprender
+from UMAPINFODesigner.uio import parser
+from UMAPINFODesigner.uio import picture
+from UMAPINFODesigner.rules import valuechecker
+from UMAPINFODesigner.rules import valuechecks
 
 def read_umapinfo_from_wad(wadfile, encoding='ascii'):
     """Read UMAPINFO from WAD file.
@@ -30,38 +43,56 @@ def read_umapinfo_from_wad(wadfile, encoding='ascii'):
     Throws KeyError if no UMAPINFO.
     Throws ValueError if UMAPINFO doesn't parse."""
     w = wadfile
-    if not isinstance(wadfile, omg.WAD):
-        w = omg.WAD(from_file=wadfile)
+    if not isinstance(wadfile, (omg.WAD, lazywad.LazyWAD)):
+        w = open_wad(wadfile)
     # Raises KeyError if not found
     umapinfo_lump = w.data['UMAPINFO']
-    return umapinfo_lump.data.decode(encoding)
+    return str(umapinfo_lump.data, encoding)
 
 def usafe(chars):
     return str(chars[:8]).upper()
 
+def umapinfo_matches_iwad(umapinfo, doom, doom2):
+    """Check that a UMAPINFO (string, bytes or file object) defines at
+    least one map in the style of the IWAD (ExMy or MAPxx).
+    Parsing stops at the first map block that answers the question.
+    A malformed UMAPINFO is reported when it is loaded, not here: its
+    text is just searched for map definitions instead."""
+    if doom and not doom2:
+        pattern = r"E[0-9]+M[0-9]+"
+    elif doom2 and not doom:
+        pattern = r"MAP[0-9]+"
+    else:
+        return True
+    try:
+        for (mapname, keyvals) in parser.parse_umapinfo_iter(umapinfo):
+            if re.fullmatch(pattern, mapname, re.IGNORECASE):
+                return True
+    except lexer.UMAPINFOSyntaxError:
+        if hasattr(umapinfo, 'read'):
+            umapinfo.seek(0)
+            umapinfo = umapinfo.read()
+        if not isinstance(umapinfo, str):
+            umapinfo = bytes(umapinfo).decode('utf-8', 'replace')
+        return re.search(r'MAP\s+"?' + pattern, umapinfo, re.IGNORECASE) is not None
+    return False
+
+def open_wad(wadfile):
+    """Opens a WAD file, reading only its directory.
+    Lump data is read when first used."""
+    omg.util.safe_name = usafe
+    return lazywad.LazyWAD(from_file=wadfile)
+
 def read_waddata_from_wad_if_match(wadfile, doom, doom2, clean=False):
 
     wad = wadfile
-    if not isinstance(wadfile, omg.WAD):
-        wad = omg.WAD(from_file=wadfile)
+    if not isinstance(wadfile, (omg.WAD, lazywad.LazyWAD)):
+        wad = open_wad(wadfile)
 
-    umapinfo = None
-    try:
-        umapinfo = read_umapinfo_from_wad(wad)
-    except UnicodeDecodeError:
-        umapinfo = read_umapinfo_from_wad(wad, 'utf-8')
-    except KeyError:
-        # no UMAPINFO, so ignore Doom vs. Doom 2 checks
-        doom = True
-        doom2 = True
-    
     # if it has a umapinfo, check if it's compatible
-    if doom and not doom2:
-        if not re.search("MAP E[0-9]+M[0-9]+", umapinfo, re.IGNORECASE|re.MULTILINE):
-            return False
-    elif doom2 and not doom:
-        if not re.search("MAP MAP[0-9]+", umapinfo, re.IGNORECASE|re.MULTILINE):
-            return False
+    # (no UMAPINFO, so ignore Doom vs. Doom 2 checks)
+    if 'UMAPINFO' in wad.data and not umapinfo_matches_iwad(wad.data['UMAPINFO'].data, doom, doom2):
+        return False
 
     if clean:
         waddata.clear()
@@ -70,81 +101,381 @@ def read_waddata_from_wad_if_match(wadfile, doom, doom2, clean=False):
     return True
 
 def is_wad_loaded(wadfile):
-    return os.path.basename(wadfile) in waddata.wad
+    """Whether a WAD with the same content as this file is loaded,
+    whatever its path or name."""
+    try:
+        return waddata.is_loaded(lazywad.file_fingerprint(wadfile))
+    except IOError:
+        return False
 
 def read_waddata_from_wad(wadfile, clean=False):
     if clean:
         waddata.clear()
     omg.util.safe_name = usafe
     wad = wadfile
-    if not isinstance(wadfile, omg.WAD):
-        wad = omg.WAD(from_file=wadfile)
+    if not isinstance(wadfile, (omg.WAD, lazywad.LazyWAD)):
+        wad = open_wad(wadfile)
     waddata.merge(os.path.basename(wadfile), wad)
 
+def release_wad_file(wadfile):
+    """Reads the remaining lumps of a loaded WAD into memory so
+    that its file can be replaced, e.g. when saving UMAPINFO to it.
+    Stop anything reading lumps in the background first: a view of
+    the file still held keeps it mapped, and on Windows a mapped file
+    can't be replaced."""
+    path = os.path.realpath(wadfile)
+    for wad in waddata.wad.values():
+        if isinstance(wad, lazywad.LazyWAD) and wad.path == path:
+            umapinfo_lump = wad.data.get('UMAPINFO')
+            held = umapinfo_lump is not None and waddata.umapinfo is umapinfo_lump.data
+            if held:
+                # a view of the file, which would keep it mapped
+                waddata.umapinfo = None
+            wad.load_all()
+            if held:
+                waddata.umapinfo = umapinfo_lump.data
+
+class umapinfocache():
+    cache = None
+
+def _disk_cache():
+    """The cache of parse results and WAD indexes, or None if there
+    is no config to place it by (e.g. when used as a library)."""
+    if not config.configdata.config_initialized:
+        return None
+    directory = config.get_cache_dir()
+    if umapinfocache.cache is None or umapinfocache.cache.directory != directory:
+        umapinfocache.cache = diskcache.DiskCache(directory, config.get_cache_size())
+    return umapinfocache.cache
+
+def _wad_index_key(wadfile):
+    """Cache key of a WAD's index: its path, size, modification time
+    and header (which holds the directory's size and location)."""
+    with open(wadfile, 'rb') as f:
+        st = os.fstat(f.fileno())
+        header = f.read(lazywad._header.size)
+    return diskcache.digest("wad index", str(lazywad.INDEX_VERSION), str(textures.TEXTURES_VERSION), os.path.realpath(wadfile),
+                            str(st.st_size), str(st.st_mtime_ns), header)
+
+def open_iwad(wadfile):
+    """Opens a WAD that isn't expected to change, such as an IWAD.
+    The sorted directory and the texture definitions are kept in an index
+    in the cache, so that as long as the file is unchanged opening
+    it again reads neither its directory nor any lump."""
+    cache = _disk_cache()
+    if cache is None:
+        return open_wad(wadfile)
+    omg.util.safe_name = usafe
+    key = _wad_index_key(wadfile)
+    cached = cache.get(key)
+    if cached is not None:
+        (index, texture_defs) = cached
+        wad = lazywad.LazyWAD()
+        wad.from_index(wadfile, index)
+        wad.texture_defs = texture_defs
+        return wad
+    wad = open_wad(wadfile)
+    index = wad.to_index()
+    wad.texture_defs = textures.read_wad_textures(wad)
+    cache.put(key, (index, wad.texture_defs))
+    return wad
+
+def read_waddata_from_iwad(wadfile):
+    """Replaces everything loaded with an IWAD, opened with open_iwad()."""
+    waddata.clear()
+    waddata.merge(os.path.basename(wadfile), open_iwad(wadfile))
+
+class wadpool():
+    pool = None
+
+def _wad_pool():
+    """Worker processes for reading several WADs at once.
+    Started on first use and kept for later loads."""
+    if wadpool.pool is None:
+        wadpool.pool = concurrent.futures.ProcessPoolExecutor()
+    return wadpool.pool
+
+def index_wad(wadfile, doom, doom2):
+    """Reads and sorts a WAD's directory, e.g. in a worker process.
+    Returns a compact description of it that from_index() restores:
+    (identity, index, texture definitions, compatible), where compatible
+    is False if the WAD's UMAPINFO doesn't match the IWAD."""
+    omg.util.safe_name = usafe
+    wad = lazywad.LazyWAD(from_file=wadfile, use_mmap=False)
+    compatible = 'UMAPINFO' not in wad.data or umapinfo_matches_iwad(wad.data['UMAPINFO'].data, doom, doom2)
+    return (wad.identity, wad.to_index(), textures.read_wad_textures(wad), compatible)
+
+def _open_wad_if_match(wadfile, doom, doom2):
+    """Opens a WAD, or returns None if its UMAPINFO doesn't match the IWAD."""
+    wad = open_wad(wadfile)
+    if 'UMAPINFO' in wad.data and not umapinfo_matches_iwad(wad.data['UMAPINFO'].data, doom, doom2):
+        return None
+    return wad
+
+def _wad_from_index(wadfile, indexed):
+    """Opens a WAD from what index_wad() returned for it, or returns
+    None if its UMAPINFO doesn't match the IWAD."""
+    (identity, index, texture_defs, compatible) = indexed
+    if not compatible:
+        return None
+    wad = lazywad.LazyWAD()
+    wad.from_index(wadfile, index, identity)
+    wad.texture_defs = texture_defs
+    return wad
+
+def read_waddata_from_wads(wadfiles, doom, doom2, progress=None, parallel=None):
+    """Loads several WADs, reading their directories in parallel in
+    worker processes, and merges them in the given order.
+    WADs whose content is already loaded are skipped (by merge()), as
+    are WADs with a UMAPINFO that
+    doesn't match the IWAD. progress(wadfile, done, total) is called
+    after each WAD. By default, worker processes are only used for
+    more than one WAD on a machine with more than one CPU.
+    Returns the list of WADs skipped for not matching the IWAD."""
+    if parallel is None:
+        parallel = len(wadfiles) > 1 and (os.cpu_count() or 1) > 1
+    results = None
+    if parallel:
+        results = _wad_pool().map(index_wad, wadfiles, repeat(doom), repeat(doom2))
+        wads = map(_wad_from_index, wadfiles, results)
+    else:
+        wads = map(_open_wad_if_match, wadfiles, repeat(doom), repeat(doom2))
+    incompatible = []
+    try:
+        for (done, (wadfile, wad)) in enumerate(zip(wadfiles, wads)):
+            if wad is not None:
+                waddata.merge(os.path.basename(wadfile), wad)
+            else:
+                incompatible.append(wadfile)
+            if progress:
+                progress(wadfile, done + 1, len(wadfiles))
+    finally:
+        # stops the remaining workers if loading was interrupted
+        if results is not None:
+            results.close()
+    return incompatible
+
+def lump_fingerprint(namespace, name):
+    """Cache key part for a loaded lump: the content fingerprint of the
+    WAD it comes from, or None if that WAD has none (e.g. an omg.WAD)."""
+    w = current_waddata()
+    provider = getattr(w, namespace).provider(name)
+    if provider is None:
+        return None
+    fingerprint = getattr(w.wad[provider], 'fingerprint', None)
+    return "wad:" + fingerprint if fingerprint is not None else None
+
+def _umapinfo_key(umapinfo):
+    """Identifies the loaded UMAPINFO: by its WAD's fingerprint, which
+    covers all of the lump, or else by the lump itself."""
+    return lump_fingerprint('data', 'UMAPINFO') or umapinfo
+
+def _validation_context():
+    """Everything validation looks up in the loaded WADs: the loaded
+    WADs' fingerprints in order, or if any of them has none, the
+    names of all the lumps."""
+    w = current_waddata()
+    fingerprints = [getattr(wad, 'fingerprint', None) for wad in w.wad.values()]
+    if None not in fingerprints:
+        return "wads:" + "\0".join(fingerprints)
+    return "\n".join(["\0".join(sorted(getattr(w, category)))
+                      for category in ('graphics', 'data', 'music', 'flats', 'maps', 'textures', 'patches')])
+
 def get_waddata_umapinfo():
-    return waddata.process_umapinfo()
+    umapinfo = current_waddata().umapinfo
+    if not umapinfo: return None
+    cache = _disk_cache()
+    if not cache:
+        return waddata.process_umapinfo()
+    key = diskcache.digest(str(parser.PARSER_VERSION), "parsed", _umapinfo_key(umapinfo))
+    packed = cache.get(key)
+    if packed is not None:
+        return parser.unpack_umapinfo(packed)
+    uinf = waddata.process_umapinfo()
+    cache.put(key, parser.pack_umapinfo(uinf))
+    return uinf
+
+def get_waddata_umapinfo_checked(warnings, errors):
+    """Parses and validates the loaded UMAPINFO, removing bad keys.
+    Fills in the warnings and errors dictionaries the same way
+    valuechecker.check_all_keys_and_remove_bad does.
+    Results are cached by the fingerprints of the WAD the lump comes
+    from and of the loaded WADs, so loading the same PWAD again (from
+    any path) skips both stages, and by the parser and validation
+    versions, so that an upgrade checks again."""
+    umapinfo = current_waddata().umapinfo
+    if not umapinfo: return None
+    cache = _disk_cache()
+    key = None
+    if cache:
+        key = diskcache.digest(str(parser.PARSER_VERSION), str(valuechecks.VALIDATION_VERSION), "checked",
+                               _umapinfo_key(umapinfo), _validation_context())
+        cached = cache.get(key)
+        if cached is not None:
+            (packed, cached_warnings, cached_errors) = cached
+            warnings.update(cached_warnings)
+            errors.update(cached_errors)
+            return parser.unpack_umapinfo(packed)
+    uinf = waddata.process_umapinfo()
+    if uinf:
+        valuechecker.check_all_keys_and_remove_bad(uinf, warnings, errors)
+        if cache:
+            cache.put(key, (parser.pack_umapinfo(uinf), warnings, errors))
+    return uinf
 
 def is_iwad(wadfile):
     with open(wadfile, "rb") as f:
         return f.read(4).decode('ascii') == 'IWAD'
 
 def get_waddata(category):
-    if category and hasattr(waddata, category):
-        return getattr(waddata, category)
+    w = current_waddata()
+    if category and hasattr(w, category):
+        return getattr(w, category)
     else:
         return None
 
-def get_waddata_map_image(mapn, width=192):
-    # adapted from:
-    # https://github.com/devinacker/omgifol/blob/master/demo/drawmaps.py
+def map_fingerprint(mapn):
+    """Identifies a loaded map: the fingerprint of the WAD it comes from
+    and its name, or if that WAD has none, a hash of the lumps the
+    automap is drawn from. None if the map isn't loaded."""
+    fingerprint = lump_fingerprint('maps', mapn)
+    if fingerprint is not None:
+        return fingerprint + ":" + mapn
+    mapw = waddata.get_map(mapn)
+    if not mapw:
+        return None
+    parts = []
+    for name in ('VERTEXES', 'LINEDEFS', 'BEHAVIOR', 'TEXTMAP'):
+        if name in mapw:
+            parts.extend((name, mapw[name].data))
+    return diskcache.digest("map", *parts)
+
+def automap_cache():
+    """Sets up the automap caches on first use. Without a config
+    (e.g. when used as a library) they are kept in memory only."""
+    if imagecache.automapcache.memory is None:
+        if config.configdata.config_initialized:
+            imagecache.configure(config.get_automap_cache_size(),
+                                 os.path.join(config.get_cache_dir(), "automaps"), config.get_cache_size())
+        else:
+            imagecache.configure(config.configdata.automap_cache_mb * 1024 * 1024)
+
+def map_image_key(mapn, width=192):
+    """Cache key of a loaded map's automap at a width."""
+    return diskcache.digest("automap", str(maprender.RENDER_VERSION), map_fingerprint(mapn), str(width))
+
+def get_waddata_map_pixels(mapn, width=192):
+    """The automap of a loaded map as a PIL image, or None. Rendered
+    images are cached in memory and on disk by map_fingerprint()."""
     mapw = waddata.get_map(mapn)
     if not mapw:
         return None
-    edit = omg.MapEditor(mapw)
-    if not edit:
+    automap_cache()
+    return imagecache.automap(map_image_key(mapn, width), lambda: maprender.render_map(mapw, width))
+
+def get_waddata_map_geometry(mapn):
+    """The lines of a loaded map with a spatial index over them
+    (a maprender.MapGeometry), for the zoomable automap, or None."""
+    mapw = waddata.get_map(mapn)
+    if not mapw:
         return None
-    xmin = ymin = 32767
-    xmax = ymax = -32768
-    for v in edit.vertexes:
-        xmin = min(xmin, v.x)
-        xmax = max(xmax, v.x)
-        ymin = min(ymin, -v.y)
-        ymax = max(ymax, -v.y)
-
-    xscale = width / float(xmax - xmin)
-    yscale = width / float(ymax - ymin)
-    xmax = int(xmax * xscale)
-    xmin = int(xmin * xscale)
-    ymax = int(ymax * yscale)
-    ymin = int(ymin * yscale)
-
-    for v in edit.vertexes:
-        # smeghammer
-        _x = round( v.x * xscale, None)
-        _y = round(-v.y * yscale, None)
-
-        v.x = _x
-        v.y = _y
-
-    im = Image.new('RGB', ((xmax - xmin) + 8, (ymax - ymin) + 8), (0,0,0))
-    draw = ImageDraw.Draw(im)
-
-    edit.linedefs.sort(key=lambda a: not a.two_sided)
-
-    for line in edit.linedefs:
-         p1x = edit.vertexes[line.vx_a].x - xmin + 4
-         p1y = edit.vertexes[line.vx_a].y - ymin + 4
-         p2x = edit.vertexes[line.vx_b].x - xmin + 4
-         p2y = edit.vertexes[line.vx_b].y - ymin + 4
-
-         color = (52, 235, 131)
-         if line.two_sided:
-             color = (206, 224, 214)
-         if line.action:
-             color = (217, 214, 50)
-
-         draw.line((p1x, p1y, p2x, p2y), fill=color)
-
-    del draw
+    return maprender.read_map_geometry(mapw)
 
+def map_image_jobs(mapnames, width=192):
+    """(name, cache key, map lumps) of each loaded map in mapnames,
+    as prerender.Prerenderer.start() takes them."""
+    automap_cache()
+    jobs = []
+    for mapn in mapnames:
+        mapw = waddata.get_map(mapn)
+        if mapw:
+            jobs.append((mapn, map_image_key(mapn, width), mapw))
+    return jobs
+
+def get_waddata_map_image(mapn, width=192):
+    im = get_waddata_map_pixels(mapn, width)
+    if im is None:
+        return None
     return ImageTk.PhotoImage(im)
+
+def automap_cache_stats():
+    """(hits in memory, hits on disk, renders) of the automap caches."""
+    return imagecache.stats()
+
+def picture_cache():
+    """Sets up the caches of decoded graphics on first use."""
+    if imagecache.picturecache.memory is None:
+        if config.configdata.config_initialized:
+            imagecache.configure_pictures(config.get_picture_cache_size())
+        else:
+            imagecache.configure_pictures(config.configdata.picture_cache_mb * 1024 * 1024)
+
+def picture_key(namespace, name, size=None):
+    """Cache key of a loaded graphic or flat, decoded with the loaded
+    PLAYPAL and, if size is given, scaled down to fit in it. Lumps of
+    WADs without a fingerprint are identified by their content."""
+    w = current_waddata()
+    lump = getattr(w, namespace).get(name)
+    if lump is None:
+        return None
+    playpal = w.data.get('PLAYPAL')
+    return diskcache.digest("picture", namespace, name,
+                            lump_fingerprint(namespace, name) or lump.data,
+                            "default" if playpal is None else lump_fingerprint('data', 'PLAYPAL') or playpal.data,
+                            "%dx%d" % size if size else "")
+
+def _cached_picture(key, namespace, name, size):
+    picture_cache()
+    def decode():
+        data = getattr(current_waddata(), namespace)[name].data
+        if size:
+            return picture.thumbnail(data, size, flat=(namespace == 'flats'))
+        return picture.lump_image(data, flat=(namespace == 'flats'))
+    return imagecache.picture(key, decode)
+
+def get_waddata_picture(namespace, name, size=None):
+    """A loaded graphic ('graphics') or flat ('flats') as an RGBA PIL
+    image, scaled down to fit in size (width, height) if given, or
+    None if the lump is missing or not a picture. Cached in memory;
+    don't change the image returned."""
+    key = picture_key(namespace, name, size)
+    if key is None:
+        return None
+    return _cached_picture(key, namespace, name, size)
+
+def get_waddata_picture_image(namespace, name, size=None):
+    """get_waddata_picture() as a Tk PhotoImage, or None. The same
+    PhotoImage is handed out again while it stays in the cache."""
+    key = picture_key(namespace, name, size)
+    if key is None:
+        return None
+    im = _cached_picture(key, namespace, name, size)
+    if im is None:
+        return None
+    return imagecache.photo(key, im, ImageTk.PhotoImage)
+
+def picture_jobs(namespace, names, size):
+    """(name, cache key, lump) of each loaded graphic or flat in names
+    that isn't in the memory cache yet, as thumbnails.Thumbnailer.request()
+    takes them."""
+    picture_cache()
+    lumps = getattr(current_waddata(), namespace)
+    jobs = []
+    for name in names:
+        key = picture_key(namespace, name, size)
+        if key is not None and not imagecache.is_picture_cached(key):
+            jobs.append((name, key, lumps[name]))
+    return jobs
+
+def get_cached_picture_image(namespace, name, size):
+    """get_waddata_picture_image() if the picture is in the memory
+    cache, without decoding it otherwise; else None."""
+    key = picture_key(namespace, name, size)
+    if key is None or not imagecache.is_picture_cached(key):
+        return None
+    return get_waddata_picture_image(namespace, name, size)
+
+def picture_cache_stats():
+    """(hits, misses, bytes held, budget in bytes) of the cache of
+    decoded graphics and, second, of the cache of PhotoImages."""
+    return (imagecache.picture_stats(), imagecache.photo_stats())
@@ -18,23 +18,28 @@
 import omg
 import os
 
-def write_umapinfo_to_wad(wadfile, umapinfo_string):
+def _lump_data(umapinfo_data):
+    """Lump data from string UMAPINFO (encoded as UTF-8, which
+    is ASCII-compatible) or already-encoded bytes or bytearray."""
+    if isinstance(umapinfo_data, str):
+        return umapinfo_data.encode('utf-8')
+    return umapinfo_data
+
+def write_umapinfo_to_wad(wadfile, umapinfo_data):
     """Write UMAPINFO to WAD file.
-    Expects string UMAPINFO."""
+    Expects string UMAPINFO or its encoded bytes/bytearray,
+    e.g. as produced by parser.write_umapinfo."""
     if os.path.exists(wadfile):
         w = omg.WAD(from_file=wadfile)
         os.replace(os.path.realpath(wadfile), os.path.realpath(wadfile) + ".umapinfo.bak")
     else:
         w = omg.WAD()
 
-    try:
-        w.data['UMAPINFO'] = omg.Lump(umapinfo_string.encode('ascii'))
-    except UnicodeDecodeError:
-        w.data['UMAPINFO'] = omg.Lump(umapinfo_string.encode('utf-8'))
+    w.data['UMAPINFO'] = omg.Lump(_lump_data(umapinfo_data))
     w.to_file(wadfile)
 
-def write_umapinfo_to_file(filename, umapinfo_string):
+def write_umapinfo_to_file(filename, umapinfo_data):
     """Write UMAPINFO to file as a raw lump.
-    Expects string UMAPINFO."""
+    Expects string UMAPINFO or its encoded bytes/bytearray."""
     # Raises KeyError if not found
-    omg.Lump(umapinfo_string.encode('ascii')).to_file(filename)
+    omg.Lump(_lump_data(umapinfo_data)).to_file(filename)
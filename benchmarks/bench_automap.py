@@ -0,0 +1,96 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare drawing the automap of large maps one ImageDraw.line per
+linedef against the numpy renderer. That they draw the same pixels
+is tested in tests/test_maprender.py.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_automap"""
+import random
+import struct
+
+import omg
+from PIL import Image, ImageDraw
+from UMAPINFODesigner.uio import maprender
+from benchmarks.common import timeit
+
+_vertex = struct.Struct('<hh')
+_linedef = struct.Struct('<HHHH6x')
+
+def make_map(nlines, seed=0):
+    """A map of nlines short linedefs, mostly joined end to end, over
+    an area the size of a large slaughter map."""
+    r = random.Random(seed)
+    vertexes = []
+    linedefs = []
+    (x, y) = (0, 0)
+    for n in range(nlines):
+        if n % 50 == 0:
+            (x, y) = (r.randint(-12000, 12000), r.randint(-12000, 12000))
+            vertexes.append((x, y))
+        x = max(-32768, min(32767, x + r.randint(-256, 256)))
+        y = max(-32768, min(32767, y + r.randint(-256, 256)))
+        vertexes.append((x, y))
+        flags = r.choice((1, 1, 4, 4, 5))
+        action = r.choice((0,) * 9 + (1,))
+        linedefs.append((len(vertexes) - 2, len(vertexes) - 1, flags, action))
+    return {'VERTEXES': omg.Lump(b''.join(_vertex.pack(*v) for v in vertexes)),
+            'LINEDEFS': omg.Lump(b''.join(_linedef.pack(*l) for l in linedefs))}
+
+def draw_lines(mapw, width=192):
+    """The automap as drawn before, one line at a time."""
+    vertexes = [list(v) for v in _vertex.iter_unpack(mapw['VERTEXES'].data)]
+    linedefs = [(a, b, flags & 4, action) for (a, b, flags, action) in _linedef.iter_unpack(mapw['LINEDEFS'].data)]
+    xmin = ymin = 32767
+    xmax = ymax = -32768
+    for (x, y) in vertexes:
+        xmin = min(xmin, x)
+        xmax = max(xmax, x)
+        ymin = min(ymin, -y)
+        ymax = max(ymax, -y)
+    xscale = width / float(xmax - xmin)
+    yscale = width / float(ymax - ymin)
+    xmax = int(xmax * xscale)
+    xmin = int(xmin * xscale)
+    ymax = int(ymax * yscale)
+    ymin = int(ymin * yscale)
+    for v in vertexes:
+        v[0] = round( v[0] * xscale, None)
+        v[1] = round(-v[1] * yscale, None)
+    im = Image.new('RGB', ((xmax - xmin) + 8, (ymax - ymin) + 8), (0,0,0))
+    draw = ImageDraw.Draw(im)
+    linedefs.sort(key=lambda a: not a[2])
+    for (vx_a, vx_b, two_sided, action) in linedefs:
+        color = (52, 235, 131)
+        if two_sided:
+            color = (206, 224, 214)
+        if action:
+            color = (217, 214, 50)
+        draw.line((vertexes[vx_a][0] - xmin + 4, vertexes[vx_a][1] - ymin + 4,
+                   vertexes[vx_b][0] - xmin + 4, vertexes[vx_b][1] - ymin + 4), fill=color)
+    return im
+
+def main():
+    for nlines in (3000, 30000, 60000):
+        mapw = make_map(nlines)
+        old, _ = timeit(str(nlines) + " linedefs, ImageDraw.line", lambda: draw_lines(mapw))
+        new, _ = timeit(str(nlines) + " linedefs, numpy", lambda: maprender.render_map(mapw))
+        print("speedup: %.2fx" % (old / new))
+
+if __name__ == "__main__":
+    main()
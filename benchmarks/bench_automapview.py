@@ -0,0 +1,44 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare zooming into a large map by drawing all of it bigger
+against drawing only the lines the grid index finds in view.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_automapview"""
+from UMAPINFODesigner.uio import maprender
+from benchmarks.bench_automap import make_map
+from benchmarks.common import timeit
+
+def main():
+    mapw = make_map(60000)
+    _, geometry = timeit("read lines and build grid index", lambda: maprender.read_map_geometry(mapw))
+    (left, top, right, bottom) = geometry.bounds
+    size = (640, 640)
+    fit = min(size[0] / (right - left), size[1] / (bottom - top))
+    timeit("whole map in view", lambda: maprender.render_view(geometry, left, top, fit, size))
+    for zoom in (4, 16):
+        width = int((right - left) * fit * zoom)
+        old, _ = timeit("zoom x" + str(zoom) + ", draw all at " + str(width) + " px", lambda: maprender.render_map(mapw, width))
+        middle = ((left + right) / 2, (top + bottom) / 2)
+        scale = fit * zoom
+        view = lambda: maprender.render_view(geometry, middle[0] - size[0] / 2 / scale, middle[1] - size[1] / 2 / scale, scale, size)
+        new, _ = timeit("zoom x" + str(zoom) + ", draw what is in view", view)
+        print("speedup: %.2fx" % (old / new))
+
+if __name__ == "__main__":
+    main()
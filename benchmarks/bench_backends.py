@@ -0,0 +1,97 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare the dict and columnar UMAPINFO document stores.
+
+Replays the same edits against both backends and checks they agree,
+then measures key lookups and the memory held by a loaded document.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_backends [number of maps]"""
+import sys
+
+from UMAPINFODesigner.structure import umapinfo
+from UMAPINFODesigner.structure.columnar import ColumnarUMAPINFO
+from UMAPINFODesigner.structure.utypes import UType
+from UMAPINFODesigner.uio import parser
+from benchmarks.common import make_umapinfo, peak_memory, timeit
+
+LOOKUP_KEYS = ("levelname", "next", "music", "skytexture", "partime", "intertext", "episode", "nosuchkey")
+
+def observe(maps):
+    """What the UI would see of the document."""
+    seen = [list(umapinfo.umapinfo.u.keys()), umapinfo.generate_umapinfo()]
+    for umap in maps:
+        for key in LOOKUP_KEYS + ("bossaction",):
+            v = umapinfo.get_key(umap, key)
+            vs = umapinfo.get_key(umap, key, full_list=True)
+            seen.append((umap, key, umapinfo.has_key(umap, key),
+                         v and (v.utype, v.value),
+                         vs and [(uv.utype, uv.value) for uv in vs]))
+    return seen
+
+def replay(backend, text):
+    """Runs an editing session and returns everything observed."""
+    umapinfo.set_backend(backend)
+    umapinfo.load_umapinfo(parser.parse_umapinfo(text))
+    seen = observe(["MAP01", "MAP02", "MAP11"])
+    umapinfo.add_key("MAP01", "levelname", UType.STRING, "Renamed")
+    umapinfo.add_key("MAP01", "bossaction", UType.TUPLE, ("DoomImp", "23", "5"), append=True)
+    umapinfo.add_key("MAP01", "bossaction", UType.TUPLE, ("Cyberdemon", "11", "0"), append=True)
+    umapinfo.del_key("MAP02", "music")
+    umapinfo.add_key("MAP02", "music", UType.STRING, "D_STALKS")
+    umapinfo.del_key("MAP11", "episode")
+    umapinfo.add_map("new01")
+    umapinfo.add_key("NEW01", "partime", UType.NUMBER, 90)
+    umapinfo.rename_map("MAP02", "MAP99")
+    umapinfo.sub_map("MAP03")
+    umapinfo.resolve_episodes()
+    seen += observe(["MAP01", "MAP99", "MAP11", "NEW01", "MAP03"])
+    seen.append(umapinfo.get_episode_tree())
+    return seen
+
+def lookups(maps):
+    found = 0
+    for umap in maps:
+        for key in LOOKUP_KEYS:
+            if umapinfo.get_key(umap, key) is not None:
+                found += 1
+    return found
+
+def main():
+    nmaps = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    text = make_umapinfo(nmaps)
+    print(str(nmaps) + " maps")
+    assert replay(umapinfo.DICT_BACKEND, make_umapinfo(50)) == replay(umapinfo.COLUMNAR_BACKEND, make_umapinfo(50))
+    print("backends agree")
+
+    doc = parser.parse_umapinfo(text)
+    maps = list(doc)
+    for backend in (umapinfo.DICT_BACKEND, umapinfo.COLUMNAR_BACKEND):
+        umapinfo.set_backend(backend)
+        umapinfo.clear_umapinfo()
+        umapinfo.load_umapinfo(doc)
+        timeit(backend + " get_key", lambda: lookups(maps))
+    umapinfo.set_backend(umapinfo.DICT_BACKEND)
+    umapinfo.clear_umapinfo()
+    del doc
+    peak_memory("dict document", lambda: parser.parse_umapinfo(text))
+    # the conversion from a parsed document is part of the cost
+    peak_memory("columnar document", lambda: ColumnarUMAPINFO(parser.parse_umapinfo(text)))
+
+if __name__ == "__main__":
+    main()
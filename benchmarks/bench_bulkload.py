@@ -0,0 +1,73 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare loading a folder of PWADs one after the other against
+reading them in parallel worker processes. There is nothing to
+compare on a machine with one CPU, where only the results are checked.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_bulkload [number of WADs]"""
+import os
+import shutil
+import sys
+import tempfile
+
+from UMAPINFODesigner.structure.waddata import waddata
+from UMAPINFODesigner.uio import wadreader
+from benchmarks.common import make_wad, timeit
+
+def main():
+    nwads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    directory = tempfile.mkdtemp()
+    try:
+        paths = []
+        for i in range(nwads):
+            paths.append(os.path.join(directory, 'mod' + str(i) + '.wad'))
+            # lump names overlap between the WADs, as in a real stack
+            make_wad(paths[-1], npatches=6000, nflats=600, kind=b'PWAD')
+        cpus = os.cpu_count() or 1
+        print("%d WADs, %d KiB, %d CPUs" % (nwads, sum(os.path.getsize(p) for p in paths) // 1024, cpus))
+        def state():
+            return (list(waddata.wad), sorted(waddata.graphics), sorted(waddata.maps), sorted(waddata.flats), sorted(waddata.textures))
+        def serial():
+            waddata.clear()
+            for path in paths:
+                if not wadreader.read_waddata_from_wad_if_match(path, False, True):
+                    raise ValueError(path)
+            return state()
+        def parallel():
+            waddata.clear()
+            if wadreader.read_waddata_from_wads(paths, False, True, parallel=True):
+                raise ValueError(paths)
+            return state()
+        # start the worker processes up front, as the first load does
+        parallel()
+        old, loaded = timeit("one at a time", serial)
+        new, bulk = timeit("worker processes", parallel)
+        assert loaded == bulk
+        if cpus == 1:
+            # the workers can only take turns, and the designer reads
+            # one at a time here anyway (see read_waddata_from_wads())
+            print("speedup: not measured, only one CPU")
+        else:
+            print("speedup: %.2fx" % (old / new))
+    finally:
+        waddata.clear()
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
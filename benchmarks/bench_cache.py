@@ -0,0 +1,60 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare loading a UMAPINFO lump with and without a warm parse cache.
+
+The cache is placed in a temporary home directory.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_cache [number of maps]"""
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmarks.common import make_umapinfo, timeit
+
+def main():
+    nmaps = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    home = tempfile.mkdtemp()
+    os.environ['HOME'] = home
+    from UMAPINFODesigner.structure import config
+    from UMAPINFODesigner.structure.waddata import waddata
+    from UMAPINFODesigner.uio import wadreader
+    config.initialize()
+    try:
+        waddata.clear()
+        waddata.umapinfo = make_umapinfo(nmaps).encode('utf-8')
+        waddata.music.push("bench", {"D_RUNNIN": None})
+        waddata.graphics.push("bench", {"M_EPI1": None})
+        print(str(nmaps) + " maps, " + str(len(waddata.umapinfo) // 1024) + " KiB of UMAPINFO")
+        def load():
+            return wadreader.get_waddata_umapinfo_checked({}, {})
+        def cold_load():
+            wadreader.umapinfocache.cache.clear()
+            return load()
+        load()
+        cold, colddoc = timeit("parse + validate", cold_load)
+        warm, warmdoc = timeit("cache hit", load)
+        print("speedup: %.2fx" % (cold / warm))
+        print("cache size: %d KiB" % (sum(e[1] for e in wadreader.umapinfocache.cache.entries()) // 1024))
+        assert list(colddoc) == list(warmdoc)
+    finally:
+        shutil.rmtree(home)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare identifying a WAD by its content fingerprint, hashed
+through a mapping of the file, against hashing the whole file and
+against the first fingerprint, which read the lumps it hashes with
+f.read(), and time checking the fingerprint of a file seen before. Also compare building the validation cache key
+from the loaded WADs' fingerprints against their lump names.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fingerprint"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from benchmarks.common import make_wad, timeit
+
+def read_fingerprint(path):
+    """The fingerprint as it was first made, with f.read()."""
+    from UMAPINFODesigner.uio import lazywad
+    whole = lazywad._FINGERPRINT_WHOLE
+    with open(path, 'rb') as f:
+        (header, directory) = lazywad._read_directory(f)
+        h = hashlib.blake2b(header, digest_size=16)
+        h.update(directory)
+        step = max(1, len(directory) // lazywad._entry.size // lazywad._FINGERPRINT_SAMPLES)
+        for (i, (ptr, size, name)) in enumerate(lazywad._entry.iter_unpack(directory)):
+            if not size:
+                continue
+            if name.rstrip(b'\0').upper() in whole:
+                f.seek(ptr)
+                h.update(f.read(size))
+            elif i % step == 0:
+                f.seek(ptr)
+                h.update(f.read(min(size, lazywad._FINGERPRINT_SAMPLE_SIZE)))
+        return h.hexdigest()
+
+def main():
+    from UMAPINFODesigner.structure.waddata import waddata
+    from UMAPINFODesigner.uio import lazywad, wadreader
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'bench.wad')
+        # a megawad's worth of maps
+        make_wad(path, nmaps=300)
+        print("%d KiB WAD" % (os.path.getsize(path) // 1024))
+        def whole_file():
+            h = hashlib.blake2b(digest_size=16)
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+            return h.hexdigest()
+        def mapped():
+            lazywad.fingerprintcache.known.clear()
+            return lazywad.file_fingerprint(path)
+        old, _ = timeit("hash whole file", whole_file)
+        read, first = timeit("fingerprint with f.read()", lambda: read_fingerprint(path))
+        new, fingerprint = timeit("fingerprint through mmap", mapped)
+        print("speedup: %.2fx over the whole file, %.2fx over f.read()" % (old / new, read / new))
+        assert first == fingerprint
+        seen, _ = timeit("fingerprint of a file seen before", lambda: lazywad.file_fingerprint(path), repeat=10)
+        print("speedup: %.0fx" % (new / seen))
+
+        wadreader.read_waddata_from_wad(path, clean=True)
+        fingerprints = waddata.wad['bench.wad'].fingerprint
+        def by_names():
+            return "\n".join(["\0".join(sorted(getattr(waddata, category)))
+                              for category in ('graphics', 'data', 'music', 'flats', 'maps', 'textures', 'patches')])
+        old, _ = timeit("validation key from lump names", by_names, repeat=10)
+        new, key = timeit("validation key from fingerprints", wadreader._validation_context, repeat=10)
+        print("speedup: %.2fx" % (old / new))
+        assert fingerprints in key
+    finally:
+        waddata.clear()
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Scroll a gallery of generated graphics from top to bottom and
+compare how long the UI thread is held up per scroll step when the
+thumbnails in view are decoded there, against asking thumbnails.
+Thumbnailer for them and picking up what is done.
+
+Tk isn't needed: the root's after() is a queue run between steps.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_gallery [number of graphics]"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import omg
+from omg import lump
+
+from UMAPINFODesigner.structure.waddata import waddata
+from UMAPINFODesigner.uio import imagecache, thumbnails, wadreader
+from benchmarks.common import make_graphic_lumps
+
+SIZE = (96, 80)
+COLUMNS = 5
+ROWS = 4
+
+class Root():
+    """Runs after() callbacks when asked to, as Tk's event loop would."""
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, func, *args):
+        self.pending.append((func, args))
+
+    def run_pending(self):
+        (pending, self.pending) = (self.pending, [])
+        for (func, args) in pending:
+            func(*args)
+
+def scroll(names, step):
+    """Runs step(first, last) for each view, scrolling a row at a time.
+    Returns the longest and mean time a step took."""
+    times = []
+    for row in range(0, (len(names) + COLUMNS - 1) // COLUMNS - ROWS + 1):
+        start = time.perf_counter()
+        step(row * COLUMNS, (row + ROWS) * COLUMNS)
+        times.append(time.perf_counter() - start)
+        # the user takes a moment before scrolling again
+        time.sleep(0.01)
+    return (max(times), sum(times) / len(times))
+
+def main():
+    ngraphics = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    directory = tempfile.mkdtemp()
+    try:
+        (patches, _) = make_graphic_lumps(npatches=ngraphics, nflats=0, nbig=0)
+        wad = omg.WAD()
+        for (n, (_, data)) in enumerate(patches):
+            wad.graphics['M_%06d' % n] = lump.Graphic(data)
+        path = os.path.join(directory, 'graphics.wad')
+        wad.to_file(path)
+        wadreader.read_waddata_from_wad(path, clean=True)
+        names = waddata.graphics.sorted_names()
+        print("%d graphics, %dx%d cells in view" % (len(names), COLUMNS, ROWS))
+
+        imagecache.configure_pictures(32 * 1024 * 1024)
+        def blocking(first, last):
+            for name in names[first:last]:
+                wadreader.get_waddata_picture('graphics', name, SIZE)
+        (longest, mean) = scroll(names, blocking)
+        print("%-40s %8.1f ms longest, %6.2f ms mean" % ("decode in view on the UI thread", longest * 1000, mean * 1000))
+
+        imagecache.configure_pictures(32 * 1024 * 1024)
+        root = Root()
+        loader = thumbnails.Thumbnailer(root, SIZE)
+        shown = [0, 0]
+        def lazy(first, last):
+            root.run_pending()
+            # draw what is ready, as Gallery.draw() does
+            for name in names[first:last]:
+                key = wadreader.picture_key('graphics', name, SIZE)
+                shown[imagecache.is_picture_cached(key)] += 1
+                imagecache.picturecache.memory.get(key)
+            wanted = names[first:last + 3 * COLUMNS] + names[max(0, first - 3 * COLUMNS):first][::-1]
+            loader.request(wadreader.picture_jobs('graphics', wanted, SIZE))
+        (longest, mean) = scroll(names, lazy)
+        print("%-40s %8.1f ms longest, %6.2f ms mean" % ("thumbnailer, %d workers" % loader.workers, longest * 1000, mean * 1000))
+        print("thumbnails ready when drawn: %.0f%%" % (100.0 * shown[1] / sum(shown)))
+        loader.cancel()
+    finally:
+        waddata.clear()
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare loading an IWAD by reading and sorting its directory
+against restoring it from the persistent WAD index.
+
+The cache is placed in a temporary home directory.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_iwadindex"""
+import os
+import shutil
+import tempfile
+
+from benchmarks.common import make_wad, timeit
+
+def main():
+    home = tempfile.mkdtemp()
+    os.environ['HOME'] = home
+    from UMAPINFODesigner.structure import config
+    from UMAPINFODesigner.structure.waddata import waddata
+    from UMAPINFODesigner.uio import wadreader
+    config.initialize()
+    try:
+        path = os.path.join(home, 'bench.wad')
+        make_wad(path)
+        print("%d KiB IWAD" % (os.path.getsize(path) // 1024))
+        def categories():
+            return [sorted(getattr(waddata, c)) for c in ('graphics', 'music', 'flats', 'maps', 'data', 'textures')]
+        def scan():
+            wadreader.read_waddata_from_wad(path, clean=True)
+            return categories()
+        def indexed():
+            wadreader.read_waddata_from_iwad(path)
+            return categories()
+        indexed()
+        old, scanned = timeit("read directory", scan)
+        new, restored = timeit("index hit", indexed)
+        print("speedup: %.2fx" % (old / new))
+        print("cache size: %d KiB" % (sum(e[1] for e in wadreader.umapinfocache.cache.entries()) // 1024))
+        assert scanned == restored
+    finally:
+        waddata.clear()
+        shutil.rmtree(home)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare what opening and filtering a lump picker costs with 50000
+lump names: sorting the names on every open and scanning them all
+for a prefix, against the sorted names waddata keeps and a bisect
+into them. Also times keeping the names sorted as WADs are loaded.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_lumplist [number of lumps]"""
+import random
+import sys
+
+from UMAPINFODesigner.structure.waddata import LumpNamespace
+from benchmarks.common import timeit
+
+PREFIXES = ['', 'W', 'WI', 'WIB', 'WIBG', 'WIBG1', 'WIBG12', 'M_', 'Z']
+
+def load(layers):
+    namespace = LumpNamespace()
+    for (i, lumps) in enumerate(layers):
+        namespace.push(i, lumps)
+    return namespace
+
+def main():
+    nlumps = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    r = random.Random(0)
+    stems = ['WIBG', 'M_', 'TITLE', 'CWILV', 'PFUB', 'STF', 'SPR', 'D_', 'DS', 'TEX']
+    names = set()
+    while len(names) < nlumps:
+        stem = r.choice(stems)
+        names.add(stem + str(r.randrange(10 ** (8 - len(stem)))))
+    names = list(names)
+    # an IWAD, a big resource WAD and a few small PWADs on top
+    layers = [dict.fromkeys(names[:nlumps // 10], 0), dict.fromkeys(names[nlumps // 10:], 0)]
+    layers.extend(dict.fromkeys(r.sample(names, 20) + ['NEW%05d' % (i * 20 + n) for n in range(20)], 0) for i in range(5))
+    _, namespace = timeit("load, keeping names sorted", lambda: load(layers))
+    print("%d names" % len(namespace))
+    old, listed = timeit("open: sorted() every time", lambda: sorted(namespace))
+    new, kept = timeit("open: sorted names", lambda: namespace.sorted_names())
+    assert listed == kept
+    old, scanned = timeit("filter: scan every name", lambda: [[n for n in listed if n.startswith(p)] for p in PREFIXES])
+    new, found = timeit("filter: bisect", lambda: [namespace.with_prefix(p) for p in PREFIXES])
+    print("filter speedup: %.0fx" % (old / new))
+    assert scanned == found
+
+if __name__ == "__main__":
+    main()
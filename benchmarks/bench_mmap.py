@@ -0,0 +1,64 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare memory-mapped lump access against reading lumps from the
+file, touching every graphic, flat and map lump of a few WADs the way
+browsing them in the UI does.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_mmap"""
+import os
+import shutil
+import tempfile
+
+from UMAPINFODesigner.structure.waddata import waddata
+from UMAPINFODesigner.uio import lazywad, maprender
+from benchmarks.common import make_wad, peak_memory, timeit
+
+def browse(paths, use_mmap):
+    waddata.clear()
+    total = 0
+    for path in paths:
+        wad = lazywad.LazyWAD(from_file=path, use_mmap=use_mmap)
+        waddata.merge(os.path.basename(path), wad)
+        for group in (wad.graphics, wad.flats):
+            for lump in group.values():
+                total += len(lump.data)
+        for mapname in wad.maps:
+            maprender.read_map_lines(wad.maps[mapname])
+    return total
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        paths = []
+        for i in range(4):
+            paths.append(os.path.join(directory, 'bench' + str(i) + '.wad'))
+            make_wad(paths[-1], kind=b'IWAD' if i == 0 else b'PWAD')
+        print("%d KiB of WADs" % (sum(os.path.getsize(p) for p in paths) // 1024))
+        old, read = timeit("file reads", lambda: browse(paths, False))
+        new, mapped = timeit("memory-mapped", lambda: browse(paths, True))
+        assert read == mapped
+        print("speedup: %.2fx" % (old / new))
+        peak_memory("file reads", lambda: browse(paths, False))
+        peak_memory("memory-mapped", lambda: browse(paths, True))
+    finally:
+        waddata.clear()
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare the layered lump namespaces of waddata against merging
+every WAD into flat sets and dicts, as waddata used to, for a deep
+stack of WADs: loading them, looking up maps, unloading one and
+loading one more into a staged copy of waddata. That the layers
+hold what merging them flat would is tested in tests/test_waddata.py.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_namespace [number of WADs]"""
+import sys
+from collections import OrderedDict
+
+from UMAPINFODesigner.structure.waddata import waddata
+from benchmarks.common import timeit
+
+class FakeWAD():
+    """Just the groups waddata.merge looks at."""
+    def __init__(self, n):
+        # half the names are shared by every WAD, half are its own
+        self.graphics = {'GFX' + str(i % 1500 if i % 2 else n * 10000 + i): i for i in range(3000)}
+        self.flats = {'FLAT' + str(i): i for i in range(300)}
+        self.music = {'D_MUS' + str(i): i for i in range(40)}
+        self.maps = OrderedDict(('MAP%02d' % (i + 1), {'n': n}) for i in range(32))
+        self.data = {'DATA' + str(n) + '_' + str(i): i for i in range(500)}
+        self.patches = {'PAT' + str(n) + '_' + str(i): i for i in range(1000)}
+        self.txdefs = {}
+
+class flatdata():
+    """waddata as it was: every category flattened on each merge."""
+    def __init__(self):
+        self.wad = OrderedDict()
+        self.graphics = set()
+        self.glumps = {}
+        self.music = set()
+        self.flats = set()
+        self.flumps = {}
+        self.maps = set()
+        self.data = set()
+
+    def merge(self, name, wad):
+        self.wad[name] = wad
+        self.graphics.update(wad.graphics.keys())
+        self.glumps = {**self.glumps, **wad.graphics}
+        self.music.update(wad.music.keys())
+        self.flats.update(wad.flats.keys())
+        self.flumps = {**self.flumps, **wad.flats}
+        self.maps.update(wad.maps.keys())
+        self.data.update(wad.data.keys())
+
+    def get_map(self, mapname):
+        for wad in reversed(self.wad):
+            if mapname in self.wad[wad].maps:
+                return self.wad[wad].maps[mapname]
+
+def main():
+    nwads = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    wads = [('mod' + str(n) + '.wad', FakeWAD(n)) for n in range(nwads)]
+    print(str(nwads) + " WADs")
+    def flat_load():
+        d = flatdata()
+        for (name, wad) in wads:
+            d.merge(name, wad)
+        return d
+    def layered_load():
+        waddata.clear()
+        for (name, wad) in wads:
+            waddata.merge(name, wad)
+    old, flat = timeit("merge, flat", flat_load)
+    new, _ = timeit("merge, layered", layered_load)
+    print("speedup: %.2fx" % (old / new))
+    # maps only in the bottom WAD have to be searched for the longest
+    wads[0][1].maps['MAP99'] = {'n': 0}
+    flat = flat_load()
+    layered_load()
+    lookups = ['MAP99', 'MAP01'] * 5000
+    old, _ = timeit("get_map, flat", lambda: [flat.get_map(m) for m in lookups])
+    new, _ = timeit("get_map, layered", lambda: [waddata.get_map(m) for m in lookups])
+    print("speedup: %.2fx" % (old / new))
+    def flat_unload():
+        d = flatdata()
+        for (name, wad) in wads[1:]:
+            d.merge(name, wad)
+    def layered_unload():
+        waddata.remove(wads[0][0])
+        waddata.merge(wads[0][0], wads[0][1])
+        waddata.move(wads[0][0], 0)
+    old, _ = timeit("unload a WAD, flat (clear and reload)", flat_unload)
+    new, _ = timeit("unload a WAD, layered (and put it back)", layered_unload)
+    print("speedup: %.2fx" % (old / new))
+    # a background load: stage a copy, load one more WAD into it, swap it in
+    extra = ('extra.wad', FakeWAD(len(wads)))
+    def load_staged(copy):
+        state = waddata.snapshot()
+        if copy:
+            for namespace in ('graphics', 'music', 'flats', 'maps', 'data', 'patches', 'textures'):
+                setattr(state, namespace, getattr(waddata, namespace).copy())
+            (state.glumps, state.flumps) = (state.graphics, state.flats)
+        with waddata.staged(state):
+            waddata.merge(*extra)
+        waddata.restore(state)
+        waddata.remove(extra[0])
+    old, _ = timeit("load a WAD staged, copying namespaces", lambda: load_staged(True))
+    new, _ = timeit("load a WAD staged, overlaying them", lambda: load_staged(False))
+    print("speedup: %.2fx" % (old / new))
+    waddata.clear()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare the tokenizing UMAPINFO parser against the old regex pipeline.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parser [number of maps]"""
+import re
+import sys
+from collections import defaultdict
+
+from UMAPINFODesigner.structure import utypes
+from UMAPINFODesigner.uio import parser
+from benchmarks.common import make_umapinfo, peak_memory, timeit
+
+def is_tuple(val):
+    skip = False
+    quote = False
+    for c in val:
+        if skip:
+            skip = False
+        elif c == "\\":
+            skip = True
+        elif c == '"':
+            quote = not quote
+        elif c == ',' and not quote:
+            return True
+    return False
+
+def parse_value(val):
+    """Parse a single UMAPINFO value of any type, as the old parser did."""
+    utype = utypes.UType.UNKNOWN
+    valstring = str(val)
+    valprocessed = None
+    if valstring.isnumeric():
+        utype = utypes.UType.NUMBER
+        valprocessed = int(val)
+    elif ",|" in valstring:
+        # multiline string is the only value with a newline
+        utype = utypes.UType.MULTISTRING
+        valprocessed = valstring.split(",|")
+        for v in range(len(valprocessed)):
+            # remove quote wraps
+            vs = valprocessed[v].strip()[1:-1]
+            # un-escape remaining quotes (will be re-added when
+            # exported.
+            vs = vs.replace('\\"', '"')
+            valprocessed[v] = vs
+    elif is_tuple(valstring):
+        utype = utypes.UType.TUPLE
+        valprocessed = valstring.split(',')
+        for v in range(len(valprocessed)):
+            valprocessed[v] = valprocessed[v].strip()
+    elif valstring.lower() in ['clear', 'true', 'false']:
+        utype = utypes.UType.KEYWORD
+        valprocessed = valstring
+    elif '"' in valstring:
+        utype = utypes.UType.STRING
+        valprocessed = valstring.strip().strip('"')
+
+    return utypes.UMAPINFOValue(valprocessed, utype)
+
+def legacy_parse_umapinfo(umapinfo):
+    """The regex based parser this benchmark measures against."""
+    parsed_umapinfo = {}
+    umapinfo = re.sub(re.compile(r"/\*.*?\*/",re.DOTALL|re.MULTILINE),'',umapinfo)
+    umapinfo = re.sub(r'//.*','',umapinfo)
+    maps = re.split('{|}',umapinfo)
+    inmap = False
+    for m in maps:
+        m = m.strip()
+        if not m:
+            continue
+        if not inmap and m[:4].upper() == "MAP ":
+            inmap = m[4:].strip()
+        else:
+            m = re.sub(r',[ \t]*[\r\n]+',',|',m,flags=re.MULTILINE)
+            m = m.split("\n")
+            keyvals = defaultdict(list)
+            for kv in m:
+                kv = kv.strip()
+                if not kv:
+                    continue
+                (k,v) = kv.split('=')
+                keyvals[k.strip().lower()].append(parse_value(v.strip()))
+            parsed_umapinfo[inmap] = keyvals
+            inmap = False
+    return parsed_umapinfo
+
+def main():
+    nmaps = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    text = make_umapinfo(nmaps)
+    print(str(nmaps) + " maps, " + str(len(text) // 1024) + " KiB of UMAPINFO")
+    old, olddoc = timeit("regex pipeline", lambda: legacy_parse_umapinfo(text))
+    new, newdoc = timeit("single-pass tokenizer", lambda: parser.parse_umapinfo(text))
+    print("speedup: %.2fx" % (old / new))
+    peak_memory("regex pipeline", lambda: legacy_parse_umapinfo(text))
+    peak_memory("single-pass tokenizer", lambda: parser.parse_umapinfo(text))
+    assert list(olddoc) == list(newdoc)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare decoding the graphic shown in a picker every time the
+selection changes against the shared cache of decoded graphics, over
+a run of picker sessions that keep coming back to the same few
+intermission and end screens. Prints the cache's hit ratio.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_picturecache [number of sessions]"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+import omg
+from omg import lump
+
+from UMAPINFODesigner.structure.waddata import waddata
+from UMAPINFODesigner.uio import imagecache, picture, wadreader
+from benchmarks.common import make_graphic_lumps, timeit
+
+SIZE = (323, 203)
+
+def main():
+    nsessions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    directory = tempfile.mkdtemp()
+    try:
+        (patches, _) = make_graphic_lumps(npatches=200, nflats=0, nbig=8)
+        wad = omg.WAD()
+        # named as omg expects graphics to be: backdrops as intermission
+        # screens, the rest as menu graphics
+        for (name, data) in patches:
+            wad.graphics[('WIBG' if name.startswith('BIG') else 'M_') + name[-4:]] = lump.Graphic(data)
+        path = os.path.join(directory, 'graphics.wad')
+        wad.to_file(path)
+        wadreader.read_waddata_from_wad(path, clean=True)
+        names = sorted(waddata.graphics)
+        backdrops = [name for name in names if name.startswith('WIBG')]
+        # each session looks at a couple of backdrops and browses a few other graphics
+        r = random.Random(0)
+        selections = []
+        for _ in range(nsessions):
+            selections.extend(r.sample(backdrops, 2) + r.sample(names, 4))
+        def decode_each_time():
+            shown = []
+            for name in selections:
+                im = picture.lump_image(waddata.graphics[name].data)
+                im.thumbnail(SIZE)
+                shown.append(im.size)
+            return shown
+        def cached():
+            imagecache.configure_pictures(32 * 1024 * 1024)
+            return [wadreader.get_waddata_picture('graphics', name, SIZE).size for name in selections]
+        print("%d selections in %d sessions over %d graphics" % (len(selections), nsessions, len(names)))
+        old, decoded = timeit("decode on every selection", decode_each_time)
+        new, shown = timeit("shared cache", cached)
+        print("speedup: %.2fx" % (old / new))
+        assert decoded == shown
+        for mb in (1, 4, 32):
+            imagecache.configure_pictures(mb * 1024 * 1024)
+            for name in selections:
+                wadreader.get_waddata_picture('graphics', name, SIZE)
+            (hits, misses, held, budget) = wadreader.picture_cache_stats()[0]
+            print("%2d MiB budget: %5.1f%% hits, %6.1f KiB held" % (mb, 100.0 * hits / (hits + misses), held / 1024.0))
+    finally:
+        waddata.clear()
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare decoding every graphic and flat of an IWAD to RGBA images
+with omg's per-pixel decoder against the numpy one.
+
+Without a WAD, graphics like those of an IWAD are generated. Both
+decoders are given the same palette; that they give the same images
+is tested in tests/test_picture.py.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pictures [IWAD]"""
+import sys
+
+import omg
+from omg import lump
+
+from UMAPINFODesigner.uio import picture
+from benchmarks.common import make_graphic_lumps, timeit
+
+def wad_graphic_lumps(path):
+    """(name, data) of the graphics and patches of a WAD, and of its flats."""
+    wad = omg.WAD(path)
+    patches = [(name, l.data) for group in (wad.graphics, wad.patches, wad.sprites) for (name, l) in group.items()]
+    return (patches, [(name, l.data) for (name, l) in wad.flats.items()])
+
+def main():
+    if len(sys.argv) > 1:
+        (patches, flats) = wad_graphic_lumps(sys.argv[1])
+    else:
+        (patches, flats) = make_graphic_lumps()
+    # skip the few lumps in graphic namespaces that are neither
+    patches = [(name, data) for (name, data) in patches if picture.lump_image(data) is not None]
+    megapixels = sum(picture.decode_patch(data)[0].size for (_, data) in patches) / 1e6
+    print("%d graphics (%.1f megapixels), %d flats" % (len(patches), megapixels, len(flats)))
+    palette = omg.palette.default.bytes
+    def omg_patches():
+        return [lump.Graphic(data).to_Image(mode='RGBA') for (_, data) in patches]
+    def numpy_patches():
+        lut = picture.palette_lut(palette)
+        return [picture.to_image(*picture.decode_patch(data), lut=lut) for (_, data) in patches]
+    old, _ = timeit("graphics, omg", omg_patches, repeat=1)
+    new, _ = timeit("graphics, numpy", numpy_patches)
+    print("speedup: %.2fx, %.1f megapixels/s" % (old / new, megapixels / new))
+    old, _ = timeit("flats, omg", lambda: [lump.Flat(data).to_Image(mode='P') for (_, data) in flats])
+    new, _ = timeit("flats, numpy", lambda: [picture.decode_flat(data)[0] for (_, data) in flats])
+    print("speedup: %.2fx" % (old / new))
+    timeit("flats to RGBA, numpy", lambda: [picture.to_image(*picture.decode_flat(data)) for (_, data) in flats])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare making the picker's 323x203 preview of oversized graphics
+by decoding them in full and scaling down, against decoding them
+already scaled down by whole steps.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_previews"""
+import io
+import random
+
+from omg import lump
+from PIL import Image
+
+from UMAPINFODesigner.uio import picture
+from benchmarks.common import timeit
+
+SIZE = (323, 203)
+
+def make_patch(width, height, seed=0):
+    """A patch of width x height with transparent gaps."""
+    r = random.Random(seed)
+    pixels = [None if r.random() < 0.2 else r.randrange(256) for _ in range(width * height)]
+    g = lump.Graphic()
+    g.from_pixels(pixels, width, height)
+    return g.data
+
+def make_png(width, height, mode):
+    im = Image.effect_noise((width, height), 64).convert(mode)
+    out = io.BytesIO()
+    im.save(out, format='PNG')
+    return out.getvalue()
+
+def full(data):
+    im = picture.lump_image(data)
+    im.thumbnail(SIZE)
+    return im
+
+def main():
+    lumps = [("patch 640x400", make_patch(640, 400)),
+             ("patch 1280x800", make_patch(1280, 800)),
+             ("patch 2560x1440", make_patch(2560, 1440)),
+             ("PNG 1920x1080 RGBA", make_png(1920, 1080, 'RGBA')),
+             ("PNG 1920x1080 paletted", make_png(1920, 1080, 'P')),
+             ("PNG 3840x2160 RGB", make_png(3840, 2160, 'RGB'))]
+    for (label, data) in lumps:
+        old, decoded = timeit(label + ", full decode", lambda: full(data))
+        new, reduced = timeit(label + ", reduced", lambda: picture.thumbnail(data, SIZE))
+        print("speedup: %.2fx" % (old / new))
+        assert decoded.size == reduced.size
+
+if __name__ == "__main__":
+    main()
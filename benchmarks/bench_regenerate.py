@@ -0,0 +1,46 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Measure regenerating UMAPINFO after a single edit, with and
+without the per-map fragment cache.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_regenerate [number of maps]"""
+import sys
+
+from UMAPINFODesigner.structure import umapinfo
+from UMAPINFODesigner.structure.utypes import UType
+from UMAPINFODesigner.uio import parser
+from benchmarks.common import make_umapinfo, timeit
+
+def main():
+    nmaps = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    umapinfo.load_umapinfo(parser.parse_umapinfo(make_umapinfo(nmaps)))
+    # warm the cache, as the first Show UMAPINFO would
+    umapinfo.generate_umapinfo()
+    print(str(nmaps) + " maps")
+    edits = iter(range(1000000))
+    def edit_and_regenerate(generate):
+        umapinfo.add_key("MAP02", "levelname", UType.STRING, "Edit " + str(next(edits)))
+        return generate()
+    full, fulltext = timeit("full regeneration", lambda: edit_and_regenerate(lambda: parser.generate_umapinfo(umapinfo.umapinfo.u)))
+    cached, cachedtext = timeit("cached fragments", lambda: edit_and_regenerate(umapinfo.generate_umapinfo))
+    print("speedup: %.2fx" % (full / cached))
+    assert parser.generate_umapinfo(umapinfo.umapinfo.u) == umapinfo.generate_umapinfo()
+
+if __name__ == "__main__":
+    main()
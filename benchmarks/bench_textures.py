@@ -0,0 +1,72 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare decoding TEXTURE1 and PNAMES a slice at a time, the way
+waddata used to read texture names, against decoding them with struct.
+Reading only the names, as waddata used to, is timed for reference.
+That both decode the same is tested in tests/test_textures.py.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_textures [number of textures]"""
+import sys
+
+from UMAPINFODesigner.structure import textures
+from benchmarks.common import make_texture_lumps, timeit
+
+def get_chunk(d, offset, string=False):
+    if string:
+        return str(d[offset:offset+8], 'ascii').strip('\0')
+    else:
+        return int.from_bytes(d[offset:offset+4], 'little', signed=False)
+
+def process_textures(tex):
+    """The texture names in a TEXTUREx lump, as waddata used to read them."""
+    numtextures = get_chunk(tex, 0)
+    names = set()
+    for i in range(numtextures):
+        offs = get_chunk(tex, 4*i+4)
+        name = get_chunk(tex, offs, True)
+        names.update([name])
+    return names
+
+def get_short(d, offset):
+    return int.from_bytes(d[offset:offset+2], 'little', signed=True)
+
+def slice_definitions(tex, pnames):
+    """Full texture definitions, decoded the same way."""
+    names = [get_chunk(pnames, 4 + 8*i, True).upper() for i in range(get_chunk(pnames, 0))]
+    definitions = {}
+    for i in range(get_chunk(tex, 0)):
+        offs = get_chunk(tex, 4*i+4)
+        name = get_chunk(tex, offs, True).upper()
+        patches = tuple([names[get_short(tex, offs + 22 + 10*p + 4)] for p in range(get_short(tex, offs + 20))])
+        if name not in definitions:
+            definitions[name] = (name, get_short(tex, offs + 12), get_short(tex, offs + 14), patches)
+    return definitions
+
+def main():
+    ntextures = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    (texture1, pnames) = make_texture_lumps(ntextures)
+    print(str(ntextures) + " textures, " + str(len(texture1) // 1024) + " KiB of TEXTURE1")
+    timeit("names only, a slice at a time", lambda: process_textures(texture1))
+    old, _ = timeit("definitions, a slice at a time", lambda: slice_definitions(texture1, pnames))
+    new, _ = timeit("definitions, struct", lambda: textures.resolve(textures.read_texture_lump(texture1), textures.read_pnames(pnames)))
+    print("speedup: %.2fx" % (old / new))
+    timeit("definitions, struct on a memoryview", lambda: textures.resolve(textures.read_texture_lump(memoryview(texture1)), textures.read_pnames(memoryview(pnames))))
+
+if __name__ == "__main__":
+    main()
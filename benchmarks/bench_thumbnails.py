@@ -0,0 +1,53 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare getting an automap preview by drawing it every time
+against the in-memory and on-disk caches.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_thumbnails"""
+import shutil
+import tempfile
+
+from UMAPINFODesigner.uio import imagecache, maprender
+from benchmarks.bench_automap import make_map
+from benchmarks.common import timeit
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        mapw = make_map(30000)
+        key = "bench"
+        def render():
+            return maprender.render_map(mapw, 189)
+        def from_disk():
+            imagecache.automapcache.memory.clear()
+            return imagecache.automap(key, render)
+        imagecache.configure(16 * 1024 * 1024, directory, 32 * 1024 * 1024)
+        imagecache.automap(key, render)
+        old, drawn = timeit("draw", render, repeat=10)
+        disk, loaded = timeit("disk cache hit", from_disk, repeat=10)
+        new, cached = timeit("memory cache hit", lambda: imagecache.automap(key, render), repeat=10)
+        print("speedup: %.2fx from disk, %.0fx from memory" % (old / disk, old / new))
+        print("hits in memory, on disk, renders:", imagecache.stats())
+        assert drawn.tobytes() == loaded.tobytes() == cached.tobytes()
+    finally:
+        imagecache.automapcache.memory = None
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
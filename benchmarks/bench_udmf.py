@@ -0,0 +1,64 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare reading the automap lines of UDMF maps by tokenizing all
+of TEXTMAP into objects against the streaming reader, at a few sizes
+to show that it scales linearly. That both read the same lines is
+tested in tests/test_udmf.py.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_udmf"""
+import re
+
+from UMAPINFODesigner.uio import udmf
+from benchmarks.common import make_textmap, timeit
+
+_token = re.compile(rb'\s+|//[^\n]*|/\*.*?\*/|("(?:[^"\\]|\\.)*")|([A-Za-z_]\w*)|([-+0-9.][0-9a-fA-FxX.eE+-]*)|([{};=])', re.S)
+
+def tokenize_all(data):
+    """Every block as a dict of every field, as a general UDMF parser
+    would build them, then the lines picked out of those."""
+    tokens = [m.group(m.lastindex) for m in _token.finditer(data) if m.lastindex]
+    blocks = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i + 1] == b'{':
+            fields = {}
+            kind = tokens[i].lower()
+            i += 2
+            while tokens[i] != b'}':
+                fields[tokens[i].lower()] = tokens[i + 2]
+                i += 4
+            i += 1
+            blocks.append((kind, fields))
+        else:
+            i += 4
+    vertexes = [(float(f.get(b'x', 0)), float(f.get(b'y', 0))) for (kind, f) in blocks if kind == b'vertex']
+    linedefs = [(int(f[b'v1']), int(f[b'v2']), 4 if f.get(b'twosided', b'').lower() == b'true' else 0, int(f.get(b'special', 0)))
+                for (kind, f) in blocks if kind == b'linedef']
+    return (vertexes, linedefs)
+
+def main():
+    for scale in (1, 4, 16):
+        data = make_textmap(750 * scale, 5000 * scale)
+        label = "%.1f MB TEXTMAP, " % (len(data) / 1048576.0)
+        old, _ = timeit(label + "tokenize all", lambda: tokenize_all(data))
+        new, _ = timeit(label + "streaming", lambda: udmf.read_textmap(memoryview(data)))
+        print("speedup: %.2fx, %.1f MB/s" % (old / new, len(data) / 1048576.0 / new))
+
+if __name__ == "__main__":
+    main()
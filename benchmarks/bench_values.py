@@ -0,0 +1,54 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare the memory held by a parsed UMAPINFO with the slotted,
+interned UMAPINFOValue against the old per-instance __dict__ class.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_values [number of maps]"""
+import sys
+
+from UMAPINFODesigner.structure import utypes
+from UMAPINFODesigner.uio import parser
+from benchmarks.bench_parser import legacy_parse_umapinfo
+from benchmarks.common import make_umapinfo, peak_memory
+
+class LegacyUMAPINFOValue():
+    def __init__(self,value,utype):
+        self.utype = utype
+        self.value = value
+
+def legacy_intern_value(value, utype):
+    return LegacyUMAPINFOValue(value, utype)
+
+def main():
+    nmaps = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    text = make_umapinfo(nmaps)
+    print(str(nmaps) + " maps, " + str(len(text) // 1024) + " KiB of UMAPINFO")
+    # the parser looks both names up at call time
+    (value_class, intern_value) = (utypes.UMAPINFOValue, utypes.intern_value)
+    utypes.UMAPINFOValue = LegacyUMAPINFOValue
+    utypes.intern_value = legacy_intern_value
+    try:
+        peak_memory("regex pipeline, __dict__ values", lambda: legacy_parse_umapinfo(text))
+        peak_memory("tokenizer, __dict__ values", lambda: parser.parse_umapinfo(text))
+    finally:
+        (utypes.UMAPINFOValue, utypes.intern_value) = (value_class, intern_value)
+    peak_memory("tokenizer, slotted interned values", lambda: parser.parse_umapinfo(text))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare opening an IWAD-sized WAD with omg.WAD against the lazy
+directory reader, including merging it into waddata.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_wadread"""
+import os
+import shutil
+import tempfile
+
+import omg
+from UMAPINFODesigner.structure.waddata import waddata
+from UMAPINFODesigner.uio import wadreader
+from benchmarks.common import make_wad, peak_memory, timeit
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'bench.wad')
+        make_wad(path)
+        print("%d KiB WAD" % (os.path.getsize(path) // 1024))
+        def eager():
+            omg.util.safe_name = wadreader.usafe
+            waddata.clear()
+            waddata.merge('bench.wad', omg.WAD(from_file=path))
+            return waddata.wad['bench.wad']
+        def lazy():
+            wadreader.read_waddata_from_wad(path, clean=True)
+            return waddata.wad['bench.wad']
+        old, oldwad = timeit("omg.WAD", eager)
+        new, newwad = timeit("lazy directory", lazy)
+        print("speedup: %.2fx" % (old / new))
+        waddata.clear()
+        peak_memory("omg.WAD", eager)
+        waddata.clear()
+        peak_memory("lazy directory", lazy)
+        for group in oldwad.groups:
+            assert list(group.keys()) == list(getattr(newwad, group._name).keys())
+    finally:
+        waddata.clear()
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
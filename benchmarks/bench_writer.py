@@ -0,0 +1,79 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Compare the streaming UMAPINFO writer against the old StringIO pipeline.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_writer [number of maps]"""
+import io
+import re
+import sys
+
+import UMAPINFODesigner.structure as structure
+from UMAPINFODesigner.uio import parser
+from benchmarks.common import make_umapinfo, peak_memory, timeit
+
+def legacy_stringify_value(val):
+    stringified = ""
+    if val.utype == structure.utypes.UType.KEYWORD or val.utype == structure.utypes.UType.NUMBER:
+        stringified = str(val.value)
+    elif val.utype == structure.utypes.UType.STRING:
+        s = re.sub(r'([^\\])"', r'\1\"', val.value)
+        stringified = '"' + s + '"'
+    elif val.utype == structure.utypes.UType.MULTISTRING:
+        for s in val.value:
+            s = re.sub(r'([^\\])"', r'\1\"', s)
+            stringified += '\t\t"' + s + '",\n'
+        stringified = stringified[2:-2]
+    elif val.utype == structure.utypes.UType.TUPLE:
+        for t in val.value:
+            stringified += str(t) + ", "
+        stringified = stringified[:-2]
+    return stringified
+
+def legacy_lump(umapinfo):
+    """Generate the whole document, then encode it into a new lump."""
+    processed_umapinfo = io.StringIO()
+    processed_umapinfo.write("/* Created with UMAPINFO Designer by JadingTsunami */\n")
+    for umap in umapinfo:
+        processed_umapinfo.write("MAP " + umap + "\n{\n")
+        for key in umapinfo[umap]:
+            for subkey in umapinfo[umap][key]:
+                processed_umapinfo.write("\t" + key + " = " + legacy_stringify_value(subkey) + "\n")
+        processed_umapinfo.write("} //" + umap + "\n")
+    retstring = processed_umapinfo.getvalue()
+    processed_umapinfo.close()
+    return retstring.encode('utf-8')
+
+def streamed_lump(umapinfo):
+    lump = bytearray()
+    parser.write_umapinfo(umapinfo, lump)
+    return lump
+
+def main():
+    nmaps = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    doc = parser.parse_umapinfo(make_umapinfo(nmaps))
+    print(str(nmaps) + " maps")
+    old, oldlump = timeit("StringIO + encode", lambda: legacy_lump(doc))
+    new, newlump = timeit("streaming writer", lambda: streamed_lump(doc))
+    print("speedup: %.2fx" % (old / new))
+    peak_memory("StringIO + encode", lambda: legacy_lump(doc))
+    peak_memory("streaming writer", lambda: streamed_lump(doc))
+    assert oldlump == newlump
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Shared helpers for the benchmark scripts."""
+import time
+import tracemalloc
+
+def make_umapinfo(nmaps=5000):
+    """Build a synthetic megawad-sized UMAPINFO string."""
+    out = ["// generated for benchmarking\n"]
+    for i in range(nmaps):
+        name = "MAP%02d" % (i + 1)
+        out.append("MAP " + name + "\n{\n")
+        out.append('\tlevelname = "The Forgotten Corridors of Level ' + str(i) + '"\n')
+        out.append('\tlabel = clear\n')
+        out.append('\tnext = "MAP%02d"\n' % (i + 2))
+        out.append('\tmusic = "D_RUNNIN"\n')
+        out.append('\tskytexture = "SKY1"\n')
+        out.append('\tpartime = ' + str(30 + i % 300) + '\n')
+        out.append('\tendgame = false\n')
+        if i % 10 == 0:
+            out.append('\tepisode = "M_EPI1", "Episode ' + str(i) + '", "e"\n')
+            out.append('\tbossaction = DoomImp, 23, 5\n')
+        if i % 4 == 0:
+            out.append('\t/* intermission */\n')
+            out.append('\tintertext = ' + ',\n\t\t'.join(['"Line ' + str(n) + ' of the story so far, told at length."' for n in range(8)]) + '\n')
+        out.append("}\n")
+    return "".join(out)
+
+def timeit(label, func, repeat=3):
+    """Run func repeat times and print the best wall-clock time."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    print("%-40s %8.1f ms" % (label, best * 1000.0))
+    return best, result
+
+def peak_memory(label, func):
+    """Run func once and print the peak traced allocation."""
+    tracemalloc.start()
+    result = func()
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("%-40s %8.1f MiB peak, %8.1f MiB held" % (label, peak / 1048576.0, current / 1048576.0))
+    return peak, result
+
+def make_wad(path, nmaps=32, npatches=1500, nflats=150, nmusic=35, kind=b'IWAD'):
+    """Write a synthetic WAD with the lump layout of an IWAD
+    (about 14 MB with the defaults). Lump contents are filler."""
+    import os
+    import struct
+    lumps = []
+    def lump(name, size, data=None):
+        if data is None:
+            data = os.urandom(size)
+        lumps.append((name, data))
+    lump('PLAYPAL', 10752)
+    lump('COLORMAP', 8704)
+    lump('TITLEPIC', 68168)
+    for m in range(nmaps):
+        lump('MAP%02d' % (m + 1), 0)
+        for (tail, size) in (('THINGS', 3000), ('LINEDEFS', 28000), ('SIDEDEFS', 60000),
+                             ('VERTEXES', 8000), ('SEGS', 36000), ('SSECTORS', 3000),
+                             ('NODES', 40000), ('SECTORS', 6000), ('REJECT', 20000),
+                             ('BLOCKMAP', 30000)):
+            lump(tail, size)
+    for n in range(nmusic):
+        lump('D_MUS%03d' % n, 30000)
+    for n in range(nmusic):
+        lump('DSSND%03d' % n, 8000)
+    # no textures, so that waddata can still index them
+    lump('TEXTURE1', 4, struct.pack('<I', 0))
+    lump('PNAMES', 4, struct.pack('<I', 0))
+    lump('M_DOOM', 5000)
+    lump('P_START', 0)
+    for n in range(npatches):
+        lump('PAT%05d' % n, 4000)
+    lump('P_END', 0)
+    lump('F_START', 0)
+    for n in range(nflats):
+        lump('FLAT%04d' % n, 4096)
+    lump('F_END', 0)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<4sII', kind, len(lumps), 0))
+        directory = []
+        for (name, data) in lumps:
+            directory.append(struct.pack('<II8s', f.tell(), len(data), name.encode('ascii')))
+            f.write(data)
+        dir_ptr = f.tell()
+        f.write(b''.join(directory))
+        f.seek(0)
+        f.write(struct.pack('<4sII', kind, len(lumps), dir_ptr))
+
+def make_texture_lumps(ntextures=4000, npnames=3000, patches_per_texture=2):
+    """TEXTURE1 and PNAMES lumps with ntextures textures, each made
+    of a few patches. Returns (TEXTURE1 data, PNAMES data)."""
+    import struct
+    pnames = struct.pack('<I', npnames) + b''.join(struct.pack('<8s', ('PAT%05d' % n).encode('ascii')) for n in range(npnames))
+    offsets = []
+    body = []
+    position = 4 + 4 * ntextures
+    for t in range(ntextures):
+        offsets.append(position)
+        definition = struct.pack('<8sIhhIh', ('TEX%05d' % t).encode('ascii'), 0, 64, 128, 0, patches_per_texture)
+        for p in range(patches_per_texture):
+            definition += struct.pack('<hhhhh', 32 * p, 0, (t + p) % npnames, 1, 0)
+        body.append(definition)
+        position += len(definition)
+    texture1 = struct.pack('<I', ntextures) + struct.pack('<' + str(ntextures) + 'I', *offsets) + b''.join(body)
+    return (texture1, pnames)
+
+def make_textmap(nvertexes=3000, nlinedefs=20000, seed=0):
+    """A UDMF TEXTMAP lump with the given numbers of vertexes and
+    linedefs, plus a sidedef, sector and thing."""
+    import random
+    r = random.Random(seed)
+    out = ['namespace = "doom";\n// generated for benchmarking\n']
+    for n in range(nvertexes):
+        out.append('vertex // %d\n{\nx = %d.000;\ny = %d.000;\n}\n\n' % (n, r.randint(-8000, 8000), r.randint(-8000, 8000)))
+    for n in range(nlinedefs):
+        fields = ['v1 = %d;' % r.randrange(nvertexes), 'v2 = %d;' % r.randrange(nvertexes), 'sidefront = 0;']
+        if n % 2:
+            fields.extend(['sideback = 1;', 'twosided = true;'])
+        if n % 10 == 0:
+            fields.append('special = 11;')
+        if n % 50 == 0:
+            fields.append('comment = "exit {here}";')
+        fields.append('blocking = true;')
+        out.append('linedef // %d\n{\n%s\n}\n\n' % (n, '\n'.join(fields)))
+    out.append('sidedef\n{\nsector = 0;\ntexturemiddle = "STARTAN2";\n}\n\n')
+    out.append('sector\n{\nheightfloor = 0;\nheightceiling = 128;\ntexturefloor = "FLOOR0_1";\ntextureceiling = "CEIL1_1";\n}\n\n')
+    out.append('thing\n{\nx = 0.0;\ny = 0.0;\ntype = 1;\n}\n')
+    return "".join(out).encode('ascii')
+
+def make_graphic_lumps(npatches=1200, nflats=150, nbig=20, seed=0):
+    """Patch-format graphics and raw flats, like those of an IWAD:
+    npatches small patches with transparent gaps (wall patches,
+    sprites, menu text), nbig full-screen 320x200 pictures and
+    nflats 64x64 flats. Returns (list of (name, patch data), list
+    of (name, flat data))."""
+    import random
+    from omg import lump
+    r = random.Random(seed)
+    def picture(width, height, holes):
+        # runs of transparent and drawn pixels down each column
+        pixels = [None] * (width * height)
+        for x in range(width):
+            y = 0
+            while y < height:
+                run = r.randint(1, 40)
+                if not holes or r.random() < 0.7:
+                    for row in range(y, min(y + run, height)):
+                        pixels[row * width + x] = r.randrange(256)
+                y += run
+        g = lump.Graphic()
+        g.from_pixels(pixels, width, height, width // 2, height - 4)
+        return g.data
+    patches = []
+    for n in range(npatches):
+        (width, height) = r.choice(((64, 128), (32, 72), (41, 57), (8, 15), (128, 128)))
+        patches.append(('PAT%05d' % n, picture(width, height, n % 3 != 0)))
+    for n in range(nbig):
+        patches.append(('BIG%05d' % n, picture(320, 200, False)))
+    flats = [('FLAT%04d' % n, bytes(r.randrange(256) for _ in range(4096))) for n in range(nflats)]
+    return (patches, flats)
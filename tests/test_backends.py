@@ -0,0 +1,178 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests that the dict and columnar UMAPINFO backends agree."""
+import pytest
+
+from UMAPINFODesigner.structure import umapinfo
+from UMAPINFODesigner.structure.columnar import ColumnarUMAPINFO
+from UMAPINFODesigner.structure.utypes import UType
+from UMAPINFODesigner.uio import parser
+
+BACKENDS = (umapinfo.DICT_BACKEND, umapinfo.COLUMNAR_BACKEND)
+
+UMAPINFO = '''map MAP01 {
+    levelname = "Entryway"
+    next = MAP02
+    music = "D_RUNNIN"
+    episode = "M_EPI1", "Knee-Deep", "k"
+    bossaction = DoomImp, 23, 5
+    intertext = "one",
+        "two"
+}
+map MAP02 { levelname = "Underhalls" music = "D_STALKS" partime = 90 }
+map MAP03 { levelname = "The Gantlet" label = clear }
+map MAP11 { episode = "M_EPI2", "The Shores", "s" endgame = false }
+'''
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    yield
+    umapinfo.set_backend(umapinfo.DICT_BACKEND)
+    umapinfo.clear_umapinfo()
+
+def observe():
+    """Everything the UI can see of the document."""
+    seen = [list(umapinfo.umapinfo.u.keys()), umapinfo.generate_umapinfo()]
+    sink = bytearray()
+    umapinfo.write_umapinfo(sink)
+    seen.append(bytes(sink))
+    for umap in list(umapinfo.umapinfo.u.keys()) + ["NOSUCHMAP"]:
+        for key in ("levelname", "next", "music", "episode", "bossaction", "intertext", "partime", "nosuchkey"):
+            v = umapinfo.get_key(umap, key)
+            vs = umapinfo.get_key(umap, key, full_list=True)
+            seen.append((umap, key, umapinfo.has_key(umap, key),
+                         v and (v.utype, v.value),
+                         vs and [(uv.utype, uv.value) for uv in vs]))
+    return seen
+
+def edit():
+    """An editing session through every operation; returns what is seen after each step."""
+    umapinfo.load_umapinfo(parser.parse_umapinfo(UMAPINFO))
+    steps = [observe()]
+    for operation in (
+            lambda: umapinfo.add_key("MAP01", "levelname", UType.STRING, "Renamed"),
+            lambda: umapinfo.add_key("MAP01", "bossaction", UType.TUPLE, ("Cyberdemon", "11", "0"), append=True),
+            lambda: umapinfo.del_key("MAP02", "music"),
+            lambda: umapinfo.add_key("MAP02", "music", UType.STRING, "D_THE_DA"),
+            lambda: umapinfo.del_key("MAP02", "nosuchkey"),
+            lambda: umapinfo.del_key("MAP11", "episode"),
+            lambda: umapinfo.add_map("new01"),
+            lambda: umapinfo.add_key("NEW01", "partime", UType.NUMBER, 120),
+            lambda: umapinfo.rename_map("MAP02", "MAP99"),
+            lambda: umapinfo.add_key("MAP99", "next", UType.STRING, "NEW01"),
+            lambda: umapinfo.sub_map("MAP03"),
+            lambda: umapinfo.add_map("MAP03"),
+            lambda: umapinfo.add_key("MAP03", "intertext", UType.MULTISTRING, ("back", "again")),
+            umapinfo.resolve_episodes):
+        operation()
+        steps.append(observe())
+    steps.append(umapinfo.get_episode_tree())
+    return steps
+
+def test_backends_agree():
+    results = []
+    for backend in BACKENDS:
+        umapinfo.set_backend(backend)
+        results.append(edit())
+    assert results[0] == results[1]
+
+def test_switching_backends_keeps_the_document():
+    umapinfo.load_umapinfo(parser.parse_umapinfo(UMAPINFO))
+    before = observe()
+    umapinfo.set_backend(umapinfo.COLUMNAR_BACKEND)
+    assert isinstance(umapinfo.umapinfo.u, ColumnarUMAPINFO)
+    assert observe() == before
+    umapinfo.set_backend(umapinfo.DICT_BACKEND)
+    assert observe() == before
+
+def churn():
+    """Replaces and removes values until most rows are dead."""
+    umapinfo.load_umapinfo(parser.parse_umapinfo(UMAPINFO))
+    for n in range(40):
+        umapinfo.add_key("MAP01", "levelname", UType.STRING, "Level " + str(n))
+        umapinfo.add_key("MAP02", "bossaction", UType.TUPLE, ("DoomImp", str(n), "5"), append=True)
+        if n % 4 == 0:
+            umapinfo.del_key("MAP02", "bossaction")
+        umapinfo.add_map("TEMP%02d" % n)
+        umapinfo.add_key("TEMP%02d" % n, "partime", UType.NUMBER, n)
+        if n % 3:
+            umapinfo.sub_map("TEMP%02d" % n)
+    return observe()
+
+def test_backends_agree_through_compaction(monkeypatch):
+    umapinfo.set_backend(umapinfo.DICT_BACKEND)
+    expected = churn()
+    monkeypatch.setattr(ColumnarUMAPINFO, '_COMPACT_MIN_ROWS', 8)
+    compactions = []
+    compact = ColumnarUMAPINFO._maybe_compact
+    def counting(self):
+        rows = len(self.row_value)
+        compact(self)
+        if len(self.row_value) < rows:
+            compactions.append(rows)
+    monkeypatch.setattr(ColumnarUMAPINFO, '_maybe_compact', counting)
+    umapinfo.set_backend(umapinfo.COLUMNAR_BACKEND)
+    assert churn() == expected
+    assert compactions
+    u = umapinfo.umapinfo.u
+    assert u.dead_rows * 2 <= max(len(u.row_value), ColumnarUMAPINFO._COMPACT_MIN_ROWS)
+
+def plain(values):
+    return values if values is None else [(v.utype, v.value) for v in values]
+
+def stored(u):
+    """The document as plain lists, map by map and key by key."""
+    return [(umap, [(key, plain(u[umap][key])) for key in u[umap]]) for umap in u]
+
+def test_renaming_onto_another_map_is_refused():
+    for backend in BACKENDS:
+        umapinfo.set_backend(backend)
+        umapinfo.load_umapinfo(parser.parse_umapinfo(UMAPINFO))
+        before = observe()
+        umapinfo.rename_map("MAP01", "MAP02")
+        assert observe() == before
+    u = umapinfo.umapinfo.u
+    with pytest.raises(ValueError):
+        u.rename_map("MAP01", "MAP02")
+    # nothing is left behind of either map
+    assert stored(u) == stored(parser.parse_umapinfo(UMAPINFO))
+    assert u.dead_rows == 0
+
+def test_map_views_read_the_same():
+    views = []
+    for backend in BACKENDS:
+        umapinfo.set_backend(backend)
+        umapinfo.load_umapinfo(parser.parse_umapinfo(UMAPINFO))
+        umapinfo.del_key("MAP01", "music")
+        u = umapinfo.umapinfo.u
+        views.append((stored(u), [("nosuchkey" in u[umap], u[umap].get("nosuchkey")) for umap in u]))
+    assert views[0] == views[1]
+    # a deleted key reads as no values, in both
+    assert umapinfo.umapinfo.u["MAP01"]["music"] == []
+
+def test_missing_keys_are_not_stored():
+    """A defaultdict map stores the list a missing key makes; the
+    columnar view has nowhere to keep it, so refuses the key."""
+    for backend in BACKENDS:
+        umapinfo.set_backend(backend)
+        umapinfo.load_umapinfo(parser.parse_umapinfo(UMAPINFO))
+        values = umapinfo.umapinfo.u["MAP01"]
+        if backend == umapinfo.COLUMNAR_BACKEND:
+            with pytest.raises(KeyError):
+                values["nosuchkey"]
+        assert "nosuchkey" not in values
+        assert umapinfo.get_key("MAP01", "nosuchkey") is None
@@ -0,0 +1,94 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests for the on-disk cache."""
+import os
+import threading
+
+from UMAPINFODesigner.uio import diskcache
+
+DATA = ("map", 1, 2.5, b"\0\1", [None, True], {"key": ("a", "b")})
+
+def test_round_trip(tmp_path):
+    cache = diskcache.DiskCache(str(tmp_path))
+    assert cache.get("k") is None
+    assert cache.put("k", DATA)
+    assert cache.get("k") == DATA
+    # a fresh cache over the same directory reads it back
+    assert diskcache.DiskCache(str(tmp_path)).get("k") == DATA
+
+def test_corrupt_or_foreign_entries_are_dropped(tmp_path):
+    cache = diskcache.DiskCache(str(tmp_path))
+    path = str(tmp_path / ("k" + diskcache._SUFFIX))
+    cache.put("k", DATA)
+    with open(path, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b'\xff')
+    assert cache.get("k") is None
+    assert not os.path.exists(path)
+    # written by another version of the format
+    cache.put("k", DATA)
+    with open(path, 'r+b') as f:
+        f.write(b'UDC0')
+    assert cache.get("k") is None
+    # truncated
+    cache.put("k", DATA)
+    with open(path, 'r+b') as f:
+        f.truncate(10)
+    assert cache.get("k") is None
+
+def test_versions_are_part_of_keys():
+    assert diskcache.digest("2", "parsed", "text") != diskcache.digest("3", "parsed", "text")
+    # parts can't run into each other
+    assert diskcache.digest("ab", "c") != diskcache.digest("a", "bc")
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = diskcache.DiskCache(str(tmp_path), max_bytes=10000)
+    blob = os.urandom(3000)
+    for (i, key) in enumerate("abc"):
+        cache.put(key, blob)
+        os.utime(cache._path(key), (i, i))
+    # a is used again, so b is the oldest
+    assert cache.get("a") == blob
+    cache.put("d", blob)
+    assert cache.get("b") is None
+    assert all(cache.get(key) == blob for key in "acd")
+    assert sum(size for (mtime, size, path) in cache.entries()) <= 10000
+
+def test_only_writes_past_the_cap_scan_the_directory(tmp_path, monkeypatch):
+    cache = diskcache.DiskCache(str(tmp_path), max_bytes=100000)
+    scans = []
+    entries = cache.entries
+    monkeypatch.setattr(cache, 'entries', lambda: scans.append(1) or entries())
+    for i in range(10):
+        cache.put(str(i), i)
+    assert len(scans) == 1
+    cache.put("big", os.urandom(200000))
+    assert len(scans) == 2
+
+def test_writers_in_threads_dont_clobber_each_other(tmp_path):
+    cache = diskcache.DiskCache(str(tmp_path))
+    def write(n):
+        for i in range(50):
+            cache.put("shared", (n, i, bytes(1000 * n)))
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(1, 5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    (n, i, data) = cache.get("shared")
+    assert i == 49 and data == bytes(1000 * n)
+    assert os.listdir(str(tmp_path)) == ["shared" + diskcache._SUFFIX]
@@ -0,0 +1,83 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests for the content fingerprints WADs are recognized by."""
+import os
+import shutil
+import struct
+
+from UMAPINFODesigner.uio import lazywad
+
+def write_wad(path, lumps):
+    """Writes a PWAD of (name, data) lumps."""
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<4sII', b'PWAD', len(lumps), 0))
+        directory = []
+        for (name, data) in lumps:
+            directory.append(struct.pack('<II8s', f.tell(), len(data), name.encode('ascii')))
+            f.write(data)
+        dir_ptr = f.tell()
+        f.write(b''.join(directory))
+        f.seek(0)
+        f.write(struct.pack('<4sII', b'PWAD', len(lumps), dir_ptr))
+
+def lumps(umapinfo=b'map MAP01 { }', linedefs=bytes(70000), vertexes=bytes(4000)):
+    return [('UMAPINFO', umapinfo), ('MAP01', b''), ('THINGS', bytes(100)),
+            ('LINEDEFS', linedefs), ('VERTEXES', vertexes)]
+
+def fingerprint_of(tmp_path, name, content):
+    path = str(tmp_path / name)
+    write_wad(path, content)
+    lazywad.fingerprintcache.known.clear()
+    return lazywad.file_fingerprint(path)
+
+def test_same_content_anywhere_has_the_same_fingerprint(tmp_path):
+    first = fingerprint_of(tmp_path, 'a.wad', lumps())
+    write_wad(str(tmp_path / 'b.wad'), lumps())
+    shutil.copy(str(tmp_path / 'a.wad'), str(tmp_path / 'c.wad'))
+    assert lazywad.file_fingerprint(str(tmp_path / 'b.wad')) == first
+    assert lazywad.file_fingerprint(str(tmp_path / 'c.wad')) == first
+    assert lazywad.LazyWAD(str(tmp_path / 'b.wad')).fingerprint == first
+
+def test_changes_to_what_is_cached_change_the_fingerprint(tmp_path):
+    first = fingerprint_of(tmp_path, 'a.wad', lumps())
+    assert fingerprint_of(tmp_path, 'b.wad', lumps(umapinfo=b'map MAP02 { }')) != first
+    changed = bytearray(70000)
+    changed[-1] = 1
+    assert fingerprint_of(tmp_path, 'c.wad', lumps(linedefs=bytes(changed))) != first
+
+def test_any_change_to_map_geometry_changes_the_fingerprint(tmp_path):
+    first = fingerprint_of(tmp_path, 'a.wad', lumps(vertexes=bytes(40000)))
+    changed = bytearray(40000)
+    changed[5000] = 1
+    assert fingerprint_of(tmp_path, 'b.wad', lumps(vertexes=bytes(changed))) != first
+
+def test_a_file_is_only_hashed_once(tmp_path, monkeypatch):
+    path = str(tmp_path / 'a.wad')
+    write_wad(path, lumps())
+    lazywad.fingerprintcache.known.clear()
+    wad = lazywad.LazyWAD(path)
+    hashed = []
+    monkeypatch.setattr(lazywad, 'fingerprint', lambda *args: hashed.append(args))
+    assert lazywad.file_fingerprint(path) == wad.fingerprint
+    assert not hashed
+    # a changed file is hashed again
+    with open(path, 'r+b') as f:
+        f.seek(12)
+        f.write(b'map MAP03')
+    os.utime(path, ns=(0, 0))
+    lazywad.file_fingerprint(path)
+    assert len(hashed) == 1
@@ -0,0 +1,108 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests for the UMAPINFO tokenizer and statement scanner."""
+import pytest
+
+from UMAPINFODesigner.structure.utypes import UType
+from UMAPINFODesigner.uio import lexer
+from UMAPINFODesigner.uio import parser
+
+def kinds_and_texts(text):
+    return [(tok.kind, tok.text) for tok in lexer.tokenize(text)]
+
+def test_tokenize_words_punctuation_and_positions():
+    tokens = list(lexer.tokenize('MAP MAP01\n{\n  next = MAP02\n}'))
+    assert [(t.kind, t.text, t.line, t.col) for t in tokens] == [
+        (lexer.WORD, 'MAP', 1, 1), (lexer.WORD, 'MAP01', 1, 5),
+        (lexer.PUNCT, '{', 2, 1),
+        (lexer.WORD, 'next', 3, 3), (lexer.PUNCT, '=', 3, 8), (lexer.WORD, 'MAP02', 3, 10),
+        (lexer.PUNCT, '}', 4, 1)]
+
+def test_tokenize_strings_with_escapes():
+    tokens = kinds_and_texts(r'levelname = "A \"quoted\" \\ name"')
+    assert tokens[2] == (lexer.STRING, r'"A \"quoted\" \\ name"')
+    assert lexer.unescape(tokens[2][1]) == 'A "quoted" \\ name'
+    assert lexer.unescape('"plain"') == 'plain'
+
+def test_tokenize_skips_comments_and_counts_their_lines():
+    text = 'a = 1 // line comment\n/* block\ncomment */ b = "x // not a comment"\nc/d = 2'
+    tokens = list(lexer.tokenize(text))
+    assert [t.text for t in tokens] == ['a', '=', '1', 'b', '=', '"x // not a comment"', 'c/d', '=', '2']
+    assert (tokens[3].line, tokens[3].col) == (3, 12)
+    assert (tokens[6].line, tokens[6].col) == (4, 1)
+
+@pytest.mark.parametrize("text, message, line, col", [
+    ('a = "never closed', "Unterminated string.", 1, 5),
+    ('a = 1\n  /* never closed', "Unterminated comment.", 2, 3),
+])
+def test_tokenize_errors(text, message, line, col):
+    with pytest.raises(lexer.UMAPINFOSyntaxError) as e:
+        list(lexer.tokenize(text))
+    assert (e.value.message, e.value.line, e.value.col) == (message, line, col)
+    assert str(e.value) == "line " + str(line) + ", column " + str(col) + ": " + message
+
+def test_scan_statements():
+    text = 'map "E1M1" // first\n{\n  levelname = "Hangar"\n  bossaction = DoomImp, 23, 5\n}\n'
+    statements = list(lexer.scan(text))
+    assert [s[:3] for s in statements] == [
+        (lexer.MAP, '"E1M1"', None),
+        (lexer.PAIR, 'levelname', '"Hangar"'),
+        (lexer.LIST, 'bossaction', 'DoomImp, 23, 5'),
+        (lexer.CLOSE, None, None)]
+    assert lexer.position(text, statements[1][3]) == (3, 3)
+    assert lexer.position(text, statements[3][3]) == (5, 1)
+
+def test_split_atoms_multiline():
+    assert lexer.split_atoms('"one", "two"') == (['"one"', '"two"'], False)
+    assert lexer.split_atoms('"one",\n  "two"') == (['"one"', '"two"'], True)
+    assert lexer.split_atoms('"one", // note\n  "two"') == (['"one"', '"two"'], True)
+
+def test_parse_value_types():
+    parsed = parser.parse_umapinfo('map E1M1 {\n'
+                                   ' intertext = "one \\"1\\"",\n'
+                                   '   /* between */ "two \\\\ 2"\n'
+                                   ' bossaction = DoomImp, 23, 5\n'
+                                   ' label = clear\n'
+                                   ' partime = 30\n'
+                                   ' levelname = "Hangar"\n'
+                                   '}\n')
+    values = {key: (v[0].value, v[0].utype) for (key, v) in parsed['E1M1'].items()}
+    assert values == {
+        'intertext': (('one "1"', 'two \\ 2'), UType.MULTISTRING),
+        'bossaction': (('DoomImp', '23', '5'), UType.TUPLE),
+        'label': ('clear', UType.KEYWORD),
+        'partime': (30, UType.NUMBER),
+        'levelname': ('Hangar', UType.STRING)}
+
+def test_parse_keys_are_case_insensitive_and_repeatable():
+    parsed = parser.parse_umapinfo('MAP MAP01 { LevelName = "a"\n levelname = "b" }')
+    assert [v.value for v in parsed['MAP01']['levelname']] == ['a', 'b']
+
+@pytest.mark.parametrize("text, message, line, col", [
+    ('map MAP01 {\n  next = \n}', "Missing value for key 'next'.", 2, 3),
+    ('map MAP01 \n x', "Expected '{' after map name.", 1, 1),
+    ('map MAP01 {\n}\n}', "Unexpected '}'.", 3, 1),
+    ('x = 1', "Key 'x' outside of a map block.", 1, 1),
+    ('map a {\n x = 1\n', "Unterminated map block.", 1, 5),
+    ('map a {\n x = 1\nmap b {\n}', "Unterminated map block.", 1, 5),
+    ('map a {\n x = 1\n /* open', "Unterminated comment.", 3, 2),
+])
+def test_parse_errors(text, message, line, col):
+    with pytest.raises(lexer.UMAPINFOSyntaxError) as e:
+        parser.parse_umapinfo(text)
+    assert (e.value.message, e.value.line, e.value.col) == (message, line, col)
+    assert isinstance(e.value, ValueError)
@@ -0,0 +1,41 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests that the numpy automap renderer draws the pixels ImageDraw did."""
+import struct
+
+import omg
+import pytest
+
+from UMAPINFODesigner.uio import maprender
+from benchmarks.bench_automap import draw_lines, make_map
+
+@pytest.mark.parametrize("nlines", [1, 2, 50, 3000])
+@pytest.mark.parametrize("width", [63, 189, 192, 600])
+def test_same_pixels_as_imagedraw(nlines, width):
+    mapw = make_map(nlines, seed=nlines)
+    assert maprender.render_map(mapw, width).tobytes() == draw_lines(mapw, width).tobytes()
+
+def test_lines_in_every_direction_and_colour():
+    """Steep, shallow, diagonal and reversed lines, and each colour
+    drawn over the others where they cross."""
+    vertexes = [(0, 0), (1000, 0), (1000, 1000), (0, 1000), (500, -300), (-300, 700), (1000, 999)]
+    linedefs = [(0, 1, 1, 0), (1, 2, 4, 0), (2, 0, 1, 1), (3, 1, 5, 0), (4, 5, 4, 1), (5, 4, 1, 0),
+                (6, 3, 1, 0), (0, 3, 4, 0), (2, 3, 1, 0)]
+    mapw = {'VERTEXES': omg.Lump(b''.join(struct.pack('<hh', *v) for v in vertexes)),
+            'LINEDEFS': omg.Lump(b''.join(struct.pack('<HHHH6x', *l) for l in linedefs))}
+    for width in (7, 100, 333):
+        assert maprender.render_map(mapw, width).tobytes() == draw_lines(mapw, width).tobytes()
@@ -0,0 +1,150 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests for parsing UMAPINFO a chunk at a time."""
+import io
+from collections import OrderedDict
+
+import pytest
+
+from UMAPINFODesigner.uio import lexer
+from UMAPINFODesigner.uio import parser
+
+UMAPINFO = '''// a comment at the top
+map MAP01
+{
+    levelname = "Entryway \\"with\\" quotes é中"
+    next = MAP02 /* block
+    comment */ music = "D_RUNNIN"
+    intertext = "first line",
+        "second line"
+    bossaction = DoomImp, 23, 5
+}
+MAP "MAP02" {
+    label = clear
+    partime = 120
+}
+map MAP03 { skytexture = "SKY3" }
+'''
+
+def plain(parsed):
+    """Parsed UMAPINFO as plain lists, for comparing."""
+    return [(mapname, [(key, [(v.value, v.utype) for v in values]) for (key, values) in keyvals.items()])
+            for (mapname, keyvals) in parsed.items()]
+
+class CountingReader(io.BytesIO):
+    """A binary file that counts the bytes read from it."""
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 13, 64, 65536])
+def test_chunks_give_the_same_result(chunk_size):
+    expected = plain(parser.parse_umapinfo(UMAPINFO))
+    data = UMAPINFO.encode('utf-8')
+    assert plain(OrderedDict(parser.parse_umapinfo_iter(data, chunk_size=chunk_size))) == expected
+    assert plain(OrderedDict(parser.parse_umapinfo_iter(memoryview(data), chunk_size=chunk_size))) == expected
+    assert plain(OrderedDict(parser.parse_umapinfo_iter(io.BytesIO(data), chunk_size=chunk_size))) == expected
+    assert plain(OrderedDict(parser.parse_umapinfo_iter(io.StringIO(UMAPINFO), chunk_size=chunk_size))) == expected
+
+def test_parse_umapinfo_accepts_bytes_and_files():
+    expected = plain(parser.parse_umapinfo(UMAPINFO))
+    assert plain(parser.parse_umapinfo(UMAPINFO.encode('utf-8'))) == expected
+    assert plain(parser.parse_umapinfo(io.BytesIO(UMAPINFO.encode('utf-8')))) == expected
+
+def test_every_split_point():
+    """Every token, string, comment and multibyte character cut in two."""
+    expected = plain(parser.parse_umapinfo(UMAPINFO))
+    data = UMAPINFO.encode('utf-8')
+    for cut in range(1, len(data)):
+        class TwoChunks():
+            def __init__(self):
+                self.parts = [data[:cut], data[cut:]]
+            def read(self, size):
+                return self.parts.pop(0) if self.parts else b''
+        assert plain(OrderedDict(parser.parse_umapinfo_iter(TwoChunks()))) == expected, cut
+
+def test_stopping_early_reads_no_further():
+    data = UMAPINFO.encode('utf-8') + b''.join(b'map MAP%02d { next = MAP%02d }\n' % (n, n + 1) for n in range(4, 2000))
+    reader = CountingReader(data)
+    maps = parser.parse_umapinfo_iter(reader, chunk_size=64)
+    assert next(maps)[0] == 'MAP01'
+    assert next(maps)[0] == 'MAP02'
+    maps.close()
+    assert reader.bytes_read < 1024
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 16, 40, 65536])
+def test_error_positions_after_a_chunk_boundary(chunk_size):
+    text = 'map MAP01 { next = MAP02 }\nmap MAP02 {\n  levelname = "ok"\n  partime = \n}\n'
+    with pytest.raises(lexer.UMAPINFOSyntaxError) as whole:
+        parser.parse_umapinfo(text)
+    with pytest.raises(lexer.UMAPINFOSyntaxError) as chunked:
+        list(parser.parse_umapinfo_iter(text.encode('ascii'), chunk_size=chunk_size))
+    assert (chunked.value.message, chunked.value.line, chunked.value.col) == (whole.value.message, 4, 3)
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 65536])
+def test_error_on_the_line_of_an_earlier_block(chunk_size):
+    text = 'map MAP01 { next = MAP02 } map MAP02 { } }'
+    with pytest.raises(lexer.UMAPINFOSyntaxError) as chunked:
+        list(parser.parse_umapinfo_iter(text.encode('ascii'), chunk_size=chunk_size))
+    assert (chunked.value.message, chunked.value.line, chunked.value.col) == ("Unexpected '}'.", 1, 42)
+
+def test_blocks_before_an_error_are_generated():
+    maps = parser.parse_umapinfo_iter(b'map MAP01 { next = MAP02 }\nmap MAP02 {', chunk_size=4)
+    assert next(maps)[0] == 'MAP01'
+    with pytest.raises(lexer.UMAPINFOSyntaxError):
+        next(maps)
+
+def test_an_error_is_raised_without_reading_the_rest():
+    data = b'map MAP01 {\n    partime = \n}\n' + b''.join(b'map MAP%02d { next = MAP%02d }\n' % (n, n + 1) for n in range(2, 2000))
+    reader = CountingReader(data)
+    with pytest.raises(lexer.UMAPINFOSyntaxError) as e:
+        list(parser.parse_umapinfo_iter(reader, chunk_size=64))
+    assert (e.value.line, e.value.col) == (2, 5)
+    assert reader.bytes_read <= 128
+
+@pytest.mark.parametrize("text", [
+    'map MAP01 {\n  partime = \n}\n',
+    'map MAP01 {\n  next = MAP02 }\n}\n',
+    'map MAP01 {\n  next = MAP02\n  map MAP02 { }\n',
+    'map MAP01 {\n  intertext = "a",\n  "b", = c\n}\n',
+    'map MAP01 {\n  levelname = "open\n}\n',
+    'map MAP01 {\n  /* open\n}\n',
+    'map MAP01 x\n{ }\n',
+    'key = 1\n',
+])
+def test_errors_are_the_same_at_every_split_point(text):
+    with pytest.raises(lexer.UMAPINFOSyntaxError) as whole:
+        parser.parse_umapinfo(text)
+    data = text.encode('ascii')
+    for cut in range(1, len(data)):
+        with pytest.raises(lexer.UMAPINFOSyntaxError) as chunked:
+            list(parser.parse_umapinfo_iter(io.BytesIO(data), chunk_size=cut))
+        assert (chunked.value.message, chunked.value.line, chunked.value.col) == \
+            (whole.value.message, whole.value.line, whole.value.col), cut
+
+def test_an_open_comment_is_not_parsed_again_for_every_chunk(monkeypatch):
+    calls = []
+    parse_blocks = parser._parse_blocks
+    monkeypatch.setattr(parser, '_parse_blocks', lambda *args: calls.append(1) or parse_blocks(*args))
+    data = b'map MAP01 {\n  /* ' + b'a long comment ' * 200 + b'*/ next = MAP02\n}\n'
+    assert [m for (m, keyvals) in parser.parse_umapinfo_iter(data, chunk_size=1)] == ['MAP01']
+    assert len(calls) < 100
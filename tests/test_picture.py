@@ -0,0 +1,67 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests that the numpy picture decoder gives the images omg does."""
+import struct
+
+import numpy
+import omg
+import pytest
+from omg import lump
+
+from UMAPINFODesigner.uio import picture
+from benchmarks.common import make_graphic_lumps
+
+def omg_image(data):
+    return lump.Graphic(data).to_Image(mode='RGBA')
+
+def numpy_image(data):
+    return picture.to_image(*picture.decode_patch(data), lut=picture.palette_lut(omg.palette.default.bytes))
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_patches_and_flats_decode_as_omg_does(seed):
+    (patches, flats) = make_graphic_lumps(npatches=60, nflats=10, nbig=2, seed=seed)
+    for (name, data) in patches:
+        assert numpy_image(data).tobytes() == omg_image(data).tobytes(), name
+        assert numpy_image(memoryview(data)).tobytes() == omg_image(data).tobytes(), name
+    for (name, data) in flats:
+        assert (picture.decode_flat(data)[0] == numpy.asarray(lump.Flat(data).to_Image(mode='P'))).all(), name
+
+def tall_patch():
+    """One column 400 high, its second post placed relative to the first."""
+    posts = [(200, bytes(range(50))), (100, bytes(range(100, 160)))]
+    column = b''.join(struct.pack('<BB', top, len(pixels)) + b'\0' + pixels + b'\0' for (top, pixels) in posts) + b'\xff'
+    return struct.pack('<hhhhI', 1, 400, 0, 0, 12) + column
+
+def test_tall_patches_decode_as_omg_does():
+    data = tall_patch()
+    assert numpy_image(data).tobytes() == omg_image(data).tobytes()
+    (indexes, opaque) = picture.decode_patch(data)
+    assert opaque[:, 0].nonzero()[0].tolist() == list(range(200, 250)) + list(range(300, 360))
+
+@pytest.mark.parametrize("step", [2, 3, 7])
+def test_decoding_every_few_pixels_picks_them_out(step):
+    (patches, _) = make_graphic_lumps(npatches=15, nflats=0, nbig=1, seed=2)
+    for (name, data) in patches:
+        (indexes, opaque) = picture.decode_patch(data)
+        (small, small_opaque) = picture.decode_patch(data, step=step)
+        assert (small == indexes[::step, ::step]).all() and (small_opaque == opaque[::step, ::step]).all(), name
+
+@pytest.mark.parametrize("data", [b'', b'\x01\0\x01\0', struct.pack('<hhhhI', 1, 1, 0, 0, 400), struct.pack('<hhhh', 0, 5, 0, 0)])
+def test_what_isnt_a_picture_is_refused(data):
+    with pytest.raises(ValueError):
+        picture.decode_patch(data)
+    assert picture.lump_image(data) is None
@@ -0,0 +1,93 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests for decoding TEXTURE1/TEXTURE2 and PNAMES with struct."""
+import struct
+
+import pytest
+
+from UMAPINFODesigner.structure import textures
+
+PNAMES = ['WALL00_1', 'wall00_2', 'SW1', 'DOOR2_4', 'W13_1']
+
+# name, width, height, patch numbers
+DEFINITIONS = [
+    ('STARTAN3', 128, 128, (0, 1)),
+    ('sw1brcom', 64, 128, (2,)),
+    ('BIGDOOR1', 128, 96, (3, 3, 4, 0)),
+    ('NOPATCH', 16, 16, ()),
+    ('STARTAN3', 64, 64, (4,)),
+    ('BADPATCH', 32, -1, (5, -1, 1)),
+]
+
+def pnames_lump(names):
+    return struct.pack('<I', len(names)) + b''.join(struct.pack('<8s', n.encode('ascii')) for n in names)
+
+def texture_lump(definitions):
+    body = []
+    offsets = []
+    position = 4 + 4 * len(definitions)
+    for (name, width, height, patches) in definitions:
+        offsets.append(position)
+        definition = struct.pack('<8sIhhIh', name.encode('ascii'), 0, width, height, 0, len(patches))
+        for (n, p) in enumerate(patches):
+            definition += struct.pack('<hhhhh', 8 * n, 0, p, 1, 0)
+        body.append(definition)
+        position += len(definition)
+    return struct.pack('<I', len(definitions)) + struct.pack('<' + str(len(definitions)) + 'I', *offsets) + b''.join(body)
+
+def get_chunk(d, offset, string=False):
+    if string:
+        return str(d[offset:offset+8], 'ascii').strip('\0')
+    return int.from_bytes(d[offset:offset+4], 'little', signed=False)
+
+def get_short(d, offset):
+    return int.from_bytes(d[offset:offset+2], 'little', signed=True)
+
+def slice_definitions(tex, pnames):
+    """Texture definitions decoded a slice at a time, as waddata
+    used to read texture names."""
+    names = [get_chunk(pnames, 4 + 8*i, True).upper() for i in range(get_chunk(pnames, 0))]
+    definitions = {}
+    for i in range(get_chunk(tex, 0)):
+        offs = get_chunk(tex, 4*i+4)
+        name = get_chunk(tex, offs, True).upper()
+        patches = []
+        for p in range(get_short(tex, offs + 20)):
+            n = get_short(tex, offs + 22 + 10*p + 4)
+            patches.append(names[n] if 0 <= n < len(names) else None)
+        if name not in definitions:
+            definitions[name] = (name, get_short(tex, offs + 12), get_short(tex, offs + 14), tuple(patches))
+    return definitions
+
+@pytest.mark.parametrize("wrap", [bytes, memoryview])
+def test_struct_decoding_matches_slicing(wrap):
+    (tex, pnames) = (texture_lump(DEFINITIONS), pnames_lump(PNAMES))
+    decoded = textures.resolve(textures.read_texture_lump(wrap(tex)), textures.read_pnames(wrap(pnames)))
+    assert {name: tuple(t) for (name, t) in decoded.items()} == slice_definitions(tex, pnames)
+    assert list(decoded) == ['STARTAN3', 'SW1BRCOM', 'BIGDOOR1', 'NOPATCH', 'BADPATCH']
+    assert decoded['BADPATCH'].patches == (None, None, 'WALL00_2')
+
+def test_names_end_at_the_first_nul():
+    assert textures.read_pnames(pnames_lump(['AB\0junk'])) == ['AB']
+
+def test_truncated_lumps_keep_what_is_whole():
+    tex = texture_lump(DEFINITIONS)
+    whole = textures.read_texture_lump(tex)
+    assert textures.read_texture_lump(tex[:-1]) == whole[:-1]
+    assert textures.read_texture_lump(tex[:10]) == []
+    assert textures.read_texture_lump(b'') == []
+    assert textures.read_pnames(pnames_lump(PNAMES)[:-3]) == [n.upper() for n in PNAMES[:-1]]
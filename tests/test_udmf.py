@@ -0,0 +1,63 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests for reading the automap lines of UDMF maps."""
+import pytest
+
+from UMAPINFODesigner.uio import udmf
+from benchmarks.bench_udmf import tokenize_all
+from benchmarks.common import make_textmap
+
+def read(data):
+    (vertexes, linedefs) = udmf.read_textmap(memoryview(data))
+    return (vertexes.tolist(), linedefs.tolist())
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_same_lines_as_tokenizing_everything(seed):
+    data = make_textmap(300, 2000, seed=seed)
+    assert read(data) == tokenize_all(data)
+    assert read(bytes(data)) == tokenize_all(data)
+
+TRICKY = b'''namespace = "zdoom"; // { not a block }
+/* vertex { x = 99; } */
+Vertex /* a comment before the brace */ {
+    X = 1.5; comment = "y = 99; } {";
+    y = -2;
+}
+vertex { x = 3; /* y = 99; */ yoffset = 7; y = 4e1; }
+vertex{x=5;y=6;}
+linedef // the brace is on the next line
+{
+    v1 = 0; v2 = 1;
+    twosided = TRUE;
+    special = 0x10;
+    arg0 = 2;
+    comment = "special = 99; \\" twosided = true; }";
+}
+LINEDEF { V1 = 2; V2 = 0; Special = 011; twosided = false; }
+linedef { v2 = 1; special = 1; }
+linedef { v1 = 1; v2 = 2; special = 2.0; blocking = true; }
+sidedef { sector = 0; }
+'''
+
+def test_comments_strings_and_case():
+    assert read(TRICKY) == (
+        [(1.5, -2.0), (3.0, 40.0), (5.0, 6.0)],
+        [(0, 1, 4, 16), (2, 0, 0, 11), (1, 2, 0, 2)])
+
+def test_an_empty_or_unterminated_textmap_has_no_lines():
+    assert read(b'') == ([], [])
+    assert read(b'namespace = "doom";\nvertex { x = 1; y = 2;') == ([], [])
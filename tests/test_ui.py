@@ -0,0 +1,38 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Smoke test building the main window with Tk mocked out, as there
+may be no display to run the tests on."""
+from unittest import mock
+
+from UMAPINFODesigner import ui
+from UMAPINFODesigner.structure import config
+
+def mock_tk(monkeypatch):
+    """Replaces every tkinter widget, variable and dialog ui uses."""
+    for (name, value) in list(vars(ui).items()):
+        if getattr(value, '__module__', '').startswith('tkinter') and callable(value):
+            monkeypatch.setattr(ui, name, mock.MagicMock(name=name))
+
+def test_designer_ui_builds(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    for setting in ('config_file', 'cache_dir', 'config', 'iwads', 'config_initialized'):
+        monkeypatch.setattr(config.configdata, setting, getattr(config.configdata, setting))
+    config.initialize()
+    mock_tk(monkeypatch)
+    monkeypatch.setattr(ui.DesignerUI, 'prompt_for_iwad', lambda self: True)
+    designer = ui.DesignerUI()
+    assert designer.prerenderer.width == designer.automap_width
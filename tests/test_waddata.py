@@ -0,0 +1,133 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests for the layered lump namespaces and staged waddata."""
+import random
+from collections import OrderedDict
+
+from UMAPINFODesigner.structure.waddata import LumpNamespace, waddata
+
+class Model():
+    """What a namespace should hold: the layers as a plain stack."""
+    def __init__(self):
+        self.layers = OrderedDict()
+
+    def lookup(self):
+        found = {}
+        for (layer, lumps) in self.layers.items():
+            for name in lumps:
+                found[name] = (layer, lumps[name])
+        return found
+
+    def move(self, layer, position):
+        lumps = self.layers.pop(layer)
+        order = list(self.layers)
+        order.insert(position, layer)
+        self.layers[layer] = lumps
+        self.layers = OrderedDict((l, self.layers[l]) for l in order)
+
+def check(ns, model):
+    found = model.lookup()
+    assert len(ns) == len(found)
+    assert sorted(ns) == sorted(found)
+    assert ns.sorted_names() == sorted(found)
+    for (name, (layer, lump)) in found.items():
+        assert name in ns
+        assert ns[name] == lump
+        assert ns.provider(name) == layer
+        assert ns.providers(name) == [l for l in model.layers if name in model.layers[l]]
+    assert 'NOPE' not in ns and ns.get('NOPE') is None
+    for prefix in ('', 'N', 'N1', 'N12', 'Z'):
+        assert ns.with_prefix(prefix) == [n for n in sorted(found) if n.startswith(prefix)]
+
+def change(ns, model, r, step):
+    op = r.random()
+    if op < 0.5 or not model.layers:
+        layer = 'L' + str(step)
+        lumps = {'N%02d' % r.randrange(60): step for i in range(r.choice([0, 1, 5, 30]))}
+        model.layers[layer] = lumps
+        ns.push(layer, lumps)
+    elif op < 0.8:
+        layer = r.choice(list(model.layers))
+        del model.layers[layer]
+        ns.remove(layer)
+    else:
+        layer = r.choice(list(model.layers))
+        position = r.randrange(len(model.layers))
+        model.move(layer, position)
+        ns.move(layer, position)
+
+def test_namespace_matches_a_stack_of_layers():
+    r = random.Random(1)
+    (ns, model) = (LumpNamespace(), Model())
+    for step in range(300):
+        change(ns, model, r, step)
+        check(ns, model)
+        check(ns.copy(), model)
+
+def test_overlay_changes_only_itself_until_committed():
+    r = random.Random(2)
+    (ns, model) = (LumpNamespace(), Model())
+    for step in range(40):
+        change(ns, model, r, step)
+    for step in range(40, 400, 20):
+        before = Model()
+        before.layers = OrderedDict(model.layers)
+        overlay = ns.overlay()
+        for i in range(step, step + 20):
+            change(overlay, model, r, i)
+            check(overlay, model)
+            check(ns, before)
+        if step % 40:
+            # dropped: the namespace under it is as it was
+            model = before
+        else:
+            assert overlay.commit() is ns
+        check(ns, model)
+
+def test_overlay_of_a_namespace_changed_since_commits_as_a_copy():
+    ns = LumpNamespace()
+    ns.push('a', {'X': 1})
+    overlay = ns.overlay()
+    overlay.push('b', {'Y': 2})
+    ns.push('c', {'Z': 3})
+    committed = overlay.commit()
+    assert committed is not ns
+    assert sorted(committed) == ['X', 'Y']
+    assert sorted(ns) == ['X', 'Z']
+
+def test_loading_into_a_snapshot_leaves_waddata_alone():
+    class WAD():
+        def __init__(self, maps):
+            (self.graphics, self.music, self.flats, self.patches) = ({}, {}, {}, {})
+            (self.data, self.txdefs) = ({}, {})
+            self.maps = maps
+    waddata.clear()
+    try:
+        waddata.merge('iwad', WAD({'MAP01': 1, 'MAP02': 2}))
+        live = waddata.maps
+        state = waddata.snapshot()
+        with waddata.staged(state):
+            waddata.merge('pwad', WAD({'MAP02': 'x', 'MAP03': 3}))
+            assert waddata.provider('MAP02') == 'pwad'
+        assert waddata.provider('MAP02') == 'iwad'
+        assert sorted(waddata.maps) == ['MAP01', 'MAP02']
+        waddata.restore(state)
+        assert waddata.maps is live
+        assert waddata.get_map('MAP02') == 'x'
+        assert waddata.maps.sorted_names() == ['MAP01', 'MAP02', 'MAP03']
+    finally:
+        waddata.clear()
@@ -0,0 +1,67 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests for loading WADs in the background."""
+import os
+
+from UMAPINFODesigner.structure.waddata import waddata
+from UMAPINFODesigner.uio import wadloader
+
+class Root():
+    """Runs root.after() callbacks when asked to, as Tk's loop would."""
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, callback):
+        self.pending.append(callback)
+
+    def run(self, loader):
+        loader.thread.join()
+        while self.pending:
+            self.pending.pop(0)()
+
+def write(path, magic):
+    with open(path, 'wb') as f:
+        f.write(magic + bytes(8))
+
+def test_iwads_in_a_folder_are_skipped(tmp_path):
+    write(tmp_path / 'b.wad', b'PWAD')
+    write(tmp_path / 'doom2.wad', b'IWAD')
+    write(tmp_path / 'A.WAD', b'PWAD')
+    write(tmp_path / 'notes.txt', b'PWAD')
+    os.mkdir(tmp_path / 'dir.wad')
+    assert wadloader.pwads_in_folder(str(tmp_path)) == [str(tmp_path / 'A.WAD'), str(tmp_path / 'b.wad')]
+
+def test_a_folder_without_pwads_loads_nothing(tmp_path):
+    write(tmp_path / 'doom2.wad', b'IWAD')
+    results = []
+    root = Root()
+    loader = wadloader.WadLoader(root, lambda l: wadloader.load_pwad_folder(l, str(tmp_path), False, True),
+                                 waddata.snapshot(), results.append, results.append)
+    loader.start()
+    root.run(loader)
+    assert results == [None]
+
+def test_unreadable_folders_are_reported_as_errors(tmp_path):
+    results = []
+    errors = []
+    root = Root()
+    loader = wadloader.WadLoader(root, lambda l: wadloader.load_pwad_folder(l, str(tmp_path / 'gone'), False, True),
+                                 waddata.snapshot(), results.append, errors.append)
+    loader.start()
+    root.run(loader)
+    assert not results
+    assert isinstance(errors[0], OSError)
@@ -0,0 +1,47 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests for reading WADs' UMAPINFO."""
+import io
+
+import pytest
+
+from UMAPINFODesigner.uio import wadreader
+
+@pytest.mark.parametrize("umapinfo", [
+    'map E1M1 { levelname = "Hangar" }',
+    b'map MAP01 { } map E1M1 { }',
+    io.BytesIO(b'map "E1M1" { next = E1M2 }'),
+])
+def test_doom_maps_match_doom(umapinfo):
+    assert wadreader.umapinfo_matches_iwad(umapinfo, True, False)
+
+def test_maps_of_the_other_game_dont_match():
+    assert not wadreader.umapinfo_matches_iwad(b'map MAP01 { }', True, False)
+    assert not wadreader.umapinfo_matches_iwad(b'map E1M1 { }', False, True)
+    assert wadreader.umapinfo_matches_iwad(b'map E1M1 { }', True, True)
+
+@pytest.mark.parametrize("umapinfo", [
+    b'map MAP01 { next = }\nmap MAP02 { }',
+    b'}\nmap MAP01 {',
+    io.BytesIO(b'map MAP01 { levelname = "open'),
+    memoryview(b'map MAP01 { a = 1 map MAP02 { }'),
+])
+def test_malformed_umapinfo_is_still_checked(umapinfo):
+    assert wadreader.umapinfo_matches_iwad(umapinfo, False, True)
+    if hasattr(umapinfo, 'seek'):
+        umapinfo.seek(0)
+    assert not wadreader.umapinfo_matches_iwad(umapinfo, True, False)
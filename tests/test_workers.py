@@ -0,0 +1,75 @@
+# This file is part of UMAPINFO Designer.
+#
+# UMAPINFO Designer is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# UMAPINFO Designer is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with UMAPINFO Designer.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Copyright 2021 Jading Tsunami
+"""Tests that the background workers can be stopped before a WAD
+file they read from is replaced."""
+import threading
+
+from UMAPINFODesigner.structure.waddata import waddata
+from UMAPINFODesigner.uio import imagecache, maprender, picture, prerender, thumbnails, wadreader
+from tests.test_fingerprint import lumps, write_wad
+
+class Root():
+    """Drops root.after() callbacks; nothing is polled for."""
+    def after(self, *args):
+        pass
+
+def test_a_cancelled_prerender_lets_go_of_the_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'a.wad')
+    write_wad(path, lumps())
+    wadreader.read_waddata_from_wad(path, clean=True)
+    try:
+        wad = waddata.wad['a.wad']
+        mapping = wad.map
+        drawing = threading.Event()
+        finished = []
+        def render_map(mapw, width):
+            # holds a view of the file while drawing
+            view = wad.maps['MAP01']['LINEDEFS'].data[:16]
+            drawing.set()
+            threading.Event().wait(0.2)
+            finished.append(bytes(view))
+        monkeypatch.setattr(maprender, 'render_map', render_map)
+        monkeypatch.setattr(imagecache, 'from_disk', lambda key: None)
+        prerenderer = prerender.Prerenderer(Root(), 100)
+        prerenderer.start([('MAP01', 'key', None)], {})
+        assert drawing.wait(5)
+        prerenderer.cancel(wait=True)
+        assert finished and not prerenderer.running()
+        wadreader.release_wad_file(path)
+        assert mapping.closed
+        assert bytes(waddata.umapinfo) == b'map MAP01 { }'
+    finally:
+        waddata.clear()
+
+def test_waiting_for_cancelled_thumbnailers(monkeypatch):
+    decoding = threading.Event()
+    finished = []
+    def thumbnail(data, size, flat, lut):
+        decoding.set()
+        threading.Event().wait(0.2)
+        finished.append(data)
+    monkeypatch.setattr(picture, 'thumbnail', thumbnail)
+    monkeypatch.setattr(picture, 'palette_lut', lambda: None)
+    class Lump():
+        data = b'lump'
+    thumbnailer = thumbnails.Thumbnailer(Root(), (32, 32), workers=1)
+    thumbnailer.request([('NAME', 'key', Lump())])
+    assert decoding.wait(5)
+    thumbnailer.cancel()
+    thumbnails.wait()
+    assert finished == [b'lump']
+    assert not thumbnails.retired.pools